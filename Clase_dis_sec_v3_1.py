@@ -1,7 +1,326 @@
 #Importamos los paquetes complementarios:
+import copy
+import functools
+import json
+from collections import Counter
+
+import numpy as np
 import pandas as pd
+from instrumentacion import medir
+from intervalos import indiceIntervalos
 from pandas.core.groupby import DataFrameGroupBy, SeriesGroupBy
 
+try:
+    from orjson import loads as _cargar_json # Decodificador JSON rápido, si está instalado.
+except ImportError:
+    _cargar_json = json.loads
+
+
+# Esquemas de las tablas de entrada: columna -> tipo. Sólo se leen las columnas declaradas.
+# 'indice' es la columna que identifica las filas cuando la tabla llega como arreglos por columna.
+esquemas = {
+    'padron': {'columnas': {'orden_cauce': 'int64', 'Subgrupo': 'int64', 'Grupo': 'int64',
+                            'sup_emp_reducida': 'float64', 'ha_si': 'int64',
+                            'tpo_rec_toma': 'float64', 'tpo_rec_cabeza_cola': 'float64',
+                            'tpo_rec_cola_cabeza': 'float64', 'tpo_descuelgue': 'float64',
+                            'CC': 'int64', 'PP': 'int64', 'idPadron': 'int64'}},
+    'solicitud': {'columnas': {'sup_ad': 'float64', 'sup_res': 'float64', 'sup_rec': 'float64',
+                               'sup_ced': 'float64', 'ha_activa': 'float64'}},
+    'refuerzo': {'columnas': {'caudal_refuerzo': 'float64', 'dur_refuerzo': 'float64'}, 'opcional': True},
+    'reservorio': {'columnas': {'volumen': 'float64'}, 'opcional': True},
+    'modos': {'columnas': {'cabeza_cola': 'int64', 'grupo': 'int64', 'subgrupo': 'int64'},
+              'indice': 'orden_cauce'},
+}
+
+
+def leer_columnas(datos, tabla):
+    '''
+    Carga una tabla de entrada de redSecundaria según su esquema, sin inferencia de tipos.
+    Acepta el texto JSON que envían las vistas ({columna: {índice: valor}}), el mismo objeto ya decodificado
+    (cuerpo JSON de la petición), arreglos por columna ({columna: [valores]}) o un DataFrame (con su índice).
+    Los valores nulos se completan con 0, como hacía pd.read_json(...).fillna(value=0).
+    :return: Índice de las filas (None si la tabla no lo indica) y diccionario con el arreglo de cada columna.
+    :raises ValueError: si faltan columnas o algún valor no es numérico. Se informa antes de calcular la red.
+    '''
+    esquema = esquemas[tabla]
+    columnas = esquema['columnas']
+    if datos is None or isinstance(datos, int) or (isinstance(datos, str) and not datos.strip()):
+        if esquema.get('opcional'):
+            return None, {columna: np.empty(0, dtype=tipo) for columna, tipo in columnas.items()}
+        raise ValueError("Falta la tabla '%s'" % tabla)
+    if isinstance(datos, (str, bytes)):
+        try:
+            datos = _cargar_json(datos)
+        except ValueError as error:
+            raise ValueError("La tabla '%s' no es un JSON válido: %s" % (tabla, error))
+    indice = None
+    if isinstance(datos, pd.DataFrame):
+        # Se conserva el índice del DataFrame: la solicitud se alinea con el padrón por clave.
+        indice = datos.index
+        datos = {columna: datos[columna].to_numpy() for columna in datos.columns}
+    if not isinstance(datos, dict):
+        raise ValueError("La tabla '%s' debe ser un objeto {columna: valores}" % tabla)
+
+    faltantes = [columna for columna in columnas if columna not in datos]
+    if faltantes:
+        raise ValueError("Faltan columnas en la tabla '%s': %s" % (tabla, ', '.join(faltantes)))
+
+    referencia = datos[next(iter(columnas))]
+    if isinstance(referencia, dict):
+        # Formato {columna: {índice: valor}}: si todas las columnas comparten índice se evita alinearlas.
+        claves = list(referencia)
+        if all(isinstance(datos[columna], dict) and list(datos[columna]) == claves for columna in columnas):
+            indice = np.array(claves, dtype=object)
+            valores = {columna: list(datos[columna].values()) for columna in columnas}
+        else:
+            alineado = pd.DataFrame({columna: datos[columna] for columna in columnas})
+            indice = alineado.index
+            valores = {columna: alineado[columna].to_numpy() for columna in columnas}
+        if indice.dtype == object:
+            # Las claves de un objeto JSON son texto: se recuperan los índices enteros como hace pd.read_json.
+            try:
+                indice = indice.astype('int64')
+            except (TypeError, ValueError):
+                pass
+    else:
+        valores = {columna: datos[columna] for columna in columnas}
+        if esquema.get('indice') in datos:
+            indice = pd.Index(np.asarray(datos[esquema['indice']], dtype='int64'))
+        elif indice is None and 'indice' in esquema:
+            # Sin la columna índice las filas se numerarían desde 0 y cada fila quedaría asignada a otra clave.
+            raise ValueError("Falta la columna '%s' en la tabla '%s' (arreglos por columna)" % (esquema['indice'], tabla))
+
+    tabla_df = {}
+    for columna, tipo in columnas.items():
+        try:
+            arreglo = np.asarray(valores[columna], dtype='float64')
+        except (TypeError, ValueError):
+            raise ValueError("La columna '%s' de la tabla '%s' debe ser numérica (%s)" % (columna, tabla, tipo))
+        arreglo[np.isnan(arreglo)] = 0
+        tabla_df[columna] = arreglo.astype(tipo, copy=False)
+    longitudes = {len(arreglo) for arreglo in tabla_df.values()}
+    if len(longitudes) > 1 or (indice is not None and len(indice) not in longitudes):
+        raise ValueError("Las columnas de la tabla '%s' tienen distinta cantidad de filas" % tabla)
+    return indice, tabla_df
+
+
+def leer_tabla(datos, tabla):
+    '''
+    Tabla de entrada de redSecundaria como DataFrame, validada contra su esquema (ver leer_columnas).
+    '''
+    indice, columnas = leer_columnas(datos, tabla)
+    return pd.DataFrame(columnas, index=indice, copy=False)
+
+
+def leer_fecha(fecha):
+    '''
+    Fecha de inicio del turno como la envían las vistas (día primero, ej: '02-03-2022' es el 2 de marzo).
+    '''
+    return pd.to_datetime(fecha, dayfirst = True, errors = 'ignore')
+
+
+def _memo(nodo):
+    '''
+    Decorador que convierte un método de redSecundaria en un nodo del grafo de cálculo.
+    El resultado se calcula una sola vez y queda guardado en self._cache hasta que se modifique
+    alguna de las entradas de las que depende (ver redSecundaria._dependencias).
+    '''
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self):
+            if nodo not in self._cache:
+                with medir(nodo):
+                    self._cache[nodo] = metodo(self)
+                self.recalculos[nodo] += 1
+            return self._cache[nodo]
+        return envoltura
+    return decorador
+
+
+_s_dia = 24 * 60 * 60 # segundos por día
+
+
+def _timedelta_s(segundos):
+    #Segundos enteros (en float, ya redondeados) como timedelta64[ns]; NaN e infinitos quedan NaT
+    segundos = np.asarray(segundos, dtype=float)
+    finito = np.isfinite(segundos)
+    ns = np.where(finito, segundos, 0).astype('int64') * 10**9
+    return np.where(finito, ns, np.iinfo('int64').min).view('timedelta64[ns]')
+
+
+def dias_a_duracion(dias):
+    '''
+    Duración en días (float, escalar o arreglo) como timedelta64[ns] redondeada al segundo entero.
+    Es la única conversión de días a tiempo del cálculo: de ahí en más inicios y duraciones se operan como enteros
+    (segundos exactos sobre datetime64[ns]), sin el error de coma flotante de los días fraccionarios.
+    '''
+    return _timedelta_s(np.round(np.asarray(dias, dtype=float) * _s_dia))
+
+
+def _duraciones_encadenadas(dias, encadena):
+    '''
+    Duraciones (timedelta64[ns] en segundos enteros) de una secuencia de turnados en días. En los tramos encadenados
+    se redondea el fin acumulado de cada elemento y no cada duración, de modo que los redondeos no se acumulan a lo
+    largo del tramo. Los turnados nulos (NaN) quedan NaT.
+    :param encadena: arreglo booleano, True si el elemento continúa al anterior (el primero no puede serlo).
+    '''
+    abre = ~encadena
+    arranque = np.flatnonzero(abre)[np.cumsum(abre) - 1]
+    nulo = np.isnan(dias)
+    dias = np.where(nulo, 0, dias)
+    acumulado = np.cumsum(dias)
+    fin = np.round((acumulado - acumulado[arranque] + dias[arranque]) * _s_dia)
+    fin_previo = np.concatenate([[0], fin[:-1]])
+    fin_previo[abre] = 0
+    return _timedelta_s(np.where(nulo, np.nan, fin - fin_previo))
+
+
+def _acumula_turnados(base, turnado, encadena):
+    '''
+    Fechas de inicio de una secuencia de turnados (cauces o subgrupos) resuelta con sumas acumuladas.
+    Cada elemento que se encadena inicia al finalizar el anterior; el resto inicia en su fecha de base.
+    :param base: arreglo datetime64 con la fecha de inicio de los elementos que no se encadenan.
+    :param turnado: arreglo timedelta64 con la duración de cada elemento.
+    :param encadena: arreglo booleano, True si el elemento continúa al anterior (el primero no puede serlo).
+    :return: arreglo datetime64 con la fecha de inicio de cada elemento.
+    '''
+    arranque = np.flatnonzero(~encadena)[np.cumsum(~encadena) - 1] # Elemento que abre cada tramo encadenado
+    nulo = np.isnat(turnado)
+    duracion = np.where(nulo, 0, turnado.astype('int64'))
+    acumulado = np.cumsum(duracion) - duracion
+    nulos = np.cumsum(nulo) - nulo
+    desplazamiento = (acumulado - acumulado[arranque]).astype('timedelta64[ns]')
+    desplazamiento[(nulos - nulos[arranque]) > 0] = np.timedelta64('NaT')
+    return base[arranque] + desplazamiento
+
+
+def _reparte_turnado(peso, duracion, base, encadena):
+    '''
+    Tiempo y fecha de inicio de cada parcela de una secuencia de tramos (cauces), repartiendo la duración del tramo
+    en proporción al peso de cada parcela (sup_riego) sobre segundos enteros: la parcela termina en
+    base + round(duración * peso acumulado / peso del tramo). El redondeo no se acumula a lo largo del tramo y la última
+    parcela termina exactamente con la duración del tramo.
+    Una parcela sin peso (NaN) no tiene tiempo y las siguientes de su tramo quedan sin fecha, como en _acumula_turnados.
+    :param peso: arreglo float con el peso de cada parcela, en el orden de riego.
+    :param duracion: arreglo timedelta64[ns] con la duración del tramo de cada parcela.
+    :param base: arreglo datetime64[ns] con el inicio del tramo de cada parcela.
+    :param encadena: arreglo booleano, True si la parcela continúa el tramo de la anterior (la primera no puede).
+    :return: Arreglos timedelta64[ns] (tiempo) y datetime64[ns] (inicio) por parcela.
+    '''
+    abre = ~encadena
+    tramo = np.cumsum(abre) - 1
+    primeras = np.flatnonzero(abre)
+    arranque = primeras[tramo]
+    cierre = (np.append(primeras[1:], len(abre)) - 1)[tramo]
+    nulo = np.isnan(peso)
+    peso = np.where(nulo, 0, peso)
+    acumulado = np.cumsum(peso)
+    previo = acumulado[arranque] - peso[arranque] # peso acumulado antes del tramo
+    fraccion = (acumulado - previo) / (acumulado[cierre] - previo)
+    nulos = np.cumsum(nulo)
+    sin_fecha = (nulos - (nulos[arranque] - nulo[arranque]) > 0) | np.isnat(duracion)
+
+    fin = np.round((duracion.astype('int64') // 10**9) * fraccion)
+    fin[sin_fecha] = np.nan
+    fin_previo = np.concatenate([[0], fin[:-1]])
+    fin_previo[abre] = 0
+    return _timedelta_s(fin - fin_previo), base + _timedelta_s(fin_previo)
+
+
+def _casos_modo(modos, cauce):
+    '''
+    Clasifica los cauces según los modos de riego de grupo y subgrupo (ver set_modo_riego).
+    :return: Máscaras booleanas de los casos 0, 1 y 2. El resto de los cauces corresponde al caso 3.
+    '''
+    grupo_sec = modos.grupo.reindex(cauce).to_numpy() == 1
+    subgrupo_sec = modos.subgrupo.reindex(cauce).to_numpy() == 1
+    return grupo_sec & subgrupo_sec, grupo_sec & ~subgrupo_sec, ~grupo_sec & subgrupo_sec
+
+
+def _programa_turnados(subgrupo, f_g, f_sg, casos, dur_turno, fecha_inicio, ultimo_c=None, turno=None):
+    '''
+    Tiempos de turnado y fechas de inicio de cauces y subgrupos según los modos de riego (ver set_modo_riego).
+    :param subgrupo, f_g, f_sg: Subgrupo de cada par cauce / subgrupo y factores Vsg/Vg y Vc/Vsg, en el orden de los cauces.
+    :param casos: Máscaras de los casos 0, 1 y 2 (ver _casos_modo).
+    :param dur_turno: Duración del turno en días.
+    :param fecha_inicio: datetime64[ns] de inicio del turno.
+    :param ultimo_c: Máscara del último par de cada cauce, si alguno tiene parcelas en más de un subgrupo. Como en la
+    versión por bucle, los subgrupos se programan con todos los pares y cada cauce con el último de los suyos.
+    :param turno: Turno (0, 1, ...) de cada par, para programar varios turnos en una sola llamada (planificar_temporada).
+    Los pares van ordenados por turno, dur_turno y fecha_inicio son arreglos con un valor por turno, y las secuencias
+    de cauces y subgrupos no se encadenan de un turno al siguiente.
+    :return: turnado_c (días), duracion_c (timedelta64) e inicio_c, con la fila 0 del cauce ficticio, e ids_sg,
+    turnado_sg e inicio_sg de los subgrupos (con turno, un subgrupo por turno).
+    '''
+    caso_0, caso_1, caso_2 = casos
+    varios = turno is not None
+    if not varios:
+        turno = np.zeros(len(subgrupo), dtype='int64')
+    # Duración y fecha del turno de cada par (o de cada fila de una secuencia)
+    duracion_turno = lambda turnos: np.asarray(dur_turno, dtype=float)[turnos] if varios else np.full(len(turnos), dur_turno)
+    fecha_turno = lambda turnos: np.asarray(fecha_inicio)[turnos] if varios else np.full(len(turnos), fecha_inicio)
+    dur_par = duracion_turno(turno)
+    # Clave de cada par: turno y posición del subgrupo, en ese orden
+    ids, codigo = np.unique(subgrupo, return_inverse=True)
+    clave = turno * len(ids) + codigo
+    sigue_turno = lambda turnos: np.concatenate([[False], turnos[1:] == turnos[:-1]])
+
+    # Subgrupos que se turnan (casos 1 y 2): rige la última asignación de cada subgrupo.
+    en_sg = caso_1 | caso_2
+    claves_sg, ultimo = np.unique(clave[en_sg][::-1], return_index=True)
+    ultimo = np.flatnonzero(en_sg)[::-1][ultimo]
+    if caso_1.any():
+        turnado_sg = np.where(caso_1, f_g * dur_par, dur_par)[ultimo]
+    else:
+        turnado_sg = dur_par[ultimo]
+    ids_sg = np.concatenate([[0], ids[claves_sg % max(len(ids), 1)]])
+    claves_sg = np.concatenate([[-1], claves_sg])
+    turnado_sg = np.concatenate([[0], turnado_sg])
+    turno_sg = np.concatenate([[0], turno[ultimo]])
+
+    # Caso 1: el subgrupo inicia al finalizar el subgrupo previo. Caso 2: todos los subgrupos inician juntos.
+    encadena_sg = np.concatenate([[False], caso_1[ultimo]]) & sigue_turno(turno_sg)
+    td_sg = _duraciones_encadenadas(turnado_sg, encadena_sg)
+    inicio_sg = _acumula_turnados(fecha_turno(turno_sg), td_sg, encadena_sg)
+
+    if ultimo_c is not None:
+        subgrupo, f_g, f_sg, turno, clave, dur_par = (subgrupo[ultimo_c], f_g[ultimo_c], f_sg[ultimo_c], turno[ultimo_c],
+                                                      clave[ultimo_c], dur_par[ultimo_c])
+        caso_0, caso_1, caso_2 = caso_0[ultimo_c], caso_1[ultimo_c], caso_2[ultimo_c]
+
+    # Tiempos de turnado por cauce. La fila 0 es el cauce ficticio previo al primero.
+    if caso_0.any() or caso_1.any() or caso_2.any():
+        turnado_c = np.select([caso_0, caso_1, caso_2],
+                              [f_g * f_sg * dur_par, f_g * dur_par, f_sg * dur_par],
+                              dur_par)
+    else:
+        turnado_c = dur_par
+    turnado_c = np.concatenate([[0], turnado_c])
+    turno_c = np.concatenate([[0], turno])
+    encadena_c = np.concatenate([[False], caso_0]) & sigue_turno(turno_c)
+    td_c = _duraciones_encadenadas(turnado_c, encadena_c)
+
+    # Fecha de inicio de base para los cauces que no se encadenan con el cauce previo.
+    clave_0 = np.concatenate([[-1], clave])
+    fecha_c = fecha_turno(turno_c)
+    base_c = fecha_c.copy()
+    fila_1 = np.flatnonzero(caso_1) + 1
+    base_c[fila_1] = inicio_sg[np.searchsorted(claves_sg, clave[caso_1])]
+    # Caso 2: desplaza el turnado del cauce previo sólo si pertenece al mismo subgrupo (y turno)
+    fila_2 = np.flatnonzero(caso_2) + 1
+    mismo_sg = (clave_0[fila_2] == clave_0[fila_2 - 1]).astype('int64')
+    base_c[fila_2] = fecha_c[fila_2] + td_c[fila_2 - 1] * mismo_sg
+    # Caso 0: el cauce inicia al finalizar el cauce previo.
+    inicio_c = _acumula_turnados(base_c, td_c, encadena_c)
+    return turnado_c, td_c, ids_sg, turnado_sg, inicio_sg, inicio_c
+
+
+def _agregado(nombre):
+    '''
+    Propiedad de sólo lectura sobre los agregados del padrón (cauces/subgrupos/grupos).
+    '''
+    return property(lambda self: self._get_agregados()[nombre])
+
 
 class redSecundaria:
     """
@@ -24,9 +343,31 @@ class redSecundaria:
     #revisar que se calcule a partir de una valor de volumen de la Inspección sobre sup a distribuir
     # vol_riego_p_ha = vol_riego_p / sum(self.padron['sup_emp_reducida'])
 
+    # Grafo de cálculo: cada nodo derivado con las entradas (atributos u otros nodos) de las que depende.
+    # Al asignar un atributo de entrada se invalidan sólo los nodos que dependen de él.
+    _dependencias = {
+        'agregados': ('padron', 'solicitud'),
+        'sup_riego': ('agregados',),
+        'tpo_red': ('agregados', 'modos'),
+        'indice_cauces': ('padron', 'modos'),
+        'padron_ordenado': ('agregados', 'indice_cauces'),
+        'vol_riego_ha': ('sup_riego', 'tpo_red', 'caudal_canal', 'dur_turno', 'refuerzo', 'reservorio'),
+        'vol_riego': ('sup_riego', 'vol_riego_ha'),
+        'modo_riego': ('agregados', 'indice_cauces', 'vol_riego', 'modos', 'dur_turno', 'fecha_inicio'),
+        'caudal_riego': ('sup_riego', 'vol_riego', 'modo_riego', 'simular', 'vol_riego_p_ha'),
+        'hidrograma': ('modo_riego', 'caudal_riego'),
+        'subpadron': ('padron_ordenado',),
+        'factor_turnado': ('sup_riego', 'indice_cauces', 'modos'),
+        'cuadro_red': ('agregados', 'padron_ordenado', 'vol_riego_ha', 'modo_riego', 'caudal_riego', 'vol_riego_p_ha'),
+        'indice_turno': ('cuadro_red',),
+    }
+    _entradas = ('padron', 'refuerzo', 'solicitud', 'reservorio', 'caudal_canal', 'dur_turno',
+                 'fecha_inicio', 'modos', 'vol_riego_p_ha', 'simular')
+
 #   Constructor de la clase / Propiedades
     '''
     Listado del padrón de regantes: padron
+    Inspección del padrón en el almacén local (si no se envía el padrón): inspeccion
     Duración del turno: dur_turno
     Caudal en cabecera de canal: caudal_canal
     Fecha de inicio de la programación del turno: fecha_inicio
@@ -50,7 +391,7 @@ class redSecundaria:
     '''
 
     def __init__(self,
-             padron,
+             padron = None,
              refuerzo = 0,
              solicitud = 0,
              reservorio = 0,
@@ -59,43 +400,146 @@ class redSecundaria:
              fecha_inicio = "01-01-2022",
              modos = 0,
              vol_riego_p_ha = 0,
-             simular = 0
+             simular = 0,
+             inspeccion = None
              ):
 
-       self.padron = pd.read_json(padron).fillna(value=0)  # Objeto json del padrón de riego.
-       self.refuerzo = pd.read_json(refuerzo).fillna(value=0) # Objeto json del los refuerzos vincualdos al padrón.
-       self.solicitud = pd.read_json(solicitud).fillna(value=0) # Objeto json de las solicitudes de riego vinculadas al padrón.
-       self.reservorio = pd.read_json(reservorio).fillna(value=0) # Objeto json de los reservorios vinculados al padrón.
+       self._cache = {} # Valores derivados ya calculados, por nodo del grafo.
+       self.recalculos = Counter() # Cantidad de veces que se calculó cada nodo.
+
+       # Tablas de entrada: se validan contra su esquema (ver leer_tabla) antes de calcular.
+       self.inspeccion = inspeccion # Id de la inspección: sin padrón, se lee del almacén local (almacen_padron).
+       with medir('lectura'):
+           if padron is None and inspeccion is not None:
+               from almacen_padron import leer_padron
+               padron = leer_padron(inspeccion)
+           self.padron = leer_tabla(padron, 'padron')  # Objeto json del padrón de riego.
+           self.refuerzo = leer_tabla(refuerzo, 'refuerzo') # Objeto json del los refuerzos vincualdos al padrón.
+           self.solicitud = leer_tabla(solicitud, 'solicitud') # Objeto json de las solicitudes de riego vinculadas al padrón.
+           self.reservorio = leer_tabla(reservorio, 'reservorio') # Objeto json de los reservorios vinculados al padrón.
+           self.modos = leer_tabla(modos, 'modos') #Objeto JSON con los modos de riego y distribución (cabeza_cola)
        self.caudal_canal = caudal_canal
        self.dur_turno = dur_turno
-       self.fecha_inicio = pd.to_datetime(fecha_inicio, dayfirst = True, errors = 'ignore')
-       self.modos = pd.read_json(modos) #Objeto JSON con los modos de riego y distribución (cabeza_cola)
+       self.fecha_inicio = fecha_inicio # Se interpreta con leer_fecha al asignarla (ver __setattr__)
        self.vol_riego_p_ha = vol_riego_p_ha #dato que se pasa al generar el turno.
        self.simular = simular
 
-       # 1-Integra las solicitudes de riego al padron y calcula la superficie efecutiva de riego
-       self.padron['sup_anexa'] = self.solicitud['sup_ad'] - self.solicitud['sup_res']
-       self.padron['sup_pase'] = self.solicitud['sup_rec'] - self.solicitud['sup_ced']
-       self.padron['sup_riego'] = (self.padron['sup_emp_reducida'] + self.padron['sup_anexa'] + self.padron['sup_pase']) \
-                                  * self.padron["ha_si"] * self.solicitud["ha_activa"]
+       # Integra las solicitudes, agrega el padrón y lo ordena por cauces al construir la red.
+       self._get_agregados()
+       self.get_indice_cauces()
+
+    def __setattr__(self, nombre, valor):
+        if nombre == 'fecha_inicio':
+            valor = leer_fecha(valor)
+        object.__setattr__(self, nombre, valor)
+        if nombre in self._entradas:
+            self.invalidar(nombre)
+
+    def invalidar(self, *entradas):
+        '''
+        Descarta los valores derivados que dependen de las entradas indicadas.
+        Se invoca sola al asignar un atributo de entrada; llamarla a mano sólo hace falta si se modifica un
+        DataFrame de entrada en el lugar (ej: red.solicitud.loc[...] = ...). Sin argumentos descarta todo.
+        '''
+        if not entradas:
+            self._cache.clear()
+            return
+        pendientes = set(entradas)
+        while pendientes:
+            entrada = pendientes.pop()
+            for nodo, dependencias in self._dependencias.items():
+                if entrada in dependencias and nodo in self._cache:
+                    del self._cache[nodo]
+                    pendientes.add(nodo)
+
+    def con_parametros(self, **parametros):
+        '''
+        Devuelve una copia de la red que comparte las tablas y los valores ya calculados, con otros parámetros de
+        turno (caudal_canal, dur_turno, fecha_inicio, vol_riego_p_ha, simular).
+        En la copia sólo se recalculan los nodos que dependen de los parámetros modificados; la red original no cambia.
+        '''
+        red = copy.copy(self)
+        object.__setattr__(red, '_cache', dict(self._cache))
+        object.__setattr__(red, 'recalculos', Counter(self.recalculos))
+        for nombre, valor in parametros.items():
+            if nombre == 'fecha_inicio':
+                valor = leer_fecha(valor)
+            if getattr(red, nombre) != valor:
+                setattr(red, nombre, valor)
+        return red
+
+    @_memo('agregados')
+    def _get_agregados(self):
+        '''
+        Integra las solicitudes al padrón y lo agrega por cauces / subgrupos / grupos.
+        :return: Diccionario con los agrupamientos y agregados que se exponen como propiedades de la red.
+        '''
+        # 1-Integra las solicitudes de riego al padron y calcula la superficie efecutiva de riego
+        self.padron['sup_anexa'] = self.solicitud['sup_ad'] - self.solicitud['sup_res']
+        self.padron['sup_pase'] = self.solicitud['sup_rec'] - self.solicitud['sup_ced']
+        self.padron['sup_riego'] = (self.padron['sup_emp_reducida'] + self.padron['sup_anexa'] + self.padron['sup_pase']) \
+                                   * self.padron["ha_si"] * self.solicitud["ha_activa"]
+
+        # 2-Agrupa y agrega padron por cauces / subgrupos / grupos
+        agregados = {'cauces': self.padron.groupby('orden_cauce').sum(),
+                     'subgrupos': self.padron.groupby('Subgrupo').sum(),
+                     'grupos': self.padron.groupby('Grupo').sum()}
+
+        agregados['ctd_cauces'] = len(agregados['cauces'])
+        agregados['ctd_subgrupos'] = len(agregados['subgrupos'])
+        agregados['ctd_grupos'] = len(agregados['grupos'])
+        return agregados
+
+    cauces = _agregado('cauces')
+    subgrupos = _agregado('subgrupos')
+    grupos = _agregado('grupos')
+    ctd_cauces = _agregado('ctd_cauces')
+    ctd_subgrupos = _agregado('ctd_subgrupos')
+    ctd_grupos = _agregado('ctd_grupos')
 
-       # 2-Agrupa y agrega padron por cauces / subgrupos / grupos
-       self.cauces_g = self.padron.groupby('orden_cauce')
-       self.cauces = self.padron.groupby('orden_cauce').sum()
-       self.subgrupos = self.padron.groupby('Subgrupo').sum()
-       self.grupos = self.padron.groupby('Grupo').sum()
-       self.subgrupos_cauce = self.padron.groupby(['orden_cauce','Subgrupo']).sum()
+    @property
+    def cabeza_cola_bool(self):
+        # 3-Ordena cada cauce en base a los modos de distribución (cabeza_cola)
+        # Toma como referencia el riego por cabeza:'ascending=True' para el .sort_index()
+        return self.modos.cabeza_cola == 1
 
+    @_memo('indice_cauces')
+    def get_indice_cauces(self):
+        '''
+        Índice del padrón por cauce (estilo CSR): un único ordenamiento estable del padrón por cauce y, dentro de cada
+        cauce, por la estrategia de riego (cabeza_cola): riego por cabeza en orden ascendente del padrón, por cola en
+        orden descendente. Las parcelas del cauce i ocupan las posiciones desplazamientos[i]:desplazamientos[i+1]
+        del padrón ordenado.
+        :return: Diccionario con orden (posiciones del padrón ordenado), cauces, desplazamientos, parcelas por cauce
+        y los pares cauce / subgrupo presentes en el padrón (ordenados por cauce y subgrupo).
+        '''
+        cauce = self.padron['orden_cauce'].to_numpy()
+        sentido = np.where(self.cabeza_cola_bool.reindex(cauce).to_numpy(), 1, -1)
+        orden = np.lexsort((self.padron.index.to_numpy() * sentido, cauce))
+
+        cauce = cauce[orden]
+        subgrupo = self.padron['Subgrupo'].to_numpy()[orden]
+        nuevo_cauce = np.concatenate([[True], cauce[1:] != cauce[:-1]])
+        desplazamientos = np.append(np.flatnonzero(nuevo_cauce), len(cauce))
+        cauces = cauce[nuevo_cauce]
+        # Pares cauce / subgrupo: basta con los cambios de subgrupo dentro de cada cauce
+        cambia = nuevo_cauce | np.concatenate([[True], subgrupo[1:] != subgrupo[:-1]])
+        pares = np.unique(np.stack([cauce[cambia], subgrupo[cambia]]), axis=1)
 
-       self.ctd_cauces = len(self.cauces)
-       self.ctd_subgrupos = len(self.subgrupos)
-       self.ctd_grupos = len(self.grupos)
+        return {'orden': orden,
+                'cauces': cauces,
+                'desplazamientos': desplazamientos,
+                'parcelas': pd.Series(np.diff(desplazamientos), index=pd.Index(cauces, name='orden_cauce')),
+                'cauce_sg': pares[0],
+                'subgrupo_sg': pares[1]}
 
-       # 3-Ordena cada cauce en base a los modos de distribución (cabeza_cola)
-       # Toma como referencia el riego por cabeza:'ascending=True' para el .sort_index()
-       self.cabeza_cola_bool = self.modos.cabeza_cola == 1
+    @_memo('padron_ordenado')
+    def _get_padron_ordenado(self):
+        # Padrón (con las superficies de riego) en el orden del índice de cauces; se copia una sola vez.
+        return self.padron.iloc[self.get_indice_cauces()['orden']]
 
     # Métodos generales de la clase: determinación de superficie, volumen, tiempo y caudal.
+    @_memo('sup_riego')
     def get_sup_riego(self):
         """
         Este método devuelve la superficie de riego que se requiere en el cálculo de turno o para simulación de caudales.
@@ -130,19 +574,19 @@ class redSecundaria:
                                      'grupo': self.grupos.sup_riego}).fillna(value=0)
         return sup_riego_df # Devuelve un DF con las sup_riego agregadas por niveles
 
+    @_memo('tpo_red')
     def get_tpo_red(self):
         '''
         Este método devuelve un vector con el tiempo de red que corresónde a cada cauce del padrón.
         Dependerá de la estrategia de riego cabeza-cola de cada cauce.
         Para determinar el tpo_riego_ha se requiere tomar la suma de todos los valores
         '''
-
-        for cauce, dato in self.cauces_g:
-            if self.modos.cabeza_cola[cauce] == 0: #Riego por COLA
-                self.cauces['tpo_recorrido'] = self.cauces['tpo_rec_toma'] + self.cauces['tpo_rec_cabeza_cola']
-            else: #Riego por CABEZA
-                self.cauces['tpo_recorrido'] = self.cauces['tpo_rec_cola_cabeza']
-
+        # Recorrido según el modo de cada cauce: por COLA (cabeza_cola == 0) desde la toma y de cabeza a cola,
+        # por CABEZA sólo de cola a cabeza.
+        por_cola = (self.modos.cabeza_cola.reindex(self.cauces.index) == 0).to_numpy()
+        self.cauces['tpo_recorrido'] = np.where(por_cola,
+                                                self.cauces['tpo_rec_toma'] + self.cauces['tpo_rec_cabeza_cola'],
+                                                self.cauces['tpo_rec_cola_cabeza'])
         self.cauces['tpo_red'] = self.cauces['tpo_descuelgue'] - self.cauces['tpo_recorrido']
 
         return self.cauces['tpo_red'] # Devuelve una serie con el tpo_red por cauce
@@ -174,6 +618,7 @@ class redSecundaria:
         reservorio = sum(self.reservorio["volumen"])
         return reservorio
 
+    @_memo('vol_riego_ha')
     def get_vol_riego_ha(self):
         """
         Este método devuelve el volumen de riego por ha que se debe aplicar para la determinación del volumen de riego
@@ -183,13 +628,75 @@ class redSecundaria:
         La determinación del volumen de riego se plantea en todos los ámbitos:parcela/toma/cauce(hijuela)/canal (inspección)
         El vol_riego será el determinado por el ámbito donde se aplique el método.
         """
-        cr = self.caudal_canal / self.get_sup_riego().cauce.sum()
-        vol_base_ha = cr * (self.dur_turno-(self.get_tpo_red().sum()/self.f_tiempo)) * self.f_escala
-        refuerzo = self.get_cap_refuerzo() #* self.int_refuerzo
-        reservorio = self.get_reservorio()
+        return self._calcula_vol_riego_ha(self.caudal_canal, self.dur_turno)
+
+    def _calcula_vol_riego_ha(self, caudal_canal, dur_turno, refuerzo=None, reservorio=None):
+        '''
+        Fórmula de get_vol_riego_ha() sobre la sup_riego y el tpo_red ya calculados de la red.
+        Admite escalares o arreglos NumPy de caudal_canal, dur_turno, refuerzo y reservorio (se operan por elemento).
+        Si no se indican, refuerzo y reservorio son los disponibles en la inspección.
+        '''
+        if refuerzo is None:
+            refuerzo = self.get_cap_refuerzo() #* self.int_refuerzo
+        if reservorio is None:
+            reservorio = self.get_reservorio()
+        cr = caudal_canal / self.get_sup_riego().cauce.sum()
+        vol_base_ha = cr * (dur_turno-(self.get_tpo_red().sum()/self.f_tiempo)) * self.f_escala
         vol_riego_ha = vol_base_ha * self.f_compensa + ((refuerzo + reservorio) / self.get_sup_riego().cauce.sum())
         return vol_riego_ha
 
+    def resolver_parametro(self, objetivo=None, variable='caudal_canal'):
+        '''
+        Inversa de _calcula_vol_riego_ha(): caudal_canal o dur_turno con los que el volumen de riego por ha alcanza el
+        objetivo, con el otro parámetro de la red fijo. Usa la sup_riego, el tpo_red, el refuerzo y el reservorio ya
+        calculados y evalúa la red una sola vez con el valor obtenido.
+        Si el refuerzo y el reservorio alcanzan por sí solos, el caudal requerido es 0 (o la duración, el tiempo de red).
+        :param objetivo: vol_riego_ha buscado (por omisión vol_riego_p_ha). Un valor para toda la red o una Serie por
+        cauce; en ese caso se toma el mayor valor requerido, para que todos los cauces alcancen su objetivo.
+        :param variable: 'caudal_canal' o 'dur_turno'.
+        :raises ValueError: si falta el objetivo, el objetivo por cauce indica cauces que no están en la red o no hay
+        valor que lo alcance.
+        :return: Diccionario con el valor requerido, el requerido por cauce (None si el objetivo es de toda la red),
+        el vol_riego_ha resultante y los caudales por cauce (get_caudal_riego) con ese valor.
+        '''
+        if variable not in ('caudal_canal', 'dur_turno'):
+            raise ValueError("Sólo se puede resolver caudal_canal o dur_turno")
+        if objetivo is None:
+            objetivo = self.vol_riego_p_ha
+        if objetivo is None:
+            raise ValueError("falta el objetivo")
+        if isinstance(objetivo, pd.Series):
+            if objetivo.empty:
+                raise ValueError("El objetivo por cauce no indica ningún cauce")
+            ajenos = objetivo.index.difference(self.cauces.index)
+            if len(ajenos):
+                raise ValueError("El objetivo por cauce incluye cauces que no están en la red: %s"
+                                 % ', '.join(str(cauce) for cauce in ajenos))
+        sup_riego = self.get_sup_riego().cauce.sum()
+        tpo_red = self.get_tpo_red().sum() / self.f_tiempo
+        base = objetivo - (self.get_cap_refuerzo() + self.get_reservorio()) / sup_riego # vol/ha que aporta el canal
+        if variable == 'caudal_canal':
+            denominador = (self.dur_turno - tpo_red) * self.f_escala * self.f_compensa
+            if denominador <= 0:
+                raise ValueError("La duración del turno no supera el tiempo de red: no hay caudal que alcance el objetivo")
+            requerido = np.maximum(base, 0) * sup_riego / denominador
+        else:
+            denominador = self.caudal_canal * self.f_escala * self.f_compensa
+            if denominador <= 0:
+                raise ValueError("Sin caudal en cabecera no hay duración de turno que alcance el objetivo")
+            requerido = tpo_red + np.maximum(base, 0) * sup_riego / denominador
+
+        por_cauce = None
+        if isinstance(objetivo, pd.Series):
+            por_cauce = requerido.rename(variable)
+            requerido = por_cauce.max()
+        red = self.con_parametros(**{variable: float(requerido)})
+        return {variable: float(requerido),
+                'por_cauce': por_cauce,
+                'vol_riego_ha': red.get_vol_riego_ha(),
+                'caudal_riego': red.get_caudal_riego()[1:]}
+
+    @_memo('vol_riego')
     def get_vol_riego(self):
         '''
         Esté método devuelve un DF con el volumen de riego agregado por cada nivel.
@@ -202,107 +709,526 @@ class redSecundaria:
         tpo_riego_ha = (self.dur_turno-(self.get_tpo_red().sum()/self.f_tiempo)) / self.get_sup_riego().cauce.sum()
         return tpo_riego_ha
 
+    @_memo('modo_riego')
     def set_modo_riego(self):
         '''
         Método que analiza los modos de riego de grupo y subgrupo para asignar el tiempo de turno y fecha de inicio
         a cada uno de las cauces del padrón.
-        :return: DF integrado por una serie con los tiempos de turnado en formado timedelta y una serie con las fechas
-        de inicio en formato datetime.
-        '''
-        stack = [0]
-        turnado_c = pd.Series([0])
-        turnado_sg = pd.Series([0])
-        inicio_c = pd.Series([self.fecha_inicio])
-        inicio_sg = pd.Series([self.fecha_inicio])
-
-        for cauce,subgrupo in self.subgrupos_cauce.index:
-            # Factor que contempla la relación de Vsg/Vg
-            f_g = self.get_vol_riego().subgrupo[subgrupo] / self.get_vol_riego().cauce.sum()
-            # Factor que contempla la relación de Vc/Vsg
-            f_sg = self.get_vol_riego().cauce[cauce] / self.get_vol_riego().subgrupo[subgrupo]
-
-            # Análisis de modos de riego para asignar tiempo de turnado y fecha de inicio al turnado de cada cauce
-            # Caso 0: GRUPO Y SUBGRUPO SECUENCIAL
-            if (self.modos.grupo[cauce] == 1) and (self.modos.subgrupo[cauce] == 1):
-                turnado_c[cauce] = f_g * f_sg * self.dur_turno
-                inicio_c[cauce] = inicio_c[cauce-1] \
-                                  + pd.to_timedelta(turnado_c[cauce-1], unit='d')
-
-            # Caso 1: GRUPO SECUENCIAL Y SUBGRUPO INDEPENDIENTE
-            elif (self.modos.grupo[cauce] == 1) and (self.modos.subgrupo[cauce] == 0):
-                turnado_c[cauce] = f_g * self.dur_turno
-                turnado_sg[subgrupo] = f_g * self.dur_turno
-                inicio_sg[subgrupo] = inicio_sg[subgrupo-1] \
-                                      + pd.to_timedelta(turnado_sg[subgrupo-1], unit='d')
-                inicio_c[cauce] = inicio_sg[subgrupo]
-
-            # Caso 2: GRUPO INDEPENDIENTE Y SUBGRUPO SECUENCIAL - REVISAR!
-            elif (self.modos.grupo[cauce] == 0) and (self.modos.subgrupo[cauce] == 1):
-                stack.append(cauce + subgrupo) #Artilugio algebraico para identificar el cambio de SG
-                bandera = stack[cauce] - stack[cauce - 1] #Evita secuenciar los turnados al cambiar el SG
-
-                turnado_c[cauce] = f_sg * self.dur_turno
-                turnado_sg[subgrupo] = self.dur_turno
-                inicio_sg[subgrupo] = self.fecha_inicio
-                inicio_c[cauce]=inicio_sg[subgrupo] \
-                                + pd.to_timedelta(turnado_c[cauce-1], unit='d') \
-                                * int((bandera == 1))
-
-            # Caso 3: GRUPO Y SUBGRUPO INDEPENDIENTE. Parametrización por defecto.
-            else:
-                turnado_c[cauce] = self.dur_turno
-                inicio_c[cauce] = self.fecha_inicio
+        Se resuelve para toda la red a la vez sobre arreglos: los casos secuenciales se calculan como sumas
+        acumuladas de los turnados y los independientes toman directamente la fecha de inicio.
+        :return: DF integrado por los tiempos de turnado en días (turnado_c) y como duración timedelta entera
+        (duracion_c), y las fechas de inicio en formato datetime.
+        '''
+        return self._programa_modo(self.get_vol_riego(), self.dur_turno, np.datetime64(pd.Timestamp(self.fecha_inicio), 'ns'))
 
-        modo_riego_df = pd.DataFrame({'turnado_c':turnado_c,
-                                      'turnado_sg': turnado_sg,
-                                      'inicio_sg':inicio_sg,
-                                      'inicio_c':inicio_c}
+    def _programa_modo(self, vol_riego, dur_turno, fecha_inicio):
+        '''
+        Turnados y fechas de inicio de cauces y subgrupos según los modos de riego, para los volúmenes por cauce y
+        subgrupo de vol_riego, la duración del turno y su fecha de inicio (datetime64[ns]).
+        :return: DF como el de set_modo_riego.
+        '''
+        indice = self.get_indice_cauces()
+        cauce = indice['cauce_sg']
+        subgrupo = indice['subgrupo_sg']
+
+        # Factor que contempla la relación de Vsg/Vg
+        f_g = vol_riego.subgrupo.reindex(subgrupo).to_numpy() / vol_riego.cauce.sum()
+        # Factor que contempla la relación de Vc/Vsg
+        f_sg = vol_riego.cauce.reindex(cauce).to_numpy() / vol_riego.subgrupo.reindex(subgrupo).to_numpy()
+
+        # Caso 0: GRUPO Y SUBGRUPO SECUENCIAL
+        # Caso 1: GRUPO SECUENCIAL Y SUBGRUPO INDEPENDIENTE
+        # Caso 2: GRUPO INDEPENDIENTE Y SUBGRUPO SECUENCIAL - REVISAR!
+        # Caso 3: GRUPO Y SUBGRUPO INDEPENDIENTE. Parametrización por defecto.
+        casos = _casos_modo(self.modos, cauce)
+        # Un cauce con parcelas en más de un subgrupo aparece en varios pares: rige el último (ver _programa_turnados)
+        ultimo_c = np.append(cauce[1:] != cauce[:-1], True)
+        turnado_c, duracion_c, ids_sg, turnado_sg, inicio_sg, inicio_c = _programa_turnados(subgrupo, f_g, f_sg, casos,
+                                                                                            dur_turno, fecha_inicio,
+                                                                                            ultimo_c)
+
+        indice_c = np.concatenate([[0], cauce[ultimo_c]])
+        modo_riego_df = pd.DataFrame({'turnado_c':pd.Series(turnado_c, index=indice_c),
+                                      'duracion_c':pd.Series(duracion_c, index=indice_c),
+                                      'turnado_sg': pd.Series(turnado_sg, index=ids_sg),
+                                      'inicio_sg':pd.Series(inicio_sg, index=ids_sg),
+                                      'inicio_c':pd.Series(inicio_c, index=indice_c)}
                                     )
         return modo_riego_df
 
+    def _programa_temporada(self, vol_riego_ha, dur_turno, fechas):
+        '''
+        Turnados, duraciones y fechas de inicio de los cauces en varios turnos a la vez (planificar_temporada): los
+        pares cauce / subgrupo de todos los turnos se programan en una sola llamada a _programa_turnados, con los
+        volúmenes de cada turno (sup_riego * vol_riego_ha), su duración y su fecha, como _programa_modo para cada turno.
+        :return: Arreglos turnos x cauces (en el orden de get_indice_cauces) de turnado (días), duración e inicio.
+        '''
+        indice = self.get_indice_cauces()
+        cauce = indice['cauce_sg']
+        subgrupo = indice['subgrupo_sg']
+        cantidad, pares = len(vol_riego_ha), len(cauce)
+        sup_riego = self.get_sup_riego()
+
+        # Factores Vsg/Vg y Vc/Vsg por turno (filas) y par (columnas), con las mismas operaciones que _programa_modo
+        volumen = vol_riego_ha[:, None]
+        vol_red = (sup_riego.cauce.to_numpy()[None, :] * volumen).sum(axis=1)[:, None]
+        vol_sg = sup_riego.subgrupo.reindex(subgrupo).to_numpy()[None, :] * volumen
+        f_g = vol_sg / vol_red
+        f_sg = (sup_riego.cauce.reindex(cauce).to_numpy()[None, :] * volumen) / vol_sg
+
+        casos = tuple(np.tile(caso, cantidad) for caso in _casos_modo(self.modos, cauce))
+        ultimo_c = np.append(cauce[1:] != cauce[:-1], True)
+        turnado_c, duracion_c, _, _, _, inicio_c = _programa_turnados(np.tile(subgrupo, cantidad), f_g.ravel(),
+                                                                      f_sg.ravel(), casos, dur_turno,
+                                                                      fechas.to_numpy().astype('datetime64[ns]'),
+                                                                      np.tile(ultimo_c, cantidad),
+                                                                      np.repeat(np.arange(cantidad), pares))
+        forma = (cantidad, int(ultimo_c.sum()))
+        return turnado_c[1:].reshape(forma), duracion_c[1:].reshape(forma), inicio_c[1:].reshape(forma)
+
+    @_memo('caudal_riego')
     def get_caudal_riego(self): #Contemplar recibir el padron del escenario de simulación
         #self.simular = simular
         '''
         Genera el caudal de riego por cauce dentro del padrón asignado para turnado.
         :return: DF con los caudales agregados por niveles grupo/subgrupo/cauce
         '''
-        caudal_riego = pd.Series([0],dtype=float)
+        turnado = self.set_modo_riego().turnado_c.reindex(self.cauces.index)
         if self.simular==1: #Desde el Simulador toma el vol_riego_p_ha para determinar los caudales.
-            for cauce, dato in self.cauces_g:
-                caudal_riego[cauce] = ((self.vol_riego_p_ha * self.get_sup_riego().cauce[cauce]) / self.set_modo_riego().turnado[cauce]) * (1 / self.f_escala)
+            volumen = self.vol_riego_p_ha * self.get_sup_riego().cauce.reindex(self.cauces.index)
         else:
-            for cauce, dato in self.cauces_g:
-                caudal_riego[cauce] = (self.get_vol_riego().cauce[cauce] / self.set_modo_riego().turnado[cauce]) * (1 / self.f_escala)
+            volumen = self.get_vol_riego().cauce.reindex(self.cauces.index)
+        # Posición 0 en cero (como en el turnado) seguida del caudal de cada cauce
+        caudal_riego = pd.concat([pd.Series([0], dtype=float), (volumen / turnado) * (1 / self.f_escala)])
 
         return caudal_riego
 
+    @_memo('hidrograma')
+    def get_hidrograma(self):
+        '''
+        Hidrograma en cabecera del canal: caudal total demandado por los cauces activos en cada instante del turno.
+        Se arma con un barrido de eventos ordenados (inicio: +caudal del cauce, fin: -caudal) según set_modo_riego(),
+        sin muestrear el turno. Los cauces sin fecha de inicio o con turnado nulo no aportan caudal.
+        :return: Serie escalonada con el caudal vigente desde cada instante hasta el siguiente (el último es 0).
+        '''
+        modo_riego = self.set_modo_riego().drop(index=0, errors='ignore')
+        cauces = modo_riego.index[modo_riego.index.isin(self.cauces.index)]
+        inicio = modo_riego.inicio_c.reindex(cauces).to_numpy()
+        turnado = modo_riego.duracion_c.reindex(cauces).to_numpy()
+        caudal = self.get_caudal_riego().reindex(cauces).to_numpy(dtype=float)
+        activo = ~np.isnat(inicio) & ~np.isnat(turnado) & (turnado > np.timedelta64(0)) & np.isfinite(caudal)
+        inicio, turnado, caudal = inicio[activo], turnado[activo], caudal[activo]
+
+        instantes = np.concatenate([inicio, inicio + turnado])
+        orden = np.argsort(instantes, kind='stable')
+        instantes = instantes[orden]
+        variacion = np.concatenate([caudal, -caudal])[orden]
+        activos = np.cumsum(np.concatenate([np.ones(len(caudal)), -np.ones(len(caudal))])[orden])
+
+        # Un valor por instante: el vigente luego de aplicar todos los eventos de ese instante
+        ultimo = np.concatenate([instantes[1:] != instantes[:-1], [True]]) if len(instantes) else np.array([], dtype=bool)
+        caudal_total = np.cumsum(variacion)
+        caudal_total[activos == 0] = 0 # Sin cauces activos el caudal es exactamente 0 (sin residuos de redondeo)
+        instantes, caudal_total = instantes[ultimo], caudal_total[ultimo]
+        # Sólo los instantes en los que cambia el caudal (más allá del redondeo de las sumas)
+        cambia = np.concatenate([[True], ~np.isclose(caudal_total[1:], caudal_total[:-1], rtol=1e-12, atol=0)])
+        return pd.Series(caudal_total[cambia], index=pd.DatetimeIndex(instantes[cambia], name='instante'), name='caudal')
+
+    def remuestrear_hidrograma(self, intervalo, como='media'):
+        '''
+        Hidrograma en intervalos regulares (ej: '15min', '1h').
+        :param como: 'media' (caudal medio del intervalo, conserva el volumen) o 'maximo' (caudal máximo del intervalo).
+        :return: Serie con el caudal de cada intervalo, indexada por su inicio.
+        '''
+        if como not in ('media', 'maximo'):
+            raise ValueError("El hidrograma se remuestrea por 'media' o 'maximo'")
+        try:
+            paso = pd.Timedelta(intervalo)
+        except ValueError:
+            paso = None
+        if paso is None or pd.isna(paso) or paso <= pd.Timedelta(0):
+            raise ValueError("Intervalo inválido para el hidrograma: %r" % (intervalo,))
+        hidrograma = self.get_hidrograma()
+        if hidrograma.empty:
+            return hidrograma
+        bordes = pd.date_range(hidrograma.index[0].floor(paso), hidrograma.index[-1].ceil(paso), freq=paso)
+        escalones = hidrograma.reindex(hidrograma.index.union(bordes)).ffill().fillna(0)
+        escalones = escalones[escalones.index < bordes[-1]]
+        intervalos = escalones.index.floor(paso)
+        if como == 'maximo':
+            remuestreo = escalones.groupby(intervalos).max()
+        else:
+            duracion = np.diff(np.append(escalones.index.asi8, bordes[-1].value))
+            remuestreo = (escalones * duracion).groupby(intervalos).sum() / paso.value
+        remuestreo.index.name = 'instante'
+        return remuestreo.rename('caudal')
+
+    def resumen_hidrograma(self):
+        '''
+        Caudal pico del hidrograma y tramos en los que la demanda supera el caudal en cabecera (caudal_canal).
+        :return: Diccionario con caudal_pico, instante_pico, caudal_canal, exceso_maximo, tiempo_excedido y
+        excesos (DF con inicio, fin y caudal máximo de cada tramo excedido).
+        '''
+        hidrograma = self.get_hidrograma()
+        fin = pd.Series(hidrograma.index, index=hidrograma.index).shift(-1)
+        excede = hidrograma > self.caudal_canal
+        tramo = (excede != excede.shift()).cumsum()
+        excesos = pd.DataFrame({'inicio': hidrograma.index, 'fin': fin, 'caudal_maximo': hidrograma})[excede] \
+                    .groupby(tramo[excede]) \
+                    .agg({'inicio': 'min', 'fin': 'max', 'caudal_maximo': 'max'}) \
+                    .reset_index(drop=True)
+        excesos['exceso_maximo'] = excesos['caudal_maximo'] - self.caudal_canal
+        pico = hidrograma.max() if len(hidrograma) else 0
+        return {'caudal_pico': pico,
+                'instante_pico': hidrograma.idxmax() if len(hidrograma) else None,
+                'caudal_canal': self.caudal_canal,
+                'exceso_maximo': max(pico - self.caudal_canal, 0),
+                'tiempo_excedido': (excesos['fin'] - excesos['inicio']).sum(),
+                'excesos': excesos}
+
+    @_memo('factor_turnado')
+    def get_factor_turnado(self):
+        '''
+        Fracción de la duración del turno que corresponde a cada cauce según los modos de riego (turnado_c / dur_turno).
+        Sólo depende de las superficies de riego y de los modos, no del caudal ni de la duración del turno.
+        :return: Serie con el factor de turnado por cauce.
+        '''
+        sup_riego = self.get_sup_riego()
+        indice = self.get_indice_cauces()
+        cauce = indice['cauce_sg']
+        subgrupo = indice['subgrupo_sg']
+        f_g = sup_riego.subgrupo.reindex(subgrupo).to_numpy() / sup_riego.cauce.sum()
+        f_sg = sup_riego.cauce.reindex(cauce).to_numpy() / sup_riego.subgrupo.reindex(subgrupo).to_numpy()
+        caso_0, caso_1, caso_2 = _casos_modo(self.modos, cauce)
+        factor = np.select([caso_0, caso_1, caso_2], [f_g * f_sg, f_g, f_sg], 1.0)
+        ultimo_c = np.append(cauce[1:] != cauce[:-1], True) # rige el último subgrupo del cauce, como en set_modo_riego
+        return pd.Series(factor[ultimo_c], index=cauce[ultimo_c])
+
+    def simular_lote(self, caudal_canal, dur_turno, vol_riego_p_ha=None):
+        '''
+        Evalúa en bloque varios escenarios de caudal en cabecera, duración de turno y volumen programado por ha
+        sobre los agregados ya calculados de la red (sup_riego, tpo_red, refuerzo, reservorio y modos de riego).
+        Los parámetros pueden ser escalares o listas de igual largo; se combinan elemento a elemento (un escenario
+        por posición). Si simular == 1 los caudales se determinan con vol_riego_p_ha, como en get_caudal_riego().
+        :return: Diccionario con el DF de escenarios y los DF escenarios x cauces de caudal, turnado (días) y volumen.
+        '''
+        if vol_riego_p_ha is None:
+            vol_riego_p_ha = self.vol_riego_p_ha
+        caudal_canal, dur_turno, vol_riego_p_ha = np.broadcast_arrays(np.atleast_1d(np.asarray(caudal_canal, dtype=float)),
+                                                                       np.asarray(dur_turno, dtype=float),
+                                                                       np.asarray(vol_riego_p_ha, dtype=float))
+        sup_cauce = self.get_sup_riego().cauce.reindex(self.cauces.index).to_numpy()
+        factor = self.get_factor_turnado().reindex(self.cauces.index).to_numpy()
+        vol_riego_ha = self._calcula_vol_riego_ha(caudal_canal, dur_turno)
+
+        # Matrices escenarios x cauces
+        turnado = dur_turno[:, None] * factor[None, :]
+        volumen = sup_cauce[None, :] * vol_riego_ha[:, None]
+        if self.simular == 1:
+            caudal = ((vol_riego_p_ha[:, None] * sup_cauce[None, :]) / turnado) * (1 / self.f_escala)
+        else:
+            caudal = (volumen / turnado) * (1 / self.f_escala)
+
+        escenarios_df = pd.DataFrame({'caudal_canal': caudal_canal,
+                                      'dur_turno': dur_turno,
+                                      'vol_riego_p_ha': vol_riego_p_ha,
+                                      'vol_riego_ha': vol_riego_ha})
+        escenarios_df.index.name = 'escenario'
+        lote = {'escenarios': escenarios_df}
+        for nombre, matriz in (('caudal', caudal), ('turnado', turnado), ('volumen', volumen)):
+            lote[nombre] = pd.DataFrame(matriz, index=escenarios_df.index, columns=self.cauces.index)
+        return lote
+
+    def planificar_temporada(self, fechas, caudal_canal=None, dur_turno=None, refuerzo=None, reservorio=None,
+                             vol_riego_p_ha=None, arrastre=True):
+        '''
+        Planifica una secuencia de turnos (temporada) sobre la misma red, sin armar una redSecundaria por turno.
+        Los parámetros pueden ser escalares o listas del largo de fechas (un valor por turno); si no se indican se usan
+        los de la red. refuerzo y reservorio son los volúmenes disponibles en cada turno (por omisión, los de la inspección).
+        Los turnados y las fechas de inicio de cada cauce se programan por turno con su duración y su fecha, como en
+        set_modo_riego().
+        Con arrastre, el saldo de cada parcela (déficit positivo, excedente negativo) se suma al agua programada del turno
+        siguiente y el volumen y el tiempo de cada cauce se reparten entre sus parcelas en proporción a esa demanda.
+        Sin arrastre se reparten por sup_riego y cada turno coincide con get_cuadro_red() para los mismos parámetros.
+        :return: Diccionario con el DF de turnos (parámetros y totales), el DF de saldos acumulados
+        (parcelas x turnos) y el DF de cuadros de todos los turnos indexado por (turno, idPadron).
+        '''
+        fechas = pd.to_datetime(pd.Index(np.atleast_1d(fechas)), dayfirst = True)
+        cantidad = len(fechas)
+        def parametro(nombre, valor, defecto):
+            valor = np.asarray(defecto if valor is None else valor, dtype=float)
+            if valor.ndim and len(valor) not in (1, cantidad):
+                raise ValueError("%s debe tener un valor o uno por turno (%d turnos)" % (nombre, cantidad))
+            return np.broadcast_to(valor.ravel() if valor.ndim else valor, (cantidad,))
+        caudal_canal = parametro('caudal_canal', caudal_canal, self.caudal_canal)
+        dur_turno = parametro('dur_turno', dur_turno, self.dur_turno)
+        refuerzo = parametro('refuerzo', refuerzo, self.get_cap_refuerzo())
+        reservorio = parametro('reservorio', reservorio, self.get_reservorio())
+        vol_riego_p_ha = parametro('vol_riego_p_ha', vol_riego_p_ha, self.vol_riego_p_ha)
+        vol_riego_ha = self._calcula_vol_riego_ha(caudal_canal, dur_turno, refuerzo, reservorio)
+
+        # Parcelas en el orden de riego y datos de su cauce
+        padron = self._get_padron_ordenado()
+        cauce = padron['orden_cauce'].to_numpy()
+        indice = self.get_indice_cauces()
+        desplazamientos = indice['desplazamientos']
+        tramo = np.repeat(np.arange(len(indice['cauces'])), np.diff(desplazamientos)) # cauce de cada parcela (posición)
+        sup_riego = padron['sup_riego'].to_numpy()
+        sup_cauce = self.cauces.sup_riego.reindex(indice['cauces']).to_numpy()
+        encadena = np.concatenate([[False], cauce[1:] == cauce[:-1]])
+
+        # Turnado, duración e inicio de cada cauce en todos los turnos, con una sola programación sobre arreglos
+        # (turnos x cauces): cada turno con su volumen, su duración y su fecha, como set_modo_riego().
+        turnado, duracion, inicio_c = self._programa_temporada(vol_riego_ha, dur_turno, fechas)
+
+        # El reparto entre parcelas se hace turno por turno: con arrastre depende del saldo del turno previo.
+        saldo = np.zeros(len(padron))
+        saldos, cuadros, totales = [], [], []
+        for turno in range(cantidad):
+            # Agua programada de la parcela y reparto del volumen y el tiempo de cada cauce entre sus parcelas:
+            # sin arrastre por sup_riego, como en get_cuadro_red; con arrastre por la demanda (con el saldo previo).
+            lamina_p = (vol_riego_p_ha[turno] * sup_riego) / self.f_lamina
+            if arrastre:
+                peso = np.maximum(lamina_p + saldo, 0)
+                peso_cauce = np.bincount(tramo, weights=peso, minlength=len(sup_cauce))
+                sin_demanda = (peso_cauce <= 0)[tramo]
+                peso = np.where(sin_demanda, sup_riego, peso)
+                peso_cauce = np.bincount(tramo, weights=peso, minlength=len(sup_cauce))
+                participacion = np.divide(peso, peso_cauce[tramo], out=np.zeros(len(peso)), where=peso_cauce[tramo] > 0)
+                volumen = (sup_cauce * vol_riego_ha[turno])[tramo] * participacion
+            else:
+                participacion = sup_riego
+                volumen = sup_riego * vol_riego_ha[turno]
+            tiempo, inicio = _reparte_turnado(participacion, duracion[turno][tramo], inicio_c[turno][tramo], encadena)
+            if self.simular == 1:
+                caudal = ((vol_riego_p_ha[turno] * sup_cauce) / turnado[turno]) * (1 / self.f_escala)
+            else:
+                caudal = ((sup_cauce * vol_riego_ha[turno]) / turnado[turno]) * (1 / self.f_escala)
+
+            lamina_e = volumen / self.f_lamina
+            balance = lamina_p - lamina_e
+            saldo = (saldo if arrastre else 0) + balance
+            saldos.append(saldo)
+            cuadros.append(pd.DataFrame({'Cauce': cauce,
+                                         'CC': padron['CC'].to_numpy(),
+                                         'PP': padron['PP'].to_numpy(),
+                                         'Caudal': caudal[tramo],
+                                         'Volumen': volumen,
+                                         'Inicio': inicio,
+                                         'Tiempo': tiempo,
+                                         'Fin': inicio + tiempo,
+                                         'Agua Programada': lamina_p,
+                                         'Agua Entregada': lamina_e,
+                                         'Balance': balance,
+                                         'Saldo': saldo,
+                                         'id_parcela': padron['idPadron'].to_numpy()},
+                                        index=padron['idPadron']))
+            totales.append((lamina_p.sum(), lamina_e.sum(), volumen.sum(), saldo.sum()))
+
+        totales = np.array(totales).reshape(cantidad, 4)
+        turnos_df = pd.DataFrame({'fecha': fechas,
+                                  'caudal_canal': caudal_canal,
+                                  'dur_turno': dur_turno,
+                                  'refuerzo': refuerzo,
+                                  'reservorio': reservorio,
+                                  'vol_riego_p_ha': vol_riego_p_ha,
+                                  'vol_riego_ha': vol_riego_ha,
+                                  'agua_programada': totales[:, 0],
+                                  'agua_entregada': totales[:, 1],
+                                  'volumen': totales[:, 2],
+                                  'saldo': totales[:, 3]})
+        turnos_df.index.name = 'turno'
+        saldos_df = pd.DataFrame(np.array(saldos).reshape(cantidad, len(padron)).T, index=padron['idPadron'],
+                                 columns=turnos_df.index)
+        cuadros_df = pd.concat(cuadros, keys=turnos_df.index, names=['turno', 'idPadron']) if cantidad else pd.DataFrame()
+        return {'turnos': turnos_df, 'saldos': saldos_df, 'cuadros': cuadros_df}
+
+    @_memo('subpadron')
     def get_subpadron(self):
         '''
         Segmenta los padrones de cada cauce para ordenar en base a la estrategia de riego (cabeza_cola).
         :return: Diccionario con los padrones por cauce y ordenados.
         '''
-        self.subpadron = {}
+        # Cada cauce es un tramo del padrón ya ordenado por cauce y cabeza_cola (ver get_indice_cauces): sin copias.
+        padron = self._get_padron_ordenado()
+        indice = self.get_indice_cauces()
+        desplazamientos = indice['desplazamientos']
+        self.subpadron = {cauce: padron.iloc[desplazamientos[i]:desplazamientos[i + 1]]
+                          for i, cauce in enumerate(indice['cauces'])}
 
-        for cauce,dato in self.cauces_g:
-           # segmentación de padron y solicitudes en cauces. OK
-           self.subpadron[cauce] = self.cauces_g.get_group(cauce)
+        return self.subpadron
 
-           # ordenamiento de cada cauce por cabeza_cola. OK
-           self.subpadron[cauce] = self.subpadron[cauce].sort_index(ascending=self.cabeza_cola_bool[cauce])
+    def _programa_parcelas(self, padron):
+        '''
+        Tiempo de riego y fecha de inicio de cada parcela de un padrón ordenado que contiene cauces completos.
+        Cada parcela inicia al finalizar la parcela previa del mismo cauce, a partir del inicio del cauce en set_modo_riego(),
+        y la duración del cauce se reparte entre sus parcelas por sup_riego (ver _reparte_turnado).
+        :return: Arreglos timedelta64 (tiempo) y datetime64 (inicio) por parcela.
+        '''
+        cauce = padron['orden_cauce'].to_numpy()
+        modo_riego = self.set_modo_riego()
+        duracion = modo_riego.duracion_c.reindex(cauce).to_numpy()
+        inicio_c = modo_riego.inicio_c.reindex(cauce).to_numpy()
 
-        return self.subpadron
+        encadena = np.concatenate([[False], cauce[1:] == cauce[:-1]])
+        return _reparte_turnado(padron['sup_riego'].to_numpy(), duracion, inicio_c, encadena)
+
+    def _arma_cuadro_red(self, padron, tiempo, inicio):
+        '''
+        Completa el cuadro de la red con volumen, caudal y cuenta de agua a partir de los tiempos de cada parcela.
+        '''
+        cauce = padron['orden_cauce'].to_numpy()
+        sup_riego = padron['sup_riego'].to_numpy()
+        volumen = sup_riego * self.get_vol_riego_ha()
+        lamina_p = (self.vol_riego_p_ha * sup_riego) / self.f_lamina # lámina programada por parcela
+        lamina_e = volumen / self.f_lamina # lámina entregado por parcela en el turno
+
+        cuadro_red_df = pd.DataFrame({'Cauce': cauce,
+                                      'CC': padron['CC'].to_numpy(),
+                                      'PP': padron['PP'].to_numpy(),
+                                      'Caudal': self.get_caudal_riego().reindex(cauce).to_numpy(),
+                                      'Volumen': volumen,
+                                      'Inicio': inicio,
+                                      'Tiempo': tiempo,
+                                      'Fin': inicio + tiempo,
+                                      'Agua Programada': lamina_p,
+                                      'Agua Entregada': lamina_e,
+                                      'Balance': lamina_p - lamina_e,
+                                      'id_parcela': padron['idPadron'].to_numpy()},
+                                     index=padron['idPadron'])
+        return cuadro_red_df
+
+    @_memo('cuadro_red')
+    def get_cuadro_red(self):
+        '''
+        Genera en una sola pasada el cuadro de turno y la cuenta de agua de todas las parcelas de la red.
+        Las parcelas se ordenan por cauce y, dentro de cada cauce, por la estrategia de riego (cabeza_cola) igual que
+        en get_subpadron(). Inicio y Fin se obtienen con sumas acumuladas de los tiempos de riego dentro de cada cauce
+        a partir de la fecha de inicio del cauce en set_modo_riego().
+        :return: DF indexado por idPadron con Cauce, Caudal, Volumen, Inicio, Tiempo, Fin y la cuenta de agua.
+        '''
+        padron = self._get_padron_ordenado()
+        tiempo, inicio = self._programa_parcelas(padron)
+        return self._arma_cuadro_red(padron, tiempo, inicio)
+
+    @_memo('indice_turno')
+    def get_indice_turno(self):
+        '''
+        Índice de intervalos [Inicio, Fin) de las parcelas del cuadro de la red (ver intervalos.indiceIntervalos).
+        Las posiciones del índice son las filas de get_cuadro_red().
+        '''
+        cuadro_red = self.get_cuadro_red()
+        return indiceIntervalos(cuadro_red['Inicio'].to_numpy(), cuadro_red['Fin'].to_numpy())
+
+    def regando(self, desde, hasta=None, cauce=None, subgrupo=None, grupo=None):
+        '''
+        Parcelas que riegan en un instante (Inicio <= desde < Fin) o durante el rango [desde, hasta).
+        :param cauce, subgrupo, grupo: Filtros opcionales (un valor o una lista de valores).
+        :return: Filas de get_cuadro_red() encontradas, ordenadas por Inicio.
+        '''
+        desde = pd.Timestamp(desde)
+        hasta = None if hasta is None else pd.Timestamp(hasta)
+        if hasta is not None and hasta <= desde:
+            raise ValueError("El rango consultado debe terminar después de su inicio")
+        filas = self.get_indice_turno().consultar(desde, hasta)
+        padron = self._get_padron_ordenado()
+        for columna, valores in (('orden_cauce', cauce), ('Subgrupo', subgrupo), ('Grupo', grupo)):
+            if valores is not None:
+                filas = filas[np.isin(padron[columna].to_numpy()[filas], np.atleast_1d(valores))]
+        return self.get_cuadro_red().iloc[filas]
+
+    def actualizar_solicitud(self, cambios):
+        '''
+        Aplica cambios de algunas filas de la solicitud de riego a la red ya calculada.
+        Actualiza la sup_riego de esas parcelas y los agregados de cauces / subgrupos / grupos sumando sólo las diferencias.
+        Si el cuadro de la red ya estaba calculado, se vuelven a programar únicamente los cauces cuyo inicio, turnado o
+        superficie cambian; el resto conserva sus tiempos y sólo se actualizan volúmenes, caudales y cuenta de agua.
+        :param cambios: DF (o {columna: {índice: valor}}) con las filas modificadas de la solicitud, indexado como el padrón.
+        :return: Lista de cauces reprogramados.
+        '''
+        cambios = pd.DataFrame(cambios)
+        columnas = esquemas['solicitud']['columnas']
+        if cambios.index.dtype == object:
+            cambios.index = cambios.index.astype(self.solicitud.index.dtype)
+        desconocidas = [columna for columna in cambios.columns if columna not in columnas]
+        if desconocidas:
+            raise ValueError("Columnas desconocidas en la solicitud: %s" % ', '.join(map(str, desconocidas)))
+        if not cambios.index.isin(self.solicitud.index).all():
+            raise ValueError("La solicitud no tiene las filas: %s" %
+                             ', '.join(map(str, cambios.index[~cambios.index.isin(self.solicitud.index)])))
+        try:
+            cambios = cambios.astype({columna: columnas[columna] for columna in cambios.columns}).fillna(0)
+        except (TypeError, ValueError):
+            raise ValueError("Los cambios de la solicitud deben ser numéricos")
+
+        previo = {nodo: self._cache.get(nodo) for nodo in ('cuadro_red', 'modo_riego')}
+        sup_cauce_previa = self.cauces.sup_riego.copy()
+        agregados = dict(self._get_agregados())
+
+        # Copias propias: las tablas y agregados pueden estar compartidos con otras redes (con_parametros).
+        object.__setattr__(self, 'solicitud', self.solicitud.copy())
+        object.__setattr__(self, 'padron', self.padron.copy())
+        self.solicitud.loc[cambios.index, cambios.columns] = cambios
+
+        filas = cambios.index
+        superficies = ['sup_anexa', 'sup_pase', 'sup_riego']
+        sup_previa = self.padron.loc[filas, superficies]
+        solicitud = self.solicitud.loc[filas]
+        self.padron.loc[filas, 'sup_anexa'] = solicitud['sup_ad'] - solicitud['sup_res']
+        self.padron.loc[filas, 'sup_pase'] = solicitud['sup_rec'] - solicitud['sup_ced']
+        self.padron.loc[filas, 'sup_riego'] = (self.padron.loc[filas, 'sup_emp_reducida'] + self.padron.loc[filas, 'sup_anexa']
+                                               + self.padron.loc[filas, 'sup_pase']) \
+                                              * self.padron.loc[filas, 'ha_si'] * solicitud['ha_activa']
+        diferencia = self.padron.loc[filas, superficies] - sup_previa
+
+        # Agregados: suma de las diferencias por nivel
+        for nivel, clave in (('cauces', 'orden_cauce'), ('subgrupos', 'Subgrupo'), ('grupos', 'Grupo')):
+            suma = diferencia.groupby(self.padron.loc[filas, clave]).sum()
+            agregados[nivel] = agregados[nivel].copy()
+            agregados[nivel].loc[suma.index, superficies] += suma[superficies]
+        self._cache['agregados'] = agregados
+
+        # Se descartan los nodos que dependen de las superficies; tpo_red y el índice de cauces no cambian.
+        for nodo in ('sup_riego', 'padron_ordenado', 'subpadron', 'cuadro_red', 'indice_turno'):
+            self._cache.pop(nodo, None)
+        self.invalidar('sup_riego', 'padron_ordenado')
+
+        if previo['cuadro_red'] is None:
+            return list(self.cauces.index)
+
+        # Cauces cuyos tiempos cambian: inicio o turnado (a la resolución de la programación) distintos,
+        # o superficie de riego distinta.
+        modo_riego = self.set_modo_riego()
+        distinto = lambda nuevo, anterior: ~((nuevo == anterior) | (nuevo.isna() & anterior.isna()))
+        turnado = lambda modo: modo.duracion_c.reindex(modo_riego.index)
+        cambia = distinto(modo_riego.inicio_c, previo['modo_riego'].inicio_c.reindex(modo_riego.index)) \
+                 | distinto(turnado(modo_riego), turnado(previo['modo_riego']))
+        cambia = cambia.reindex(self.cauces.index, fill_value=True) \
+                 | distinto(self.cauces.sup_riego, sup_cauce_previa.reindex(self.cauces.index))
+        reprogramar = list(cambia.index[cambia])
+
+        padron = self._get_padron_ordenado()
+        tiempo = previo['cuadro_red']['Tiempo'].to_numpy().copy()
+        inicio = previo['cuadro_red']['Inicio'].to_numpy().copy()
+        en_cauces = np.isin(padron['orden_cauce'].to_numpy(), reprogramar)
+        if en_cauces.any():
+            tiempo[en_cauces], inicio[en_cauces] = self._programa_parcelas(padron[en_cauces])
+        self._cache['cuadro_red'] = self._arma_cuadro_red(padron, tiempo, inicio)
+        self.recalculos['cuadro_red_cauces'] += len(reprogramar)
+        return reprogramar
 
 class cuadroTurno:
 
     f_lamina = 10
 
-    def __init__(self, padron, tiempo, inicio, caudal, volumen, vol_riego_p_ha, volumen_tiempo = 1):
+    def __init__(self, padron, tiempo, inicio, caudal, volumen, vol_riego_p_ha, volumen_tiempo = 1, duracion = None):
         #Parámetros que se pasan desde red = redSecundaria().
         self.padron = padron.fillna(value=0) #red.get_subpadron()[cauce]
         self.inicio = inicio #red.set_modo_riego().inicio[cauce]
         self.caudal = caudal #red.get_caudal_riego(simular)[cauce] puede ser simulado o no.
         self.volumen = volumen #red.get_subpadron()[cauce].sup_riego * red.get_vol_riego_ha()
         self.tiempo = tiempo #red.get_subpadron()[cauce].sup_riego * red.get_tpo_riego_ha(). REVISAR: falta contemplar el tpo_red
+        self.duracion = duracion #red.set_modo_riego().duracion_c[cauce]. Si no se indica, la suma de tiempo en segundos enteros.
 
         #Parámetros propios de la clase.
         self.vol_riego_p_ha = vol_riego_p_ha #dato que se pasa al generar el turno.
@@ -316,35 +1242,30 @@ class cuadroTurno:
         Este alcance se pasará con la variable lista que se compone de
         la secuancia de superficies organizadas por orden de riego.
         '''
+        # el tiempo de riego asignado a la parcela se interpreta como su parte de la duración del cauce: el fin de cada
+        # parcela es el tiempo acumulado desde el inicio redondeado al segundo y su inicio es el fin de la parcela previa,
+        # como en get_cuadro_red (ver _reparte_turnado), sin acumular el redondeo de cada parcela.
+        peso = np.broadcast_to(np.asarray(self.tiempo, dtype=float), (len(self.padron),))
+        duracion = dias_a_duracion(np.nansum(peso)) if self.duracion is None else self.duracion
+        tiempo, inicio = _reparte_turnado(peso,
+                                          np.full(len(peso), np.timedelta64(duracion, 'ns')),
+                                          np.full(len(peso), np.datetime64(self.inicio, 'ns')),
+                                          np.arange(len(peso)) > 0)
+
         df_turno = pd.DataFrame({'CC': self.padron['CC'],
                                  'PP': self.padron['PP'],
                                  'Caudal': self.caudal,
                                  'Volumen': self.volumen,
-                                 'Inicio': pd.to_datetime('01-01-2020 00:00'),
-                                 'Tiempo': pd.to_timedelta(self.tiempo, unit = 'd'),
-                                 'Fin': pd.to_datetime('01-01-2020 00:00'),
+                                 'Tiempo': pd.Series(tiempo, index=self.padron.index),
                                  'id_parcela': self.padron['idPadron']
                                  }).reset_index(drop=True) #reinicia el indice del DF para unificar el criterio de asignación en cada subpadron
-
-        # el tiempo de riego asignado a la parcela se interpreta como timeoffset para la programación de inicio y fin de turno
-        df_turno.loc[0,'Inicio'] = self.inicio
-        df_turno.loc[0,'Fin'] = self.inicio + df_turno.loc[0,'Tiempo']
-
-        # Desarrollo de vector de fechas de inicio y fin a partir de los tiempos de riego aprovechando la operatorias con datos datetime
-        n = 1
-        while n in range(len(self.padron)):
-            df_turno.loc[n,'Fin'] = df_turno.loc[(n - 1),'Fin'] + df_turno.loc[n,'Tiempo']
-            df_turno.loc[n,'Inicio'] = df_turno.loc[(n - 1),'Fin']
-            n = n + 1
+        fin = pd.Series(inicio + tiempo)
+        inicio = pd.Series(inicio)
 
         #Convierto a string los datetime para la presentación en las vistas JS
         formato_la ='Fecha:%d-%m-%Y Hora:%H:%M'
-        n = 0
-        while n in range(len(self.padron)):
-            df_turno.loc[n,'Fin'] = df_turno.loc[n,'Fin'].strftime(formato_la)
-            df_turno.loc[n,'Inicio'] = df_turno.loc[n,'Inicio'].strftime(formato_la)
-            df_turno.loc[n, 'Tiempo'] = str(df_turno.loc[n, 'Tiempo']) #Esta conversión no es necesaria para el caso de JS
-            n = n + 1
+        df_turno.insert(4, 'Inicio', inicio.dt.strftime(formato_la))
+        df_turno.insert(6, 'Fin', fin.dt.strftime(formato_la))
 
         df_turno['Caudal'] = self.caudal
 
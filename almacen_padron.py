@@ -0,0 +1,123 @@
+#Almacén local del padrón por inspección en archivos columnares (Parquet), leídos con memory-map.
+#El padrón y sus atributos hidráulicos casi no cambian entre turnos: se importan una vez y las peticiones
+#sólo envían la solicitud y los parámetros del turno.
+import argparse
+import json
+import os
+import re
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from Clase_dis_sec_v3_1 import esquemas, leer_tabla
+
+#Directorio del almacén; se puede cambiar con la variable de entorno RIEGO_ALMACEN
+directorio = os.environ.get('RIEGO_ALMACEN', 'padrones')
+
+
+def _requiere_pyarrow():
+    if pq is None:
+        raise ImportError("El almacén de padrones requiere pyarrow (pip install pyarrow)")
+
+
+def ruta(inspeccion, carpeta=None):
+    '''
+    Archivo del padrón de la inspección en el almacén.
+    :raises ValueError: si el id de la inspección no es un nombre de archivo válido.
+    '''
+    inspeccion = str(inspeccion)
+    if not re.fullmatch(r'[\w\-]+', inspeccion):
+        raise ValueError("Id de inspección inválido: %r" % inspeccion)
+    return os.path.join(carpeta or directorio, inspeccion + '.parquet')
+
+
+def version(inspeccion, carpeta=None):
+    '''
+    Versión del padrón guardado (instante de modificación del archivo, ns); cambia al volver a importarlo.
+    :raises ValueError: si la inspección no está en el almacén.
+    '''
+    try:
+        return os.stat(ruta(inspeccion, carpeta)).st_mtime_ns
+    except FileNotFoundError:
+        raise ValueError("No existe el padrón de la inspección %s en el almacén" % inspeccion)
+
+
+def importar_padron(inspeccion, datos, carpeta=None):
+    '''
+    Valida el padrón contra su esquema (ver leer_tabla) y lo guarda en el almacén, reemplazando el anterior.
+    :param datos: Padrón en cualquiera de los formatos que acepta redSecundaria (JSON de DGI, dict, DataFrame).
+    :return: Ruta del archivo guardado.
+    '''
+    _requiere_pyarrow()
+    padron = leer_tabla(datos, 'padron')
+    destino = ruta(inspeccion, carpeta)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    # Se escribe en un archivo temporal y se renombra para que las lecturas concurrentes no vean un archivo a medias.
+    temporal = destino + '.tmp'
+    pq.write_table(pa.Table.from_pandas(padron, preserve_index=True), temporal)
+    os.replace(temporal, destino)
+    return destino
+
+
+def leer_padron(inspeccion, columnas=None, carpeta=None):
+    '''
+    Lee el padrón de la inspección con memory-map, sólo con las columnas indicadas
+    (por omisión, las del esquema del padrón).
+    :return: DF del padrón con su índice original.
+    :raises ValueError: si la inspección no está en el almacén.
+    '''
+    _requiere_pyarrow()
+    origen = ruta(inspeccion, carpeta)
+    if not os.path.exists(origen):
+        raise ValueError("No existe el padrón de la inspección %s en el almacén" % inspeccion)
+    columnas = list(columnas or esquemas['padron']['columnas'])
+    # read_pandas agrega a las columnas pedidas las del índice guardado en los metadatos de pandas (importar_padron),
+    # para que la solicitud se alinee con el padrón por clave y no por posición.
+    return pq.read_pandas(origen, columns=columnas, memory_map=True).to_pandas()
+
+
+def parcelas(inspeccion, carpeta=None):
+    '''
+    Cantidad de parcelas del padrón guardado, leída de los metadatos del archivo (sin leer las columnas).
+    :raises ValueError: si la inspección no está en el almacén.
+    '''
+    _requiere_pyarrow()
+    origen = ruta(inspeccion, carpeta)
+    if not os.path.exists(origen):
+        raise ValueError("No existe el padrón de la inspección %s en el almacén" % inspeccion)
+    return pq.ParquetFile(origen, memory_map=True).metadata.num_rows
+
+
+def inspecciones(carpeta=None):
+    '''
+    Ids de las inspecciones guardadas en el almacén.
+    '''
+    carpeta = carpeta or directorio
+    if not os.path.isdir(carpeta):
+        return []
+    return sorted(nombre[:-len('.parquet')] for nombre in os.listdir(carpeta) if nombre.endswith('.parquet'))
+
+
+if __name__ == "__main__":
+    argumentos = argparse.ArgumentParser(description='Almacén local de padrones por inspección.')
+    argumentos.add_argument('--directorio', help='directorio del almacén (por omisión RIEGO_ALMACEN o ./padrones)')
+    comandos = argumentos.add_subparsers(dest='comando', required=True)
+    importar = comandos.add_parser('importar', help='convierte el JSON del padrón de DGI al almacén')
+    importar.add_argument('inspeccion')
+    importar.add_argument('archivo', help='JSON del padrón, o cuerpo de /turno_riego con la clave padron')
+    comandos.add_parser('listar', help='lista las inspecciones del almacén')
+    args = argumentos.parse_args()
+
+    if args.comando == 'importar':
+        with open(args.archivo) as archivo:
+            datos = json.load(archivo)
+        if isinstance(datos, dict) and 'padron' in datos:
+            datos = datos['padron']
+        destino = importar_padron(args.inspeccion, datos, args.directorio)
+        print('%s: %d parcelas' % (destino, parcelas(args.inspeccion, args.directorio)))
+    else:
+        for inspeccion in inspecciones(args.directorio):
+            print(inspeccion)
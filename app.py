@@ -1,100 +1,348 @@
-import pandas as pd
-from flask import Flask
+import json
+from concurrent.futures import CancelledError
+from flask import Flask, Response, g, request, stream_with_context
 from flask_cors  import CORS
-from flask_restful import Api, Resource, reqparse
-from Clase_dis_sec_v3_1 import redSecundaria as rs
-from Clase_dis_sec_v3_1 import cuadroTurno as ct
+from flask_restful import Api, Resource, abort, reqparse
+from cache_lru import cacheLRU, clave_contenido, normalizar, vueloUnico
+import almacen_padron
+import instrumentacion
+from instrumentacion import medir
+from trabajos import colaLlena, colaTrabajos
+from turno_riego import (argumentos_turno, cache_redes, calcular_hidrograma, calcular_lote, calcular_parametro, calcular_temporada,
+                         calcular_turno, consultar_regando, huella_red, motores, obtener_red)
 
 
 app = Flask(__name__)
 api = Api(app)
 cors = CORS(app)
+
+#Cache de respuestas completas entre peticiones (por todos los parámetros)
+cache_respuestas = cacheLRU(capacidad=128 * 2**20)
+#Peticiones idénticas simultáneas (ej: todos abren la misma inspección al iniciar el turno) comparten un único cálculo
+vuelos_turno = vueloUnico()
+
+#Trabajos en segundo plano para inspecciones grandes. Las más chicas se calculan en la misma petición.
+cola_trabajos = colaTrabajos(max_pendientes=32)
+umbral_asincrono = 2 * 2**20 #bytes del padrón a partir de los cuales se acepta el modo asincrónico
+bytes_parcela = 128 #tamaño aproximado de una parcela en el JSON del padrón, para medir los padrones del almacén
+
+@app.before_request
+def registrar_etapas():
+  #Con el encabezado X-Server-Timing la respuesta informa el tiempo de cada etapa (Server-Timing)
+  if 'X-Server-Timing' in request.headers:
+    g.registro_etapas = instrumentacion.iniciar_registro()
+
+@app.after_request
+def informar_etapas(response):
+  if 'registro_etapas' in g:
+    registro = instrumentacion.terminar_registro(g.pop('registro_etapas'))
+    if registro:
+      response.headers['Server-Timing'] = instrumentacion.server_timing(registro)
+  return response
+
+def tabla(valor):
+  #Tipo de argumento para las tablas de la red: texto JSON o el objeto/arreglos ya decodificados del cuerpo JSON.
+  return valor
+
+#Esquema de /turno_riego y /trabajos: se declara una sola vez al importar el módulo y cada petición sólo lo aplica
+#(parse_args no modifica el parser, así que puede compartirse entre peticiones e hilos).
 parser = reqparse.RequestParser()
+parser.add_argument('padron', type=tabla)
+parser.add_argument('inspeccion', type=str)
+parser.add_argument('refuerzos', type=tabla)
+parser.add_argument('solicitud', type=tabla)
+parser.add_argument('reservorio', type=tabla)
+parser.add_argument('modos', type=tabla)
+parser.add_argument('caudal', type=int)
+parser.add_argument('turno', type=int)
+parser.add_argument('fecha', type=str)
+parser.add_argument('simular', type=int)
+parser.add_argument('vol_riego_p_ha', type=int)
+parser.add_argument('json_anidado', type=int, default=0)
+parser.add_argument('asincrono', type=int, default=0)
+parser.add_argument('motor', type=str, default='pandas', choices=motores)
+
+#Tablas que las vistas previas reciben separadas por cauce (ver anidar)
+tablas_por_cauce = ('cuentaAgua', 'cuadro')
+
+def componer_json(fragmentos):
+  #Compone un único documento JSON con los fragmentos ya serializados por pandas (to_json), sin volver a codificarlos.
+  return '{' + ','.join('%s:%s' % (json.dumps(clave), fragmento) for clave, fragmento in fragmentos.items()) + '}'
+
+def anidar_por_cauce(fragmento):
+  #Formato previo del cuadro y la cuenta de agua: por cauce, un string JSON con sus filas (por id_parcela)
+  cauces = {}
+  for clave, fila in json.loads(fragmento).items():
+    cauces.setdefault(fila['Cauce'], {})[clave] = fila
+  return {cauce: json.dumps(filas) for cauce, filas in cauces.items()}
+
+def anidar(fragmentos):
+  #json_anidado=1 mantiene el formato previo para las vistas existentes: cada tabla como string JSON dentro del JSON,
+  #y el cuadro y la cuenta de agua separados por cauce.
+  return {clave: anidar_por_cauce(fragmento) if clave in tablas_por_cauce else fragmento
+          for clave, fragmento in fragmentos.items()}
+
+def responder(fragmentos, json_anidado=0):
+  if json_anidado == 1:
+    return anidar(fragmentos)
+  return Response(componer_json(fragmentos), mimetype='application/json')
+
+def leer_argumentos():
+  with medir('peticion'):
+    return parser.parse_args()
+
+def enviar_trabajo(args):
+  #Encola el cálculo del turno en el pool de procesos y responde con el id del trabajo
+  try:
+    id_trabajo = cola_trabajos.enviar(calcular_turno, dict(args), json_anidado=args['json_anidado'])
+  except colaLlena as error:
+    abort(503, message=str(error))
+  return {"id": id_trabajo, "estado": "pendiente"}, 202
+
+def tamano_padron(args):
+  #Bytes del padrón de la petición. Si se lee del almacén, se estiman por la cantidad de parcelas guardadas.
+  if args['padron'] is None and args['inspeccion'] is not None:
+    return almacen_padron.parcelas(args['inspeccion']) * bytes_parcela
+  return len(normalizar(args['padron']))
+
+def calcular_y_guardar(clave, args):
+  #Se guarda antes de terminar el vuelo: las peticiones que llegan después lo encuentran en el cache
+  response = calcular_turno(args)
+  cache_respuestas.guardar(clave, response)
+  return response
 
 class REST(Resource):
   def post (self):
-    parser.add_argument('padron', type=str)
-    parser.add_argument('refuerzos', type=str)
-    parser.add_argument('solicitud', type=str)
-    parser.add_argument('reservorio', type=str)
-    parser.add_argument('modos', type=str)
-    parser.add_argument('caudal', type=int)
-    parser.add_argument('turno', type=int)
-    parser.add_argument('fecha', type=str)
-    parser.add_argument('simular', type=int)
-    parser.add_argument('vol_riego_p_ha', type=int)
-    args = parser.parse_args()
-    
-    #Parametros para conformar la red secundaria
-    padron = args['padron']
-    refuerzo = args['refuerzos']
-    solicitud = args['solicitud']
-    reservorio = args['reservorio']
-    modos = args['modos']
-    caudal_cabecera = args['caudal']
-    dur_turno = args['turno']
-    fecha_inicio = args['fecha']
-    simular = args['simular']
-
-    #Parametros para el turnado
-    vol_riego_p_ha = args['vol_riego_p_ha']
-
-    red = rs(padron=padron,
-             refuerzo=refuerzo,
-             solicitud=solicitud,
-             reservorio=reservorio,
-             modos=modos,
-             caudal_canal=caudal_cabecera,
-             dur_turno=dur_turno,
-             fecha_inicio=fecha_inicio,
-             vol_riego_p_ha=vol_riego_p_ha,
-             simular = simular
-             )
-
-    turno = {}
-    cuadro_turno = {}
-    cuenta_agua = {}
-
-    for cauce, datos in self.cauces_g:
-      turno[cauce] = ct(padron=red.get_subpadron()[cauce],
-                        inicio=red.set_modo_riego().inicio_c[cauce],
-                        volumen=red.get_subpadron()[cauce].sup_riego * red.get_vol_riego_ha(),
-                        tiempo=red.get_subpadron()[cauce].sup_riego * (red.set_modo_riego().turnado_c[1:] / red.cauces_g.sup_riego.sum())[cauce],
-                        caudal=red.get_caudal_riego()[cauce],
-                        vol_riego_p_ha=vol_riego_p_ha
-                        )
-
-      cuadro_turno[cauce] = turno[cauce].set_turno_riego()
-      cuenta_agua[cauce] = turno[cauce].set_cuenta_agua()
-    
-    #Genera salidas de datos
-    cuadro = cuadro_turno
-    cuentaAgua = cuenta_agua
-    cuadroCaudales = pd.DataFrame({'Caudal':red.get_caudal_riego()[1:],
-                                   'Tpo de Turnado':pd.to_timedelta(red.set_modo_riego().turnado_c[1:], unit='d'),
-                                   'Sup de Riego':red.get_sup_riego().cauce}).to_json(orient = 'index')
-    cuadroGeneral = pd.DataFrame({'Sup empadronada': red.cauces_g.sup_emp_reducida.sum(),
-                          'Sup de distribucion': red.cauces_g.sup_riego.sum() - (red.cauces_g.sup_anexa.sum() + red.cauces_g.sup_pase.sum()),
-                          'Sup de riego': red.cauces_g.sup_riego.sum(),
-                          'Ctd de padrones': red.cauces_g.PP.count(),
-                          'Tiempo de red': red.get_tpo_red(),
-                          'Tpo x ha': pd.to_timedelta(red.set_modo_riego().turnado_c[1:] / red.cauces_g.sup_riego.sum(),unit='d'),
-                          'Inicio': red.set_modo_riego().inicio_c[1:],
-                          'Duracion': pd.to_timedelta(red.set_modo_riego().turnado_c[1:], unit='d'),
-                          'Fin': red.set_modo_riego().inicio_c[1:]+pd.to_timedelta(red.set_modo_riego().turnado_c[1:], unit='d'),
-                          'Vol x ha': red.get_vol_riego().cauce / red.cauces_g.sup_riego.sum(),
-                          'Volumen': red.get_vol_riego().cauce,
-                          #'Compensacion': red.cauces_g.fc.sum(),
-                          'Coef de riego': red.get_caudal_riego()[1:] / red.cauces_g.sup_riego.sum(),
-                          'Caudal': red.get_caudal_riego()[1:]
-                          }).to_json(orient = 'index')
-    
-    #Compone los datos para la vista
-    response = { "cuentaAgua": cuentaAgua, "cuadro": cuadro, "caudales": cuadroCaudales, "dashboard": cuadroGeneral}
-    return response
+    args = leer_argumentos()
+    try:
+      if args['asincrono'] == 1 and tamano_padron(args) >= umbral_asincrono:
+        return enviar_trabajo(args)
+      clave = clave_contenido(*huella_red(args), *(args[argumento] for argumento in argumentos_turno), args['motor'])
+    except ValueError as error:
+      abort(400, message=str(error))
+    response = cache_respuestas.obtener(clave)
+    if response is None:
+      try:
+        response = vuelos_turno.ejecutar(clave, lambda: calcular_y_guardar(clave, args))
+      except ValueError as error:
+        #Errores de esquema en las tablas de entrada
+        abort(400, message=str(error))
+    return responder(response, args['json_anidado'])
 
 api.add_resource(REST, '/turno_riego')
 
+parser_lote = reqparse.RequestParser()
+parser_lote.add_argument('padron', type=tabla)
+parser_lote.add_argument('inspeccion', type=str)
+parser_lote.add_argument('refuerzos', type=tabla)
+parser_lote.add_argument('solicitud', type=tabla)
+parser_lote.add_argument('reservorio', type=tabla)
+parser_lote.add_argument('modos', type=tabla)
+parser_lote.add_argument('caudal', type=float, action='append', required=True)
+parser_lote.add_argument('turno', type=float, action='append', required=True)
+parser_lote.add_argument('fecha', type=str)
+parser_lote.add_argument('simular', type=int, default=0)
+parser_lote.add_argument('vol_riego_p_ha', type=float, action='append')
+parser_lote.add_argument('json_anidado', type=int, default=0)
+
+class SimulacionLote(Resource):
+  def post (self):
+    #Evalúa en una sola petición todos los escenarios (listas de caudal / turno / vol_riego_p_ha) del simulador
+    args = parser_lote.parse_args()
+    if args['simular'] == 1 and not args['vol_riego_p_ha']:
+      #Con simular=1 los caudales salen de vol_riego_p_ha: sin él todos los escenarios darían caudal 0
+      abort(400, message="simular=1 requiere vol_riego_p_ha")
+    vol_riego_p_ha = args['vol_riego_p_ha'] or [0]
+    try:
+      red = obtener_red(args,
+                        caudal_canal=args['caudal'][0],
+                        dur_turno=args['turno'][0],
+                        vol_riego_p_ha=vol_riego_p_ha[0])
+    except ValueError as error:
+      abort(400, message=str(error))
+    lote = red.simular_lote(args['caudal'], args['turno'], vol_riego_p_ha)
+
+    response = {nombre: datos.to_json(orient = 'index') for nombre, datos in lote.items()}
+    return responder(response, args['json_anidado'])
+
+api.add_resource(SimulacionLote, '/simulacion_lote')
+
+parser_hidrograma = reqparse.RequestParser()
+parser_hidrograma.add_argument('padron', type=tabla)
+parser_hidrograma.add_argument('inspeccion', type=str)
+parser_hidrograma.add_argument('refuerzos', type=tabla)
+parser_hidrograma.add_argument('solicitud', type=tabla)
+parser_hidrograma.add_argument('reservorio', type=tabla)
+parser_hidrograma.add_argument('modos', type=tabla)
+parser_hidrograma.add_argument('caudal', type=int)
+parser_hidrograma.add_argument('turno', type=int)
+parser_hidrograma.add_argument('fecha', type=str)
+parser_hidrograma.add_argument('simular', type=int)
+parser_hidrograma.add_argument('vol_riego_p_ha', type=int)
+parser_hidrograma.add_argument('intervalo', type=str)
+parser_hidrograma.add_argument('como', type=str, default='media', choices=('media', 'maximo'))
+parser_hidrograma.add_argument('json_anidado', type=int, default=0)
+
+class Hidrograma(Resource):
+  def post (self):
+    #Caudal demandado en cabecera a lo largo del turno, su pico y los tramos que superan el caudal del canal
+    args = parser_hidrograma.parse_args()
+    try:
+      response = calcular_hidrograma(args, args['intervalo'], args['como'])
+    except ValueError as error:
+      abort(400, message=str(error))
+    return responder(response, args['json_anidado'])
+
+api.add_resource(Hidrograma, '/hidrograma')
+
+parser_regando = parser_hidrograma.copy()
+parser_regando.remove_argument('intervalo')
+parser_regando.remove_argument('como')
+parser_regando.add_argument('desde', type=str, required=True)
+parser_regando.add_argument('hasta', type=str)
+parser_regando.add_argument('cauce', type=int, action='append')
+parser_regando.add_argument('subgrupo', type=int, action='append')
+parser_regando.add_argument('grupo', type=int, action='append')
+
+class Regando(Resource):
+  def post (self):
+    #Parcelas que riegan en un instante (desde) o en un rango (desde / hasta), filtradas por cauce / subgrupo / grupo
+    args = parser_regando.parse_args()
+    try:
+      response = consultar_regando(args, args['desde'], args['hasta'], args['cauce'], args['subgrupo'], args['grupo'])
+    except ValueError as error:
+      abort(400, message=str(error))
+    return responder(response, args['json_anidado'])
+
+api.add_resource(Regando, '/regando')
+
+parser_temporada = parser_regando.copy()
+for argumento in ('desde', 'hasta', 'cauce', 'subgrupo', 'grupo'):
+  parser_temporada.remove_argument(argumento)
+parser_temporada.add_argument('fechas', type=str, action='append', required=True)
+parser_temporada.add_argument('caudales', type=float, action='append')
+parser_temporada.add_argument('turnos', type=float, action='append')
+parser_temporada.add_argument('refuerzo_disponible', type=float, action='append')
+parser_temporada.add_argument('reservorio_disponible', type=float, action='append')
+parser_temporada.add_argument('vol_riego_p_ha_turnos', type=float, action='append')
+parser_temporada.add_argument('arrastre', type=int, default=1)
+
+class Temporada(Resource):
+  def post (self):
+    #Planifica varios turnos (fechas con sus caudales, duraciones y refuerzos) arrastrando el saldo de cada parcela
+    args = parser_temporada.parse_args()
+    try:
+      response = calcular_temporada(args, args['fechas'], args['caudales'], args['turnos'], args['refuerzo_disponible'],
+                                    args['reservorio_disponible'], args['vol_riego_p_ha_turnos'], args['arrastre'])
+    except ValueError as error:
+      abort(400, message=str(error))
+    return responder(response, args['json_anidado'])
+
+api.add_resource(Temporada, '/temporada')
+
+parser_resolver = parser_hidrograma.copy()
+parser_resolver.remove_argument('intervalo')
+parser_resolver.remove_argument('como')
+parser_resolver.add_argument('variable', type=str, default='caudal', choices=('caudal', 'turno'))
+parser_resolver.add_argument('objetivo', type=float)
+parser_resolver.add_argument('objetivo_cauces', type=tabla)
+
+class Resolver(Resource):
+  def post (self):
+    #Caudal en cabecera o duración de turno necesarios para un volumen por ha (por omisión vol_riego_p_ha), en una sola evaluación
+    args = parser_resolver.parse_args()
+    try:
+      response = calcular_parametro(args, args['variable'], args['objetivo'], args['objetivo_cauces'])
+    except ValueError as error:
+      abort(400, message=str(error))
+    return responder(response, args['json_anidado'])
+
+api.add_resource(Resolver, '/resolver')
+
+parser_inspecciones = reqparse.RequestParser()
+parser_inspecciones.add_argument('inspecciones', type=tabla, action='append', required=True)
+parser_inspecciones.add_argument('json_anidado', type=int, default=0)
+
+def linea_lote(tarea, json_anidado=0):
+  #Una línea NDJSON por inspección; el resultado se empalma ya serializado, igual que en responder()
+  resultado = tarea.pop('resultado')
+  linea = json.dumps(tarea)
+  if resultado is not None:
+    linea = linea[:-1] + ', "resultado": ' + (json.dumps(anidar(resultado)) if json_anidado == 1 else componer_json(resultado)) + '}'
+  return linea + '\n'
+
+class TurnoLote(Resource):
+  def post (self):
+    #Calcula el turno de todas las inspecciones en paralelo y devuelve cada una (NDJSON) a medida que termina
+    args = parser_inspecciones.parse_args()
+    if not all(isinstance(inspeccion, dict) for inspeccion in args['inspecciones']):
+      abort(400, message="Cada inspección debe ser un objeto con los argumentos de /turno_riego")
+    try:
+      tareas = calcular_lote(args['inspecciones'], cola_trabajos)
+    except colaLlena as error:
+      abort(503, message=str(error))
+    lineas = (linea_lote(tarea, args['json_anidado']) for tarea in tareas)
+    return Response(stream_with_context(lineas), mimetype='application/x-ndjson')
+
+api.add_resource(TurnoLote, '/turno_riego_lote')
+
+class Trabajos(Resource):
+  def post(self):
+    #Envía el cálculo del turno como trabajo en segundo plano, sin importar el tamaño de la inspección
+    return enviar_trabajo(leer_argumentos())
+api.add_resource(Trabajos, '/trabajos')
+
+class Trabajo(Resource):
+  def get(self, id_trabajo):
+    estado = cola_trabajos.estado(id_trabajo)
+    if estado is None:
+      abort(404, message="No existe el trabajo %s" % id_trabajo)
+    return estado
+
+  def delete(self, id_trabajo):
+    try:
+      cancelado = cola_trabajos.cancelar(id_trabajo)
+    except KeyError:
+      abort(404, message="No existe el trabajo %s" % id_trabajo)
+    if not cancelado:
+      abort(409, message="El trabajo %s ya está en ejecución o terminado" % id_trabajo)
+    return cola_trabajos.estado(id_trabajo)
+api.add_resource(Trabajo, '/trabajos/<id_trabajo>')
+
+class ResultadoTrabajo(Resource):
+  def get(self, id_trabajo):
+    estado = cola_trabajos.estado(id_trabajo)
+    if estado is None:
+      abort(404, message="No existe el trabajo %s" % id_trabajo)
+    if estado['estado'] in ('pendiente', 'ejecutando'):
+      return estado, 202
+    try:
+      response = cola_trabajos.resultado(id_trabajo)
+    except CancelledError:
+      abort(410, message="El trabajo %s fue cancelado" % id_trabajo)
+    except ValueError as error:
+      abort(400, message=str(error))
+    except Exception as error:
+      abort(500, message=str(error))
+    return responder(response, cola_trabajos.obtener(id_trabajo)['json_anidado'])
+api.add_resource(ResultadoTrabajo, '/trabajos/<id_trabajo>/resultado')
+
+class Cache(Resource):
+  def get(self):
+    #Contadores de aciertos / fallos / desalojos para dimensionar los caches y de peticiones agrupadas en un mismo cálculo
+    return {"redes": cache_redes.estadisticas(), "respuestas": cache_respuestas.estadisticas(),
+            "agrupadas": vuelos_turno.estadisticas()}
+api.add_resource(Cache, '/cache')
+
+class Metricas(Resource):
+  def get(self):
+    #Histogramas de duración por etapa (lectura, nodos de redSecundaria, serialización) acumulados desde el inicio
+    return {"habilitada": instrumentacion.habilitada,
+            "memoria": instrumentacion.memoria,
+            "limites": [str(limite) for limite in instrumentacion.limites],
+            "etapas": instrumentacion.metricas.estadisticas()}
+api.add_resource(Metricas, '/metrics')
+
 class Helloworld(Resource):
   def get(self):
     return { "data": "Hola vieja" }
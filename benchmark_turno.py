@@ -0,0 +1,300 @@
+#Benchmark de escalamiento del cálculo del turno: tiempo y memoria pico por etapa, con comparación contra una línea base.
+import argparse
+import json
+import platform
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from Clase_dis_sec_v3_1 import cuadroTurno, redSecundaria as rs
+from generador_padron import generar_inspeccion, payload_turno
+import motor_numpy
+
+parametros_turno = {'caudal_canal': 1500, 'dur_turno': 7, 'fecha_inicio': '01-03-2022', 'vol_riego_p_ha': 800, 'simular': 0}
+
+
+def _cuadros_turno(red):
+    #Cuadro de turno y cuenta de agua por cauce con cuadroTurno, como se armaban antes de get_cuadro_red
+    subpadron = red.get_subpadron()
+    modo_riego = red.set_modo_riego()
+    tiempo_ha = modo_riego.turnado_c[1:] / red.cauces.sup_riego
+    for cauce in subpadron:
+        turno = cuadroTurno(padron=subpadron[cauce],
+                            inicio=modo_riego.inicio_c[cauce],
+                            volumen=subpadron[cauce].sup_riego * red.get_vol_riego_ha(),
+                            tiempo=subpadron[cauce].sup_riego * tiempo_ha[cauce],
+                            caudal=red.get_caudal_riego()[cauce],
+                            vol_riego_p_ha=red.vol_riego_p_ha,
+                            duracion=modo_riego.duracion_c[cauce])
+        turno.set_turno_riego()
+        turno.set_cuenta_agua()
+
+
+def etapas(inspeccion):
+    '''
+    Etapas a medir: (nombre, preparar, medir). preparar() arma el estado previo sin medirlo
+    (ej: una red con los nodos de los que depende la etapa ya calculados) y medir(estado) ejecuta la etapa.
+    '''
+    datos = dict(inspeccion, **parametros_turno)
+
+    def red(*metodos):
+        def preparar():
+            red = rs(**datos)
+            for metodo in metodos:
+                getattr(red, metodo)()
+            return red
+        return preparar
+
+    def cliente():
+        import app
+        app.cache_respuestas.limpiar()
+        app.cache_redes.limpiar()
+        return app.app.test_client()
+
+    payload = _payload(inspeccion)
+
+    def post(cliente, motor='pandas'):
+        respuesta = cliente.post('/turno_riego', json=dict(payload, motor=motor))
+        if respuesta.status_code != 200:
+            raise RuntimeError('REST.post respondió %d: %s' % (respuesta.status_code, respuesta.data[:200]))
+
+    return [('redSecundaria.__init__', lambda: None, lambda _: rs(**datos)),
+            ('get_vol_riego', red('get_sup_riego', 'get_tpo_red'), lambda red: red.get_vol_riego()),
+            ('set_modo_riego', red('get_vol_riego'), lambda red: red.set_modo_riego()),
+            ('get_caudal_riego', red('set_modo_riego'), lambda red: red.get_caudal_riego()),
+            ('get_subpadron', red(), lambda red: red.get_subpadron()),
+            ('cuadroTurno', red('get_subpadron', 'get_caudal_riego'), _cuadros_turno),
+            ('get_cuadro_red', red('get_caudal_riego'), lambda red: red.get_cuadro_red()),
+            ('REST.post', cliente, post),
+            ('motor_numpy', lambda: None, lambda _: motor_numpy.calcular_turno(**_argumentos_motor(datos))),
+            ('REST.post numpy', cliente, lambda cliente: post(cliente, 'numpy'))]
+
+
+def _payload(inspeccion):
+    return payload_turno(inspeccion, caudal=parametros_turno['caudal_canal'], turno=parametros_turno['dur_turno'],
+                         fecha=parametros_turno['fecha_inicio'], vol_riego_p_ha=parametros_turno['vol_riego_p_ha'])
+
+
+def _argumentos_motor(datos):
+    return {'padron': datos['padron'], 'solicitud': datos['solicitud'], 'modos': datos['modos'],
+            'refuerzo': datos['refuerzo'], 'reservorio': datos['reservorio'], 'caudal_canal': datos['caudal_canal'],
+            'dur_turno': datos['dur_turno'], 'fecha_inicio': datos['fecha_inicio'],
+            'vol_riego_p_ha': datos['vol_riego_p_ha'], 'simular': datos['simular']}
+
+
+def verificar_motores(inspeccion, tolerancia=1e-9):
+    '''
+    Compara el cuadro de la red del motor numpy con el de redSecundaria (simular 0 y 1) para los parámetros del benchmark.
+    Los agregados por cauce se suman en otro orden que en pandas: se admite una diferencia relativa de tolerancia en
+    los valores y de 1 µs en tiempos y fechas.
+    :return: Lista de diferencias (texto), vacía si los motores coinciden.
+    '''
+    diferencias = []
+    for simular in (0, 1):
+        datos = dict(inspeccion, **dict(parametros_turno, simular=simular))
+        cuadro_red = rs(**datos).get_cuadro_red()
+        turno = motor_numpy.calcular_turno(**_argumentos_motor(datos))
+        for columna in ('Cauce', 'CC', 'PP', 'Caudal', 'Volumen', 'Inicio', 'Tiempo', 'Agua Programada', 'Agua Entregada', 'Balance'):
+            esperado, obtenido = cuadro_red[columna].to_numpy(), turno[columna]
+            if esperado.dtype.kind in 'mM':
+                iguales = (np.isnat(esperado) & np.isnat(obtenido)) | \
+                          (abs((esperado - obtenido).astype('int64')) <= 1000)
+            else:
+                iguales = np.isclose(esperado, obtenido, rtol=tolerancia, atol=0, equal_nan=True)
+            if len(esperado) != len(obtenido) or not iguales.all():
+                diferencias.append('simular=%d %s: %d filas distintas' % (simular, columna, (~iguales).sum()
+                                                                            if len(esperado) == len(obtenido) else -1))
+    return diferencias
+
+
+def medir(preparar, funcion, repeticiones=3):
+    '''
+    Mediana del tiempo de ejecución (s) en repeticiones y memoria pico (bytes, tracemalloc) en una corrida aparte,
+    para que el seguimiento de memoria no altere los tiempos.
+    '''
+    tiempos = []
+    for _ in range(repeticiones):
+        estado = preparar()
+        inicio = time.perf_counter()
+        funcion(estado)
+        tiempos.append(time.perf_counter() - inicio)
+
+    estado = preparar()
+    tracemalloc.start()
+    try:
+        funcion(estado)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return statistics.median(tiempos), pico
+
+
+def ejecutar(tamanos, repeticiones=3, filtro=None, **generador):
+    '''
+    Corre todas las etapas para cada cantidad de parcelas.
+    :return: Lista de resultados {parcelas, etapa, tiempo, memoria_pico}.
+    '''
+    resultados = []
+    for parcelas in tamanos:
+        inspeccion = generar_inspeccion(parcelas=parcelas, **generador)
+        for etapa, preparar, funcion in etapas(inspeccion):
+            if filtro and etapa not in filtro:
+                continue
+            tiempo, pico = medir(preparar, funcion, repeticiones)
+            resultados.append({'parcelas': parcelas, 'etapa': etapa, 'tiempo': tiempo, 'memoria_pico': pico})
+            print('%8d  %-24s %10.4f s %10.1f MB' % (parcelas, etapa, tiempo, pico / 2**20), file=sys.stderr)
+    return resultados
+
+
+def comparar(resultados, base, tolerancia=0.2):
+    '''
+    Compara los tiempos contra una corrida base (mismas parcelas y etapa).
+    :return: Lista de regresiones: etapas cuyo tiempo supera al de la base en más de la tolerancia (proporción).
+    '''
+    tiempos_base = {(fila['parcelas'], fila['etapa']): fila for fila in base['resultados']}
+    regresiones = []
+    for fila in resultados:
+        previa = tiempos_base.get((fila['parcelas'], fila['etapa']))
+        if previa is None or previa['tiempo'] <= 0:
+            continue
+        fila['relacion_base'] = fila['tiempo'] / previa['tiempo']
+        fila['memoria_relacion_base'] = fila['memoria_pico'] / previa['memoria_pico'] if previa['memoria_pico'] else None
+        if fila['relacion_base'] > 1 + tolerancia:
+            regresiones.append(fila)
+    return regresiones
+
+
+def soak(inspeccion, solicitudes=100000, ventana=10000, motor='pandas'):
+    '''
+    Carga sostenida sobre /turno_riego con la misma petición repetida. Desde la segunda se responde con el cache de
+    respuestas, así que domina el costo fijo de cada petición (lectura de argumentos, clave del cache, respuesta).
+    Por cada ventana de solicitudes informa la latencia mediana y p95, la memoria residente máxima del proceso
+    (ru_maxrss, KB en Linux) y la cantidad de argumentos del parser, que deben mantenerse planas.
+    :return: Lista de ventanas {solicitudes, latencia_mediana, latencia_p95, memoria_rss, argumentos_parser}.
+    '''
+    import app
+    app.cache_respuestas.limpiar()
+    cliente = app.app.test_client()
+    payload = dict(_payload(inspeccion), motor=motor)
+    ventanas, tiempos = [], []
+    for solicitud in range(1, solicitudes + 1):
+        inicio = time.perf_counter()
+        respuesta = cliente.post('/turno_riego', json=payload)
+        tiempos.append(time.perf_counter() - inicio)
+        if respuesta.status_code != 200:
+            raise RuntimeError('REST.post respondió %d: %s' % (respuesta.status_code, respuesta.data[:200]))
+        if solicitud % ventana == 0 or solicitud == solicitudes:
+            ventanas.append({'solicitudes': solicitud,
+                             'latencia_mediana': statistics.median(tiempos),
+                             'latencia_p95': float(np.percentile(tiempos, 95)),
+                             'memoria_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                             'argumentos_parser': len(app.parser.args)})
+            print('%8d  %10.3f ms  p95 %8.3f ms %10.1f MB  %d argumentos' %
+                  (solicitud, ventanas[-1]['latencia_mediana'] * 1e3, ventanas[-1]['latencia_p95'] * 1e3,
+                   ventanas[-1]['memoria_rss'] / 2**10, ventanas[-1]['argumentos_parser']), file=sys.stderr)
+            tiempos = []
+    return ventanas
+
+
+def crecimiento_soak(ventanas, tolerancia=0.2):
+    '''
+    Compara la última ventana del soak con la primera.
+    :return: Lista de crecimientos (texto): latencia mediana o memoria por encima de la tolerancia (proporción),
+    o un parser que cambió de tamaño entre peticiones. Vacía si el servidor se mantiene plano.
+    '''
+    if len(ventanas) < 2:
+        return []
+    primera, ultima = ventanas[0], ventanas[-1]
+    crecimientos = []
+    for medida in ('latencia_mediana', 'memoria_rss'):
+        if primera[medida] > 0 and ultima[medida] / primera[medida] > 1 + tolerancia:
+            crecimientos.append('%s x%.2f' % (medida, ultima[medida] / primera[medida]))
+    if ultima['argumentos_parser'] != primera['argumentos_parser']:
+        crecimientos.append('argumentos_parser %d -> %d' % (primera['argumentos_parser'], ultima['argumentos_parser']))
+    return crecimientos
+
+
+def entorno():
+    return {'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'plataforma': platform.platform(),
+            'fecha': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+if __name__ == "__main__":
+    argumentos = argparse.ArgumentParser(description='Benchmark por etapas del cálculo del turno de riego.')
+    argumentos.add_argument('--parcelas', default='100,1000,10000,100000', help='cantidades de parcelas separadas por coma')
+    argumentos.add_argument('--cauces', type=int)
+    argumentos.add_argument('--subgrupos', type=int)
+    argumentos.add_argument('--grupos', type=int, default=1)
+    argumentos.add_argument('--casos', default='0,1,2,3', help='casos de modo de riego separados por coma')
+    argumentos.add_argument('--cabeza-cola', type=float, default=0.5)
+    argumentos.add_argument('--etapas', help='etapas a medir separadas por coma (por omisión todas)')
+    argumentos.add_argument('--repeticiones', type=int, default=3)
+    argumentos.add_argument('--salida', help='archivo JSON donde guardar los resultados')
+    argumentos.add_argument('--base', help='archivo JSON de una corrida previa para comparar')
+    argumentos.add_argument('--tolerancia', type=float, default=0.2, help='aumento de tiempo admitido respecto de la base')
+    argumentos.add_argument('--verificar', action='store_true', help='compara el motor numpy con redSecundaria en cada tamaño')
+    argumentos.add_argument('--soak', type=int, default=0,
+                            help='en lugar de las etapas, repite N peticiones a /turno_riego (con las primeras parcelas)')
+    argumentos.add_argument('--ventana', type=int, default=10000, help='solicitudes por ventana del soak')
+    argumentos.add_argument('--motor', default='pandas', help='motor de las peticiones del soak')
+    args = argumentos.parse_args()
+
+    if args.soak:
+        inspeccion = generar_inspeccion(parcelas=int(args.parcelas.split(',')[0]), cauces=args.cauces,
+                                        subgrupos=args.subgrupos, grupos=args.grupos,
+                                        casos=[int(caso) for caso in args.casos.split(',')], cabeza_cola=args.cabeza_cola)
+        ventanas = soak(inspeccion, args.soak, args.ventana, args.motor)
+        crecimientos = crecimiento_soak(ventanas, args.tolerancia)
+        informe = {'entorno': entorno(), 'soak': ventanas, 'crecimientos': crecimientos}
+        for crecimiento in crecimientos:
+            print('CRECIMIENTO %s' % crecimiento, file=sys.stderr)
+        if args.salida:
+            with open(args.salida, 'w') as archivo:
+                json.dump(informe, archivo, indent=2)
+        else:
+            print(json.dumps(informe, indent=2))
+        sys.exit(1 if crecimientos else 0)
+
+    resultados = ejecutar([int(parcelas) for parcelas in args.parcelas.split(',')],
+                          repeticiones=args.repeticiones,
+                          filtro=args.etapas.split(',') if args.etapas else None,
+                          cauces=args.cauces,
+                          subgrupos=args.subgrupos,
+                          grupos=args.grupos,
+                          casos=[int(caso) for caso in args.casos.split(',')],
+                          cabeza_cola=args.cabeza_cola)
+    informe = {'entorno': entorno(), 'resultados': resultados}
+
+    diferencias = []
+    if args.verificar:
+        for parcelas in args.parcelas.split(','):
+            inspeccion = generar_inspeccion(parcelas=int(parcelas), cauces=args.cauces, subgrupos=args.subgrupos,
+                                            grupos=args.grupos, casos=[int(caso) for caso in args.casos.split(',')],
+                                            cabeza_cola=args.cabeza_cola)
+            diferencias += ['%s parcelas, %s' % (parcelas, diferencia) for diferencia in verificar_motores(inspeccion)]
+        informe['diferencias_motores'] = diferencias
+        for diferencia in diferencias:
+            print('MOTOR NUMPY %s' % diferencia, file=sys.stderr)
+
+    regresiones = []
+    if args.base:
+        with open(args.base) as archivo:
+            regresiones = comparar(resultados, json.load(archivo), args.tolerancia)
+        informe['regresiones'] = regresiones
+        for fila in regresiones:
+            print('REGRESION %8d  %-24s x%.2f' % (fila['parcelas'], fila['etapa'], fila['relacion_base']), file=sys.stderr)
+
+    if args.salida:
+        with open(args.salida, 'w') as archivo:
+            json.dump(informe, archivo, indent=2)
+    else:
+        print(json.dumps(informe, indent=2))
+    sys.exit(1 if regresiones or diferencias else 0)
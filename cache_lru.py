@@ -0,0 +1,168 @@
+#Cache de resultados entre peticiones, direccionado por el contenido de las entradas.
+import hashlib
+import json
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+
+def normalizar(valor):
+    '''
+    Representación textual estable de un argumento de la petición para calcular su huella.
+    Los objetos JSON ya decodificados se serializan con claves ordenadas.
+    '''
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, sort_keys=True, separators=(',', ':'))
+    return str(valor)
+
+
+def clave_contenido(*valores):
+    '''
+    Huella (hash) de un conjunto de entradas normalizadas. Se usa como clave de los caches.
+    '''
+    huella = hashlib.blake2b(digest_size=16)
+    for valor in valores:
+        huella.update(normalizar(valor).encode())
+        huella.update(b'\x00')
+    return huella.hexdigest()
+
+
+def tamano(objeto, _vistos=None):
+    '''
+    Estimación de la memoria ocupada por un valor del cache (bytes).
+    Suma DataFrames/Series con memory_usage(deep=True), textos por su largo y recorre diccionarios,
+    listas y atributos de objetos (ej: redSecundaria y sus nodos calculados).
+    '''
+    if _vistos is None:
+        _vistos = set()
+    if id(objeto) in _vistos:
+        return 0
+    _vistos.add(id(objeto))
+    if isinstance(objeto, pd.DataFrame):
+        return int(objeto.memory_usage(deep=True).sum())
+    if isinstance(objeto, (pd.Series, pd.Index)):
+        return int(objeto.memory_usage(deep=True))
+    if isinstance(objeto, (str, bytes)):
+        return len(objeto)
+    if isinstance(objeto, dict):
+        return sum(tamano(valor, _vistos) for valor in objeto.values())
+    if isinstance(objeto, (list, tuple)):
+        return sum(tamano(valor, _vistos) for valor in objeto)
+    if type(objeto).__module__.startswith('pandas'):
+        return sys.getsizeof(objeto) # ej: agrupamientos, que referencian DataFrames ya contados
+    if hasattr(objeto, '__dict__'):
+        return tamano(vars(objeto), _vistos)
+    return sys.getsizeof(objeto)
+
+
+class cacheLRU:
+    '''
+    Cache LRU acotado por memoria: al superar la capacidad (bytes) se desalojan los valores usados hace más tiempo.
+    Lleva la cuenta de aciertos, fallos y desalojos para dimensionarlo. Es seguro entre hilos.
+    '''
+
+    def __init__(self, capacidad, medir=tamano):
+        self.capacidad = capacidad # bytes
+        self.ocupado = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._medir = medir
+        self._datos = OrderedDict() # clave -> (valor, tamaño)
+        self._candado = threading.Lock()
+
+    def obtener(self, clave):
+        '''
+        Devuelve el valor guardado para la clave o None si no está.
+        '''
+        with self._candado:
+            if clave not in self._datos:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return self._datos[clave][0]
+
+    def guardar(self, clave, valor):
+        '''
+        Guarda un valor. Los valores más grandes que la capacidad total no se guardan.
+        '''
+        medida = self._medir(valor)
+        with self._candado:
+            if clave in self._datos:
+                self.ocupado -= self._datos.pop(clave)[1]
+            if medida > self.capacidad:
+                return
+            self._datos[clave] = (valor, medida)
+            self.ocupado += medida
+            while self.ocupado > self.capacidad:
+                _, (_, liberado) = self._datos.popitem(last=False)
+                self.ocupado -= liberado
+                self.desalojos += 1
+
+    def limpiar(self):
+        with self._candado:
+            self._datos.clear()
+            self.ocupado = 0
+
+    def estadisticas(self):
+        with self._candado:
+            return {'entradas': len(self._datos),
+                    'ocupado': self.ocupado,
+                    'capacidad': self.capacidad,
+                    'aciertos': self.aciertos,
+                    'fallos': self.fallos,
+                    'desalojos': self.desalojos}
+
+
+class vueloUnico:
+    '''
+    Agrupa cálculos concurrentes con la misma clave (single-flight): la primera llamada calcula y las que llegan
+    mientras tanto esperan su resultado (o su excepción) y lo comparten, sin volver a calcular.
+    Lleva la cuenta de cálculos y de llamadas agrupadas. Es seguro entre hilos.
+    '''
+
+    def __init__(self):
+        self.calculos = 0
+        self.agrupadas = 0
+        self._vuelos = {} # clave -> Future del cálculo en curso
+        self._candado = threading.Lock()
+
+    def ejecutar(self, clave, funcion):
+        '''
+        Devuelve funcion() o, si ya hay un cálculo en curso para la clave, espera y devuelve el de ese cálculo.
+        El vuelo termina al volver funcion(): las llamadas posteriores vuelven a calcular (para reutilizar el
+        resultado, funcion() debe guardarlo en un cache antes de volver).
+        '''
+        with self._candado:
+            vuelo = self._vuelos.get(clave)
+            if vuelo is None:
+                vuelo = self._vuelos[clave] = Future()
+                self.calculos += 1
+                lider = True
+            else:
+                self.agrupadas += 1
+                lider = False
+        if not lider:
+            return vuelo.result()
+
+        try:
+            resultado = funcion()
+        except BaseException as error:
+            vuelo.set_exception(error)
+            raise
+        else:
+            vuelo.set_result(resultado)
+            return resultado
+        finally:
+            with self._candado:
+                del self._vuelos[clave]
+
+    def estadisticas(self):
+        with self._candado:
+            return {'en_curso': len(self._vuelos),
+                    'calculos': self.calculos,
+                    'agrupadas': self.agrupadas}
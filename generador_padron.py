@@ -0,0 +1,124 @@
+#Generador de inspecciones sintéticas (padrón, solicitud, modos, refuerzo y reservorio) para pruebas de rendimiento.
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+
+#Modo de riego de cada caso de set_modo_riego: (grupo, subgrupo)
+modos_caso = {0: (1, 1), 1: (1, 0), 2: (0, 1), 3: (0, 0)}
+
+
+def _bloques(cantidad, bloques):
+    #Reparte 1..cantidad en bloques consecutivos: número de bloque (1..bloques) de cada elemento
+    return 1 + np.arange(cantidad) * bloques // cantidad
+
+
+def generar_inspeccion(parcelas=1000, cauces=None, subgrupos=None, grupos=1, casos=(0, 1, 2, 3), cabeza_cola=0.5, semilla=0,
+                       primera_clave=0):
+    '''
+    Genera una inspección sintética reproducible con las tablas de entrada de redSecundaria.
+    Los cauces se reparten en subgrupos consecutivos y los subgrupos en grupos; cada grupo usa uno de los casos
+    de set_modo_riego (0: grupo y subgrupo, 1: grupo, 2: subgrupo, 3: independiente), en forma cíclica.
+    :param parcelas: Cantidad de parcelas del padrón (cada cauce tiene al menos una).
+    :param cauces: Cantidad de cauces (por omisión una cada 50 parcelas, hasta 2000).
+    :param subgrupos: Cantidad de subgrupos (por omisión uno cada 5 cauces).
+    :param casos: Casos de modo de riego a combinar entre los grupos.
+    :param cabeza_cola: Proporción de cauces que riegan de cabeza a cola.
+    :param primera_clave: Clave (índice) de la primera parcela del padrón y de la solicitud.
+    :return: Diccionario con las tablas padron, solicitud, modos, refuerzo y reservorio en JSON.
+    '''
+    rng = np.random.default_rng(semilla)
+    if cauces is None:
+        cauces = int(min(max(parcelas // 50, 1), 2000))
+    if subgrupos is None:
+        subgrupos = max(cauces // 5, 1)
+    cauces = min(cauces, parcelas)
+    subgrupos = min(subgrupos, cauces)
+    grupos = min(grupos, subgrupos)
+
+    subgrupo_cauce = _bloques(cauces, subgrupos)
+    grupo_subgrupo = _bloques(subgrupos, grupos)
+    cauce = np.sort(np.concatenate([np.arange(1, cauces + 1), rng.integers(1, cauces + 1, parcelas - cauces)]))
+    subgrupo = subgrupo_cauce[cauce - 1]
+
+    padron = pd.DataFrame({'orden_cauce': cauce,
+                           'Subgrupo': subgrupo,
+                           'Grupo': grupo_subgrupo[subgrupo - 1],
+                           'sup_emp_reducida': rng.uniform(0.5, 20, parcelas).round(4),
+                           'ha_si': rng.choice([1, 1, 1, 0], parcelas),
+                           'tpo_rec_toma': rng.integers(0, 30, parcelas),
+                           'tpo_rec_cabeza_cola': rng.integers(0, 60, parcelas),
+                           'tpo_rec_cola_cabeza': rng.integers(0, 60, parcelas),
+                           'tpo_descuelgue': rng.integers(0, 90, parcelas),
+                           'CC': rng.integers(1000, 9999, parcelas),
+                           'PP': rng.integers(1, 99, parcelas),
+                           'idPadron': np.arange(1, parcelas + 1)},
+                          index=pd.RangeIndex(primera_clave, primera_clave + parcelas))
+
+    solicitud = pd.DataFrame({'sup_ad': rng.choice([0, 0, 0, 1.5], parcelas),
+                              'sup_res': rng.choice([0, 0, 0, 0.5], parcelas),
+                              'sup_rec': rng.choice([0, 0, 0, 2.0], parcelas),
+                              'sup_ced': rng.choice([0, 0, 0, 1.0], parcelas),
+                              'ha_activa': rng.choice([1, 1, 1, 0.5], parcelas)},
+                             index=padron.index)
+
+    caso_grupo = np.array(casos)[(grupo_subgrupo[subgrupo_cauce - 1] - 1) % len(casos)]
+    modos = pd.DataFrame({'cabeza_cola': (rng.random(cauces) < cabeza_cola).astype(int),
+                          'grupo': [modos_caso[caso][0] for caso in caso_grupo],
+                          'subgrupo': [modos_caso[caso][1] for caso in caso_grupo]},
+                         index=pd.RangeIndex(1, cauces + 1, name='orden_cauce'))
+
+    refuerzo = pd.DataFrame({'caudal_refuerzo': [0.2, 0.1], 'dur_refuerzo': [1.0, 0.5]})
+    reservorio = pd.DataFrame({'volumen': [300.0, 150.0]})
+
+    return {'padron': padron.to_json(),
+            'solicitud': solicitud.to_json(),
+            'modos': modos.to_json(),
+            'refuerzo': refuerzo.to_json(),
+            'reservorio': reservorio.to_json()}
+
+
+def payload_turno(inspeccion, caudal=1500, turno=7, fecha='01-03-2022', simular=0, vol_riego_p_ha=800):
+    '''
+    Cuerpo de una petición a /turno_riego con las tablas de una inspección generada.
+    '''
+    return {'padron': inspeccion['padron'],
+            'solicitud': inspeccion['solicitud'],
+            'modos': inspeccion['modos'],
+            'refuerzos': inspeccion['refuerzo'],
+            'reservorio': inspeccion['reservorio'],
+            'caudal': caudal,
+            'turno': turno,
+            'fecha': fecha,
+            'simular': simular,
+            'vol_riego_p_ha': vol_riego_p_ha}
+
+
+if __name__ == "__main__":
+    argumentos = argparse.ArgumentParser(description='Genera una inspección sintética como cuerpo JSON de /turno_riego.')
+    argumentos.add_argument('--parcelas', type=int, default=1000)
+    argumentos.add_argument('--cauces', type=int)
+    argumentos.add_argument('--subgrupos', type=int)
+    argumentos.add_argument('--grupos', type=int, default=1)
+    argumentos.add_argument('--casos', default='0,1,2,3', help='casos de modo de riego separados por coma')
+    argumentos.add_argument('--cabeza-cola', type=float, default=0.5)
+    argumentos.add_argument('--semilla', type=int, default=0)
+    argumentos.add_argument('--primera-clave', type=int, default=0, help='clave de la primera parcela')
+    argumentos.add_argument('--salida', default='-', help='archivo de salida (- para la salida estándar)')
+    args = argumentos.parse_args()
+
+    inspeccion = generar_inspeccion(parcelas=args.parcelas,
+                                    cauces=args.cauces,
+                                    subgrupos=args.subgrupos,
+                                    grupos=args.grupos,
+                                    casos=[int(caso) for caso in args.casos.split(',')],
+                                    cabeza_cola=args.cabeza_cola,
+                                    semilla=args.semilla,
+                                    primera_clave=args.primera_clave)
+    texto = json.dumps(payload_turno(inspeccion))
+    if args.salida == '-':
+        print(texto)
+    else:
+        with open(args.salida, 'w') as archivo:
+            archivo.write(texto)
@@ -0,0 +1,117 @@
+#Instrumentación por etapas del cálculo del turno: tiempo, cantidad de llamadas y memoria pico opcional.
+import bisect
+import contextlib
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+
+#Se activa para todas las peticiones con la variable de entorno; si no, sólo se mide cuando una petición lo pide.
+habilitada = os.environ.get('RIEGO_INSTRUMENTACION', '0') == '1'
+#Memoria pico con tracemalloc (bastante más costoso que medir tiempos)
+memoria = os.environ.get('RIEGO_INSTRUMENTACION_MEMORIA', '0') == '1'
+
+#Límites superiores (s) de los intervalos de los histogramas
+limites = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+_registro = contextvars.ContextVar('registro_etapas', default=None) # mediciones de la petición en curso
+_nulo = contextlib.nullcontext()
+
+
+class metricasEtapas:
+    '''
+    Histogramas acumulados de duración por etapa, para el endpoint /metrics. Es seguro entre hilos.
+    '''
+
+    def __init__(self):
+        self._etapas = {}
+        self._candado = threading.Lock()
+
+    def registrar(self, etapa, duracion, pico=None):
+        with self._candado:
+            datos = self._etapas.get(etapa)
+            if datos is None:
+                datos = self._etapas[etapa] = {'llamadas': 0, 'total': 0.0, 'maximo': 0.0, 'memoria_pico': 0,
+                                               'intervalos': [0] * len(limites)}
+            datos['llamadas'] += 1
+            datos['total'] += duracion
+            datos['maximo'] = max(datos['maximo'], duracion)
+            datos['intervalos'][bisect.bisect_left(limites, duracion)] += 1
+            if pico is not None:
+                datos['memoria_pico'] = max(datos['memoria_pico'], pico)
+
+    def estadisticas(self):
+        with self._candado:
+            return {etapa: {'llamadas': datos['llamadas'],
+                            'total': datos['total'],
+                            'promedio': datos['total'] / datos['llamadas'],
+                            'maximo': datos['maximo'],
+                            'memoria_pico': datos['memoria_pico'],
+                            'histograma': {str(limite): cantidad for limite, cantidad in zip(limites, datos['intervalos'])}}
+                    for etapa, datos in self._etapas.items()}
+
+    def limpiar(self):
+        with self._candado:
+            self._etapas.clear()
+
+
+metricas = metricasEtapas()
+
+
+@contextlib.contextmanager
+def _medicion(etapa):
+    # Sólo la etapa más externa inicia tracemalloc: las anidadas no informan memoria para no alterar el pico de la externa.
+    rastrea = memoria and not tracemalloc.is_tracing()
+    if rastrea:
+        tracemalloc.start()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        pico = None
+        if rastrea:
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        metricas.registrar(etapa, duracion, pico)
+        registro = _registro.get()
+        if registro is not None:
+            registro.append((etapa, duracion))
+
+
+def medir(etapa):
+    '''
+    Contexto que mide una etapa del cálculo. Si la instrumentación está apagada y la petición no la pidió,
+    devuelve un contexto nulo compartido y no se mide nada.
+    '''
+    if not habilitada and _registro.get() is None:
+        return _nulo
+    return _medicion(etapa)
+
+
+def iniciar_registro():
+    '''
+    Empieza a registrar las etapas de la petición en curso (para el encabezado Server-Timing).
+    '''
+    return _registro.set([])
+
+
+def terminar_registro(token):
+    '''
+    Deja de registrar y devuelve las mediciones de la petición: lista de (etapa, duración en s).
+    '''
+    registro = _registro.get()
+    _registro.reset(token)
+    return registro or []
+
+
+def server_timing(registro):
+    '''
+    Valor del encabezado Server-Timing: duración total (ms) y cantidad de llamadas de cada etapa de la petición.
+    '''
+    etapas = {}
+    for etapa, duracion in registro:
+        total, llamadas = etapas.get(etapa, (0.0, 0))
+        etapas[etapa] = (total + duracion, llamadas + 1)
+    return ', '.join('%s;dur=%.3f;desc="%d"' % (etapa, total * 1000, llamadas) for etapa, (total, llamadas) in etapas.items())
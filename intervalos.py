@@ -0,0 +1,70 @@
+#Índice de intervalos [inicio, fin) para consultar qué parcelas riegan en un instante o en un rango de tiempo.
+import numpy as np
+
+
+class indiceIntervalos:
+    '''
+    Índice estático de intervalos semiabiertos [inicio, fin) sobre arreglos datetime64 o numéricos.
+    Los intervalos se ordenan por inicio y se arma un árbol de máximos de fin sobre ese orden: una consulta acota por
+    búsqueda binaria los intervalos que empiezan antes del final buscado y desciende sólo por las ramas que tienen algún
+    fin posterior al comienzo buscado, nivel por nivel y sobre arreglos.
+    Los intervalos con inicio o fin nulo (NaT / NaN) no se indexan.
+    '''
+
+    def __init__(self, inicio, fin):
+        inicio = np.asarray(inicio)
+        fin = np.asarray(fin)
+        if inicio.dtype.kind == 'M':
+            validos = ~np.isnat(inicio) & ~np.isnat(fin)
+            inicio = inicio.astype('datetime64[ns]').astype('int64')
+            fin = fin.astype('datetime64[ns]').astype('int64')
+            self._es_fecha = True
+        else:
+            validos = ~np.isnan(inicio) & ~np.isnan(fin)
+            self._es_fecha = False
+        posiciones = np.flatnonzero(validos)
+        orden = np.argsort(inicio[posiciones], kind='stable')
+        self.posiciones = posiciones[orden] # posición original de cada intervalo, en orden de inicio
+        self.inicio = inicio[self.posiciones]
+        self.fin = fin[self.posiciones]
+
+        # Árbol de máximos (heap implícito): hojas en [hojas, 2*hojas), nodo i con hijos 2i y 2i+1
+        self._hojas = 1 << max(int(len(self.fin) - 1).bit_length(), 0)
+        self._arbol = np.full(2 * self._hojas, np.iinfo('int64').min if self._es_fecha else -np.inf, dtype=self.fin.dtype)
+        self._arbol[self._hojas:self._hojas + len(self.fin)] = self.fin
+        for nivel in range(self._hojas.bit_length() - 1, 0, -1):
+            nodos = np.arange(1 << (nivel - 1), 1 << nivel)
+            self._arbol[nodos] = np.maximum(self._arbol[2 * nodos], self._arbol[2 * nodos + 1])
+
+    def __len__(self):
+        return len(self.posiciones)
+
+    def _valor(self, instante):
+        if self._es_fecha:
+            return np.datetime64(instante, 'ns').astype('int64')
+        return instante
+
+    def consultar(self, desde, hasta=None):
+        '''
+        Intervalos activos en el instante desde (inicio <= desde < fin) o, si se indica hasta, los que se superponen
+        con el rango [desde, hasta) (inicio < hasta y fin > desde).
+        :return: Posiciones originales de los intervalos encontrados, en orden de inicio.
+        '''
+        desde = self._valor(desde)
+        if hasta is None:
+            limite = np.searchsorted(self.inicio, desde, side='right')
+        else:
+            limite = np.searchsorted(self.inicio, self._valor(hasta), side='left')
+        if limite == 0:
+            return self.posiciones[:0]
+
+        # Descenso por niveles: nodos que cubren alguna hoja < limite y con algún fin > desde
+        nodos = np.array([1])
+        ancho = self._hojas
+        while ancho > 1:
+            nodos = nodos[self._arbol[nodos] > desde]
+            ancho //= 2
+            hijos = np.stack([2 * nodos, 2 * nodos + 1], axis=1).ravel()
+            nodos = hijos[hijos * ancho - self._hojas < limite] # primera hoja del nodo antes del límite
+        hojas = nodos[self._arbol[nodos] > desde] - self._hojas
+        return self.posiciones[hojas]
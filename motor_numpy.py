@@ -0,0 +1,145 @@
+#Motor NumPy del turno de riego: el mismo cálculo que redSecundaria + get_cuadro_red sobre arreglos y códigos enteros
+#de cauce / subgrupo, sin DataFrames intermedios. Para inspecciones chicas y medianas, en las que el costo fijo de
+#pandas (armar DataFrames, groupby, indexar Series) supera al del cálculo. Se elige por petición (motor='numpy').
+import functools
+
+import numpy as np
+import pandas as pd
+
+from Clase_dis_sec_v3_1 import _programa_turnados, _reparte_turnado, leer_columnas, leer_fecha, redSecundaria as rs
+
+
+@functools.lru_cache(maxsize=256)
+def _fecha(fecha_inicio):
+    #Fecha de inicio del turno como la interpreta redSecundaria (día primero), en datetime64[ns]
+    return np.datetime64(pd.Timestamp(leer_fecha(fecha_inicio)), 'ns')
+
+
+def _posiciones(indice, largo):
+    #Índice de la tabla como arreglo (las tablas sin índice se numeran desde 0, como un RangeIndex)
+    return np.arange(largo) if indice is None else np.asarray(indice)
+
+
+def _alinear(destino, origen, valores):
+    '''
+    Valores de una tabla indexada por origen en el orden de las claves destino, con NaN en las claves que no están
+    (como al alinear Series en pandas).
+    '''
+    if len(destino) == len(origen) and np.array_equal(destino, origen):
+        return valores
+    if not len(origen):
+        return np.full(len(destino), np.nan)
+    orden = np.argsort(origen, kind='stable')
+    posicion = np.minimum(np.searchsorted(origen[orden], destino), len(origen) - 1)
+    return np.where(origen[orden][posicion] == destino, valores[orden][posicion], np.nan)
+
+
+def calcular_turno(padron, solicitud, modos, refuerzo=None, reservorio=None, caudal_canal=100, dur_turno=24,
+                   fecha_inicio="01-01-2022", vol_riego_p_ha=0, simular=0):
+    '''
+    Cuadro de turno y cuenta de agua de toda la red, como redSecundaria(...).get_cuadro_red().
+    Las tablas se reciben en los mismos formatos que redSecundaria (ver leer_columnas).
+    :return: Diccionario de arreglos. Por cauce (en orden de cauce): cauces, sup_riego, sup_emp_reducida, sup_anexa,
+    sup_pase, parcelas, tpo_red, turnado (días), duracion (timedelta64), inicio y caudal; ids de subgrupos y grupos; vol_riego_ha; y por parcela
+    (en el orden de riego de get_cuadro_red): Cauce, CC, PP, idPadron, Caudal, Volumen, Inicio, Tiempo,
+    Agua Programada, Agua Entregada y Balance.
+    :raises ValueError: si las tablas no cumplen su esquema.
+    '''
+    indice_p, p = leer_columnas(padron, 'padron')
+    indice_s, s = leer_columnas(solicitud, 'solicitud')
+    indice_m, m = leer_columnas(modos, 'modos')
+    _, r = leer_columnas(refuerzo, 'refuerzo')
+    _, v = leer_columnas(reservorio, 'reservorio')
+    posiciones = _posiciones(indice_p, len(p['orden_cauce']))
+    origen_s = _posiciones(indice_s, len(s['sup_ad']))
+
+    # 1-Superficie de riego de cada parcela con las solicitudes alineadas por índice
+    sup_anexa = _alinear(posiciones, origen_s, s['sup_ad'] - s['sup_res'])
+    sup_pase = _alinear(posiciones, origen_s, s['sup_rec'] - s['sup_ced'])
+    sup_riego = (p['sup_emp_reducida'] + sup_anexa + sup_pase) * p['ha_si'] * _alinear(posiciones, origen_s, s['ha_activa'])
+
+    # 2-Agregados por código de cauce / subgrupo / grupo (las sumas omiten los nulos, como groupby().sum())
+    cauces, cod_c = np.unique(p['orden_cauce'], return_inverse=True)
+    subgrupos, cod_sg = np.unique(p['Subgrupo'], return_inverse=True)
+    grupos = np.unique(p['Grupo'])
+    suma = lambda codigos, largo, valores: np.bincount(codigos, weights=valores, minlength=largo)
+    sup_suma = np.nan_to_num(sup_riego)
+    sup_c = suma(cod_c, len(cauces), sup_suma)
+    sup_sg = suma(cod_sg, len(subgrupos), sup_suma)
+
+    # Pares cauce / subgrupo presentes en el padrón, ordenados por cauce y subgrupo (como en get_indice_cauces)
+    pares = np.unique(cod_c * len(subgrupos) + cod_sg)
+    cauce_sg, subgrupo_sg = pares // len(subgrupos), pares % len(subgrupos)
+
+    # Modos de riego de cada cauce (NaN si el cauce no está en la tabla de modos)
+    origen_m = _posiciones(indice_m, len(m['cabeza_cola']))
+    cabeza_cola = _alinear(cauces, origen_m, m['cabeza_cola'])
+
+    # 3-Tiempo de red y volumen de riego por ha (get_tpo_red / get_vol_riego_ha)
+    recorrido = np.where(cabeza_cola == 0,
+                         suma(cod_c, len(cauces), p['tpo_rec_toma']) + suma(cod_c, len(cauces), p['tpo_rec_cabeza_cola']),
+                         suma(cod_c, len(cauces), p['tpo_rec_cola_cabeza']))
+    tpo_red = suma(cod_c, len(cauces), p['tpo_descuelgue']) - recorrido
+    sup_total = sup_c.sum()
+    refuerzo = sum(r['caudal_refuerzo'])*sum(r['dur_refuerzo'])*rs.f_escala
+    reservorio = sum(v['volumen'])
+    cr = caudal_canal / sup_total
+    vol_base_ha = cr * (dur_turno-(tpo_red.sum()/rs.f_tiempo)) * rs.f_escala
+    vol_riego_ha = vol_base_ha * rs.f_compensa + ((refuerzo + reservorio) / sup_total)
+
+    # 4-Turnado e inicio de cada cauce (set_modo_riego)
+    vol_c = sup_c * vol_riego_ha
+    vol_sg = sup_sg * vol_riego_ha
+    f_g = vol_sg[subgrupo_sg] / vol_c.sum()
+    f_sg = vol_c[cauce_sg] / vol_sg[subgrupo_sg]
+    grupo_sec = (_alinear(cauces, origen_m, m['grupo']) == 1)[cauce_sg]
+    subgrupo_sec = (_alinear(cauces, origen_m, m['subgrupo']) == 1)[cauce_sg]
+    casos = (grupo_sec & subgrupo_sec, grupo_sec & ~subgrupo_sec, ~grupo_sec & subgrupo_sec)
+    # Un cauce con parcelas en más de un subgrupo aparece en varios pares: rige el último, como en set_modo_riego
+    ultimo_c = np.append(cauce_sg[1:] != cauce_sg[:-1], True)
+    turnado_c, duracion_c, _, _, _, inicio_c = _programa_turnados(subgrupos[subgrupo_sg], f_g, f_sg, casos, dur_turno,
+                                                                  _fecha(fecha_inicio), ultimo_c)
+    turnado_c, duracion_c, inicio_c = turnado_c[1:], duracion_c[1:], inicio_c[1:]
+
+    # 5-Caudal de cada cauce (get_caudal_riego)
+    if simular==1:
+        caudal_c = ((vol_riego_p_ha * sup_c) / turnado_c) * (1 / rs.f_escala)
+    else:
+        caudal_c = (vol_c / turnado_c) * (1 / rs.f_escala)
+
+    # 6-Parcelas en el orden de riego: por cauce y, dentro del cauce, ascendente por cabeza y descendente por cola
+    sentido = np.where(cabeza_cola == 1, 1, -1)[cod_c]
+    orden = np.lexsort((posiciones * sentido, cod_c))
+    cod = cod_c[orden]
+    sup_p = sup_riego[orden]
+    encadena = np.concatenate([[False], cod[1:] == cod[:-1]])
+    tiempo, inicio = _reparte_turnado(sup_p, duracion_c[cod], inicio_c[cod], encadena)
+    volumen = sup_p * vol_riego_ha
+    lamina_p = (vol_riego_p_ha * sup_p) / rs.f_lamina
+    lamina_e = volumen / rs.f_lamina
+
+    return {'cauces': cauces,
+            'sup_riego': sup_c,
+            'sup_emp_reducida': suma(cod_c, len(cauces), p['sup_emp_reducida']),
+            'sup_anexa': suma(cod_c, len(cauces), np.nan_to_num(sup_anexa)),
+            'sup_pase': suma(cod_c, len(cauces), np.nan_to_num(sup_pase)),
+            'parcelas': np.bincount(cod_c, minlength=len(cauces)),
+            'tpo_red': tpo_red,
+            'turnado': turnado_c,
+            'duracion': duracion_c,
+            'inicio': inicio_c,
+            'caudal': caudal_c,
+            'subgrupos': subgrupos,
+            'grupos': grupos,
+            'vol_riego_ha': vol_riego_ha,
+            'Cauce': cauces[cod],
+            'CC': p['CC'][orden],
+            'PP': p['PP'][orden],
+            'idPadron': p['idPadron'][orden],
+            'Caudal': caudal_c[cod],
+            'Volumen': volumen,
+            'Inicio': inicio,
+            'Tiempo': tiempo,
+            'Agua Programada': lamina_p,
+            'Agua Entregada': lamina_e,
+            'Balance': lamina_p - lamina_e}
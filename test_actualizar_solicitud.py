@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+parametros = {'caudal_canal': 1500, 'dur_turno': 7, 'fecha_inicio': '01-03-2022', 'vol_riego_p_ha': 800}
+
+
+def tablas(casos):
+    inspeccion = generar_inspeccion(parcelas=200, cauces=10, subgrupos=3, casos=casos, semilla=7)
+    return dict(padron=inspeccion['padron'], solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+                refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'], **parametros)
+
+
+def cambios_en_cauce(red, cauce):
+    #Reduce a la mitad las ha activas de dos parcelas del cauce
+    filas = red.padron.index[red.padron.orden_cauce == cauce][:2]
+    return pd.DataFrame({'ha_activa': 0.5, 'sup_ad': 1.0}, index=filas)
+
+
+def igual_a_red_completa(red, datos, cambios):
+    solicitud = pd.read_json(datos['solicitud'])
+    solicitud.loc[cambios.index, cambios.columns] = cambios
+    completa = rs(**dict(datos, solicitud=solicitud)).get_cuadro_red()
+    pd.testing.assert_frame_equal(red.get_cuadro_red(), completa, check_exact=False, rtol=1e-12)
+
+
+@pytest.mark.parametrize('casos', [(3,), (0, 1, 2, 3)])
+def test_cuadro_igual_a_red_completa(casos):
+    datos = tablas(casos)
+    red = rs(**datos)
+    red.get_cuadro_red()
+    cambios = cambios_en_cauce(red, 4)
+    red.actualizar_solicitud(cambios)
+    igual_a_red_completa(red, datos, cambios)
+
+
+def test_sin_cuadro_previo():
+    datos = tablas((0, 1, 2, 3))
+    red = rs(**datos)
+    cambios = cambios_en_cauce(red, 2)
+    red.actualizar_solicitud(cambios)
+    igual_a_red_completa(red, datos, cambios)
+
+
+def test_solo_se_reprograman_los_cauces_afectados():
+    #Cauces independientes: el cambio en el cauce 4 no mueve los tiempos de los demás
+    red = rs(**tablas((3,)))
+    red.get_cuadro_red()
+    antes = red.recalculos.copy()
+    assert red.actualizar_solicitud(cambios_en_cauce(red, 4)) == [4]
+    red.get_cuadro_red()
+    recalculados = red.recalculos - antes
+    assert recalculados['cuadro_red_cauces'] == 1
+    #El cuadro no se vuelve a armar completo y el tiempo de red y el índice de cauces no se recalculan
+    for nodo in ('cuadro_red', 'agregados', 'tpo_red', 'indice_cauces'):
+        assert recalculados[nodo] == 0
@@ -0,0 +1,75 @@
+import json
+import time
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+import almacen_padron
+import motor_numpy
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+parametros = {'caudal_canal': 1500, 'dur_turno': 7, 'fecha_inicio': '01-03-2022', 'vol_riego_p_ha': 800}
+
+
+@pytest.fixture
+def inspeccion():
+    #Claves de padrón y solicitud desde 1: un desalineo por posición corre la solicitud una parcela
+    return generar_inspeccion(parcelas=300, cauces=12, subgrupos=4, semilla=3, primera_clave=1)
+
+
+def test_leer_padron_conserva_indice(inspeccion, tmp_path):
+    almacen_padron.importar_padron('insp', inspeccion['padron'], tmp_path)
+    padron = almacen_padron.leer_padron('insp', carpeta=tmp_path)
+    assert list(padron.index) == [int(clave) for clave in json.loads(inspeccion['padron'])['orden_cauce']]
+
+
+@pytest.mark.parametrize('simular', [0, 1])
+def test_cuadro_desde_almacen_igual_a_padron_en_peticion(inspeccion, tmp_path, simular):
+    almacen_padron.importar_padron('insp', inspeccion['padron'], tmp_path)
+    tablas = dict(solicitud=inspeccion['solicitud'], modos=inspeccion['modos'], refuerzo=inspeccion['refuerzo'],
+                  reservorio=inspeccion['reservorio'], simular=simular, **parametros)
+    esperado = rs(padron=inspeccion['padron'], **tablas).get_cuadro_red()
+    desde_almacen = rs(padron=almacen_padron.leer_padron('insp', carpeta=tmp_path), **tablas).get_cuadro_red()
+    assert desde_almacen.equals(esperado)
+    assert esperado['Volumen'].notna().all()
+
+    turno = motor_numpy.calcular_turno(padron=almacen_padron.leer_padron('insp', carpeta=tmp_path),
+                                       solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+                                       refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+                                       simular=simular, **parametros)
+    assert list(turno['idPadron']) == list(esperado['id_parcela'])
+    assert (abs(turno['Volumen'] - esperado['Volumen'].to_numpy()) <= 1e-9 * abs(esperado['Volumen'].to_numpy())).all()
+
+
+def test_turno_asincrono_desde_almacen(inspeccion, tmp_path, monkeypatch):
+    import app
+    from trabajos import colaTrabajos
+
+    #Los procesos de trabajo leen el almacén de RIEGO_ALMACEN al importar almacen_padron
+    monkeypatch.setenv('RIEGO_ALMACEN', str(tmp_path))
+    monkeypatch.setattr(almacen_padron, 'directorio', str(tmp_path))
+    almacen_padron.importar_padron('insp', inspeccion['padron'])
+    assert almacen_padron.parcelas('insp') == 300
+    cola = colaTrabajos(procesos=1)
+    monkeypatch.setattr(app, 'cola_trabajos', cola)
+    monkeypatch.setattr(app, 'umbral_asincrono', 300 * app.bytes_parcela)
+
+    cliente = app.app.test_client()
+    payload = {'inspeccion': 'insp', 'solicitud': inspeccion['solicitud'], 'modos': inspeccion['modos'],
+               'refuerzos': inspeccion['refuerzo'], 'reservorio': inspeccion['reservorio'],
+               'caudal': 1500, 'turno': 7, 'fecha': '01-03-2022', 'simular': 0, 'vol_riego_p_ha': 800}
+    try:
+        respuesta = cliente.post('/turno_riego', json=dict(payload, asincrono=1))
+        assert respuesta.status_code == 202
+        id_trabajo = respuesta.get_json()['id']
+        for _ in range(600):
+            resultado = cliente.get('/trabajos/%s/resultado' % id_trabajo)
+            if resultado.status_code != 202:
+                break
+            time.sleep(0.1)
+        assert resultado.status_code == 200
+        assert resultado.get_json() == cliente.post('/turno_riego', json=payload).get_json()
+    finally:
+        cola.cerrar()
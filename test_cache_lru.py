@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+import turno_riego
+from cache_lru import cacheLRU, clave_contenido, vueloUnico
+from generador_padron import generar_inspeccion, payload_turno
+
+
+def vuelos_concurrentes(vuelos, funcion, cantidad=8):
+    #Lanza cantidad de llamadas con la misma clave y devuelve (resultado o excepción) de cada una
+    salidas = [None] * cantidad
+
+    def llamar(posicion):
+        try:
+            salidas[posicion] = vuelos.ejecutar('clave', funcion)
+        except Exception as error:
+            salidas[posicion] = error
+
+    hilos = [threading.Thread(target=llamar, args=(posicion,)) for posicion in range(cantidad)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(10)
+    return salidas
+
+
+def calculo_retenido(resultado=None, error=None):
+    #Cálculo que espera a que todas las llamadas se agrupen en el vuelo antes de terminar
+    llamadas = []
+    liberar = threading.Event()
+
+    def funcion():
+        llamadas.append(1)
+        liberar.wait(10)
+        if error is not None:
+            raise error
+        return resultado
+    return funcion, llamadas, liberar
+
+
+def liberar_al_agrupar(vuelos, liberar, esperadas):
+    def vigilar():
+        while vuelos.estadisticas()['agrupadas'] < esperadas:
+            time.sleep(0.01)
+        liberar.set()
+    threading.Thread(target=vigilar, daemon=True).start()
+
+
+def test_claves_iguales_calculan_una_vez():
+    vuelos = vueloUnico()
+    resultado = object()
+    funcion, llamadas, liberar = calculo_retenido(resultado)
+    liberar_al_agrupar(vuelos, liberar, 7)
+    salidas = vuelos_concurrentes(vuelos, funcion)
+    assert len(llamadas) == 1
+    assert all(salida is resultado for salida in salidas)
+    assert vuelos.estadisticas() == {'en_curso': 0, 'calculos': 1, 'agrupadas': 7}
+
+
+def test_la_excepcion_llega_a_todos_y_no_se_guarda():
+    vuelos = vueloUnico()
+    funcion, llamadas, liberar = calculo_retenido(error=ValueError('tabla inválida'))
+    liberar_al_agrupar(vuelos, liberar, 7)
+    salidas = vuelos_concurrentes(vuelos, funcion)
+    assert len(llamadas) == 1
+    assert all(isinstance(salida, ValueError) and str(salida) == 'tabla inválida' for salida in salidas)
+    #El vuelo fallido no queda registrado: la llamada siguiente vuelve a calcular
+    assert vuelos.ejecutar('clave', lambda: 'nuevo') == 'nuevo'
+    assert vuelos.estadisticas()['calculos'] == 2
+
+
+def test_desaloja_la_menos_usada():
+    cache = cacheLRU(capacidad=3, medir=len)
+    for clave in 'abc':
+        cache.guardar(clave, clave.upper())
+    assert cache.obtener('a') == 'A'
+    cache.guardar('d', 'D')
+    assert cache.obtener('b') is None
+    assert [cache.obtener(clave) for clave in 'acd'] == ['A', 'C', 'D']
+    assert cache.estadisticas()['desalojos'] == 1
+    #Un valor más grande que la capacidad no se guarda ni desaloja al resto
+    cache.guardar('e', 'EEEE')
+    assert cache.obtener('e') is None
+    assert cache.estadisticas()['entradas'] == 3
+
+
+def test_otro_parametro_es_otra_clave(monkeypatch):
+    monkeypatch.setattr(turno_riego, 'cache_redes', cacheLRU(capacidad=512 * 2**20))
+    args = dict(payload_turno(generar_inspeccion(parcelas=60, cauces=5)), inspeccion=None)
+    otro = dict(args, caudal=1200)
+    assert clave_contenido(*turno_riego.huella_red(args)) == clave_contenido(*turno_riego.huella_red(otro))
+
+    red = turno_riego.obtener_turno(args)
+    assert turno_riego.obtener_turno(dict(args)) is red
+    red_otro = turno_riego.obtener_turno(otro)
+    assert red_otro is not red
+    assert red_otro.caudal_canal == 1200 and red.caudal_canal == 1500
+    assert not red_otro.get_cuadro_red()['Volumen'].equals(red.get_cuadro_red()['Volumen'])
+    #La red agregada se comparte: el tiempo de red no se recalcula para el otro caudal
+    assert red_otro.recalculos['tpo_red'] == red.recalculos['tpo_red'] == 1
+
+
+def test_error_de_calculo_no_queda_en_el_cache_de_respuestas():
+    import app
+    cliente = app.app.test_client()
+    payload = dict(payload_turno(generar_inspeccion(parcelas=30, cauces=3)), modos={'cabeza_cola': [0, 1, 0]})
+    entradas = app.cache_respuestas.estadisticas()['entradas']
+    assert [cliente.post('/turno_riego', json=payload).status_code for _ in range(2)] == [400, 400]
+    assert app.cache_respuestas.estadisticas()['entradas'] == entradas
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import cuadroTurno, redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+
+@pytest.mark.parametrize('caso', [0, 1, 2, 3])
+def test_cuadro_turno_coincide_con_cuadro_red(caso):
+    inspeccion = generar_inspeccion(parcelas=1000, cauces=30, subgrupos=6, casos=(caso,), semilla=caso)
+    red = rs(padron=inspeccion['padron'], solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+             refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+             caudal_canal=1500, dur_turno=7, fecha_inicio='01-03-2022', vol_riego_p_ha=800)
+    cuadro_red = red.get_cuadro_red()
+    modo_riego = red.set_modo_riego()
+    tiempo_ha = modo_riego.turnado_c[1:] / red.cauces.sup_riego
+    for cauce, subpadron in red.get_subpadron().items():
+        turno = cuadroTurno(padron=subpadron, inicio=modo_riego.inicio_c[cauce],
+                            volumen=subpadron.sup_riego * red.get_vol_riego_ha(),
+                            tiempo=subpadron.sup_riego * tiempo_ha[cauce], caudal=red.get_caudal_riego()[cauce],
+                            vol_riego_p_ha=red.vol_riego_p_ha, duracion=modo_riego.duracion_c[cauce])
+        obtenido = pd.read_json(turno.set_turno_riego(), orient='index', convert_dates=False)
+        esperado = cuadro_red[cuadro_red.Cauce == cauce]
+        assert list(obtenido['Tiempo']) == [tiempo.isoformat() for tiempo in esperado['Tiempo']]
+        assert list(obtenido['Fin']) == list(esperado['Fin'].dt.strftime('Fecha:%d-%m-%Y Hora:%H:%M'))
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+
+def red_turno(simular=0):
+    inspeccion = generar_inspeccion(parcelas=150, cauces=12, subgrupos=4, grupos=2, semilla=9)
+    return rs(padron=inspeccion['padron'], solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+              refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+              caudal_canal=1500, dur_turno=7, fecha_inicio='01-03-2022', vol_riego_p_ha=800, simular=simular)
+
+
+def volumen_hidrograma(hidrograma):
+    #Integral del hidrograma escalonado (l/s durante cada tramo, en s) en m3
+    segundos = np.diff(hidrograma.index.asi8) / 1e9
+    return (hidrograma.to_numpy()[:-1] * segundos).sum() / 1000
+
+
+@pytest.mark.parametrize('simular', [0, 1])
+def test_hidrograma_integra_el_volumen_programado(simular):
+    red = red_turno(simular)
+    hidrograma = red.get_hidrograma()
+    assert hidrograma.iloc[-1] == 0
+    assert (hidrograma >= 0).all()
+    #Volumen de cada cauce con su caudal durante su duración programada
+    modo_riego = red.set_modo_riego().drop(index=0)
+    caudal = red.get_caudal_riego().reindex(modo_riego.index)
+    programado = (caudal * modo_riego.duracion_c.dt.total_seconds()).sum() / 1000
+    assert volumen_hidrograma(hidrograma) == pytest.approx(programado, rel=1e-9)
+    #Que es el volumen de riego de la red, salvo el redondeo de las duraciones al segundo
+    if simular == 0:
+        esperado = red.get_vol_riego().cauce.sum()
+    else:
+        esperado = 800 * red.get_sup_riego().cauce.sum()
+    assert volumen_hidrograma(hidrograma) == pytest.approx(esperado, rel=1e-6)
+
+
+def regando_fuerza_bruta(cuadro, desde, hasta=None):
+    if hasta is None:
+        activas = (cuadro.Inicio <= desde) & (desde < cuadro.Fin)
+    else:
+        activas = (cuadro.Inicio < hasta) & (cuadro.Fin > desde)
+    return set(cuadro.index[activas])
+
+
+def test_regando_coincide_con_el_cuadro():
+    red = red_turno()
+    cuadro = red.get_cuadro_red()
+    #Todos los instantes de inicio y fin (extremos compartidos entre parcelas consecutivas) y uno antes de cada uno
+    instantes = pd.DatetimeIndex(pd.concat([cuadro.Inicio, cuadro.Fin]).dropna().unique()).sort_values()
+    for instante in instantes.append(instantes - pd.Timedelta(1, 's')):
+        filas = red.regando(instante)
+        assert set(filas.index) == regando_fuerza_bruta(cuadro, instante)
+        assert filas.Inicio.is_monotonic_increasing
+    for desde, hasta in zip(instantes[:-1:7], instantes[1::7]):
+        assert set(red.regando(desde, hasta).index) == regando_fuerza_bruta(cuadro, desde, hasta)
+
+
+def test_regando_fuera_del_turno_y_filtros():
+    red = red_turno()
+    cuadro = red.get_cuadro_red()
+    assert red.regando(cuadro.Inicio.min() - pd.Timedelta(1, 'min')).empty
+    assert red.regando(cuadro.Fin.max()).empty
+    instante = cuadro.Inicio.min()
+    cauces = red.regando(instante, instante + pd.Timedelta(1, 'd'), cauce=[1, 2])
+    assert set(cauces.Cauce) <= {1, 2}
+    with pytest.raises(ValueError):
+        red.regando(instante, instante)
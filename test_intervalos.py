@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from intervalos import indiceIntervalos
+
+
+def fuerza_bruta(inicio, fin, desde, hasta=None):
+    validos = ~np.isnan(inicio) & ~np.isnan(fin)
+    if hasta is None:
+        activos = (inicio <= desde) & (desde < fin)
+    else:
+        activos = (inicio < hasta) & (fin > desde)
+    return np.flatnonzero(validos & activos)
+
+
+def consulta_ordenada(indice, inicio, *limites):
+    posiciones = indice.consultar(*limites)
+    #Las posiciones se devuelven en orden de inicio
+    assert (np.diff(inicio[posiciones]) >= 0).all()
+    return np.sort(posiciones)
+
+
+@pytest.mark.parametrize('semilla', range(20))
+def test_consultas_iguales_a_fuerza_bruta(semilla):
+    rng = np.random.default_rng(semilla)
+    cantidad = int(rng.integers(1, 200))
+    #Extremos enteros en un rango chico: muchos intervalos se tocan, coinciden o tienen largo 0
+    inicio = rng.integers(0, 50, cantidad).astype(float)
+    fin = inicio + rng.integers(0, 10, cantidad)
+    inicio[rng.random(cantidad) < 0.05] = np.nan
+    indice = indiceIntervalos(inicio, fin)
+    assert len(indice) == (~np.isnan(inicio)).sum()
+
+    for instante in range(-2, 62):
+        assert np.array_equal(consulta_ordenada(indice, inicio, instante), fuerza_bruta(inicio, fin, instante))
+    for desde, hasta in rng.integers(-5, 65, (100, 2)):
+        desde, hasta = min(desde, hasta), max(desde, hasta)
+        assert np.array_equal(consulta_ordenada(indice, inicio, desde, hasta), fuerza_bruta(inicio, fin, desde, hasta))
+
+
+def test_extremos_que_se_tocan():
+    indice = indiceIntervalos(np.array([0.0, 5.0, 10.0]), np.array([5.0, 10.0, 15.0]))
+    #[inicio, fin): en el límite riega sólo el intervalo que empieza
+    assert list(indice.consultar(5)) == [1]
+    assert list(indice.consultar(15)) == []
+    assert list(indice.consultar(-1)) == []
+    assert list(indice.consultar(5, 10)) == [1]
+    assert list(indice.consultar(15, 20)) == []
+
+
+def test_fechas():
+    inicio = np.array(['2022-03-01T00:00', '2022-03-01T06:00', 'NaT'], dtype='datetime64[ns]')
+    fin = np.array(['2022-03-01T06:00', '2022-03-01T12:00', '2022-03-02T00:00'], dtype='datetime64[ns]')
+    indice = indiceIntervalos(inicio, fin)
+    assert len(indice) == 2
+    assert list(indice.consultar(np.datetime64('2022-03-01T06:00'))) == [1]
+    assert list(indice.consultar(np.datetime64('2022-03-01T05:59'), np.datetime64('2022-03-01T06:01'))) == [0, 1]
+
+
+@pytest.mark.parametrize('inicio, fin', [([], []), ([np.nan], [1.0])])
+def test_indice_vacio(inicio, fin):
+    indice = indiceIntervalos(np.array(inicio), np.array(fin))
+    assert len(indice) == 0
+    assert list(indice.consultar(0)) == []
+    assert list(indice.consultar(0, 10)) == []
@@ -0,0 +1,25 @@
+import json
+
+import pytest
+
+from app import app
+from generador_padron import generar_inspeccion, payload_turno
+
+
+@pytest.mark.parametrize('motor', ['pandas', 'numpy'])
+def test_cuadro_anidado_por_cauce(motor):
+    cliente = app.test_client()
+    payload = dict(payload_turno(generar_inspeccion(parcelas=80, cauces=6, semilla=3)), motor=motor)
+    plano = json.loads(cliente.post('/turno_riego', json=payload).get_data(as_text=True))
+    anidado = cliente.post('/turno_riego', json=dict(payload, json_anidado=1)).get_json()
+
+    for tabla in ('cuadro', 'cuentaAgua'):
+        #Un string JSON por cauce, con las filas de ese cauce por id_parcela
+        filas = {}
+        for cauce, texto in anidado[tabla].items():
+            tramo = json.loads(texto)
+            assert {fila['Cauce'] for fila in tramo.values()} == {int(cauce)}
+            filas.update(tramo)
+        assert filas == plano[tabla]
+        assert list(anidado[tabla]) == [str(cauce) for cauce in dict.fromkeys(fila['Cauce'] for fila in plano[tabla].values())]
+    assert json.loads(anidado['caudales']) == plano['caudales']
@@ -0,0 +1,25 @@
+import pytest
+
+from Clase_dis_sec_v3_1 import leer_columnas
+from app import app
+from generador_padron import generar_inspeccion, payload_turno
+
+modos = {'cabeza_cola': [0, 1, 1], 'grupo': [1, 1, 0], 'subgrupo': [0, 1, 0]}
+
+
+def test_modos_por_columnas_con_indice():
+    indice, columnas = leer_columnas(dict(modos, orden_cauce=[4, 5, 6]), 'modos')
+    assert list(indice) == [4, 5, 6]
+    assert list(columnas['grupo']) == [1, 1, 0]
+
+
+def test_modos_por_columnas_sin_indice():
+    with pytest.raises(ValueError, match="Falta la columna 'orden_cauce' en la tabla 'modos'"):
+        leer_columnas(modos, 'modos')
+
+
+def test_turno_con_modos_sin_indice_responde_400():
+    payload = payload_turno(generar_inspeccion(parcelas=30, cauces=3, subgrupos=1))
+    respuesta = app.test_client().post('/turno_riego', json=dict(payload, modos=modos))
+    assert respuesta.status_code == 400
+    assert 'orden_cauce' in respuesta.get_json()['message']
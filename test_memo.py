@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+
+@pytest.fixture
+def red():
+    inspeccion = generar_inspeccion(parcelas=200, cauces=10, subgrupos=3, semilla=1)
+    red = rs(padron=inspeccion['padron'], solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+             refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+             caudal_canal=1500, dur_turno=7, fecha_inicio='01-03-2022', vol_riego_p_ha=800)
+    red.get_cuadro_red()
+    return red
+
+
+def recalculados(red, antes):
+    #Nodos recalculados desde antes, con la cantidad de veces
+    return dict(red.recalculos - antes)
+
+
+def test_lecturas_repetidas_no_recalculan(red):
+    antes = red.recalculos.copy()
+    for _ in range(3):
+        red.get_cuadro_red()
+        red.set_modo_riego()
+        red.get_caudal_riego()
+    assert recalculados(red, antes) == {}
+
+
+def test_cada_nodo_se_recalcula_una_vez_por_cambio(red):
+    antes = red.recalculos.copy()
+    red.caudal_canal = 1200
+    for _ in range(3):
+        red.get_cuadro_red()
+    assert recalculados(red, antes) == {'vol_riego_ha': 1, 'vol_riego': 1, 'modo_riego': 1, 'caudal_riego': 1,
+                                        'cuadro_red': 1}
+
+
+def test_asignar_fecha_inicio_con_dia_primero(red):
+    antes = red.recalculos.copy()
+    red.fecha_inicio = '02-03-2022'
+    assert red.fecha_inicio == pd.Timestamp('2022-03-02')
+    cuadro = red.get_cuadro_red()
+    assert cuadro['Inicio'].min() == pd.Timestamp('2022-03-02')
+    assert recalculados(red, antes) == {'modo_riego': 1, 'caudal_riego': 1, 'cuadro_red': 1}
+
+
+def test_con_parametros_interpreta_la_fecha_igual(red):
+    assert red.con_parametros(fecha_inicio='02-03-2022').fecha_inicio == pd.Timestamp('2022-03-02')
+    #La misma fecha en otro formato no invalida nada
+    antes = red.recalculos.copy()
+    copia = red.con_parametros(fecha_inicio='2022-03-01')
+    copia.get_cuadro_red()
+    assert recalculados(copia, antes) == {}
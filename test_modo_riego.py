@@ -0,0 +1,33 @@
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+
+def red_con_cauce_en_dos_subgrupos(caso):
+    #El cauce 3 tiene la segunda mitad de sus parcelas en el subgrupo siguiente
+    inspeccion = generar_inspeccion(parcelas=60, cauces=7, subgrupos=3, casos=(caso,), semilla=caso)
+    padron = pd.read_json(inspeccion['padron'])
+    filas = padron.index[padron.orden_cauce == 3]
+    padron.loc[filas[len(filas) // 2:], 'Subgrupo'] += 1
+    return rs(padron=padron.to_json(), solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+              refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+              caudal_canal=1500, dur_turno=7, fecha_inicio='01-03-2022', vol_riego_p_ha=800)
+
+
+@pytest.mark.parametrize('caso', [0, 1, 2, 3])
+def test_una_fila_por_cauce(caso):
+    red = red_con_cauce_en_dos_subgrupos(caso)
+    modo_riego = red.set_modo_riego()
+    assert list(modo_riego.index[modo_riego.turnado_c.notna()]) == list(range(8))
+    assert len(red.get_cuadro_red()) == 60
+
+
+def test_rige_el_ultimo_subgrupo_del_cauce():
+    #Caso 1: el cauce inicia con el último de sus subgrupos, que a su vez se programa con todos los pares
+    red = red_con_cauce_en_dos_subgrupos(1)
+    modo_riego = red.set_modo_riego()
+    subgrupo = red.padron.loc[red.padron.orden_cauce == 3, 'Subgrupo'].max()
+    assert modo_riego.inicio_c[3] == modo_riego.inicio_sg[subgrupo]
+    assert red.get_factor_turnado().index.is_unique
@@ -0,0 +1,30 @@
+import pandas as pd
+import pytest
+
+from benchmark_turno import verificar_motores
+from generador_padron import generar_inspeccion
+
+
+def inspeccion_con_cauce_en_dos_subgrupos(caso):
+    #El cauce 3 tiene la segunda mitad de sus parcelas en el subgrupo siguiente
+    inspeccion = generar_inspeccion(parcelas=80, cauces=8, subgrupos=3, casos=(caso,), semilla=caso)
+    padron = pd.read_json(inspeccion['padron'])
+    filas = padron.index[padron.orden_cauce == 3]
+    padron.loc[filas[len(filas) // 2:], 'Subgrupo'] += 1
+    return dict(inspeccion, padron=padron.to_json())
+
+
+@pytest.mark.parametrize('caso', [0, 1, 2, 3])
+def test_motores_coinciden(caso):
+    #verificar_motores compara el cuadro de ambos motores con simular 0 y 1
+    inspeccion = generar_inspeccion(parcelas=120, cauces=10, subgrupos=3, casos=(caso,), semilla=caso)
+    assert verificar_motores(inspeccion) == []
+
+
+@pytest.mark.parametrize('caso', [0, 1, 2, 3])
+def test_motores_coinciden_con_cauce_en_dos_subgrupos(caso):
+    assert verificar_motores(inspeccion_con_cauce_en_dos_subgrupos(caso)) == []
+
+
+def test_motores_coinciden_con_casos_combinados():
+    assert verificar_motores(generar_inspeccion(parcelas=300, cauces=24, subgrupos=8, grupos=4, semilla=5)) == []
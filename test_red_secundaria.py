@@ -0,0 +1,89 @@
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+
+
+def red_mixta(caso=3, simular=0):
+    #Cuatro cauces en un subgrupo que alternan riego por cola (cabeza_cola 0) y por cabeza (1); sin refuerzo ni reservorio
+    grupo, subgrupo = {0: (1, 1), 3: (0, 0)}[caso]
+    padron = pd.DataFrame({'orden_cauce': [1, 1, 2, 3, 4, 4],
+                           'Subgrupo': 1,
+                           'Grupo': 1,
+                           'sup_emp_reducida': [10.0, 5.0, 8.0, 4.0, 6.0, 2.0],
+                           'ha_si': 1,
+                           'tpo_rec_toma': [5, 2, 3, 1, 4, 0],
+                           'tpo_rec_cabeza_cola': [10, 4, 7, 2, 3, 1],
+                           'tpo_rec_cola_cabeza': [20, 3, 6, 9, 5, 2],
+                           'tpo_descuelgue': [30, 10, 20, 15, 12, 8],
+                           'CC': 1000,
+                           'PP': [1, 2, 3, 4, 5, 6],
+                           'idPadron': [1, 2, 3, 4, 5, 6]},
+                          index=pd.RangeIndex(1, 7))
+    solicitud = pd.DataFrame({'sup_ad': 0.0, 'sup_res': 0.0, 'sup_rec': 0.0, 'sup_ced': 0.0, 'ha_activa': 1.0},
+                             index=padron.index)
+    modos = pd.DataFrame({'cabeza_cola': [0, 1, 0, 1], 'grupo': grupo, 'subgrupo': subgrupo},
+                         index=pd.RangeIndex(1, 5, name='orden_cauce'))
+    return rs(padron=padron, solicitud=solicitud, modos=modos,
+              refuerzo=pd.DataFrame({'caudal_refuerzo': [0.0], 'dur_refuerzo': [0.0]}),
+              reservorio=pd.DataFrame({'volumen': [0.0]}),
+              caudal_canal=1400, dur_turno=7, fecha_inicio='01-03-2022', vol_riego_p_ha=800, simular=simular)
+
+
+#Por cola: descuelgue - (toma + cabeza_cola); por cabeza: descuelgue - cola_cabeza. Sumados por cauce.
+tpo_red = {1: 40 - (7 + 14), 2: 20 - 6, 3: 15 - (1 + 2), 4: 20 - 7}
+sup_riego = {1: 15.0, 2: 8.0, 3: 4.0, 4: 8.0}
+
+
+def test_tpo_red_segun_el_modo_de_cada_cauce():
+    red = red_mixta()
+    assert red.get_tpo_red().to_dict() == tpo_red
+
+
+@pytest.mark.parametrize('caso', [0, 3])
+def test_caudal_riego_por_cauce(caso):
+    red = red_mixta(caso)
+    #Sin refuerzo ni reservorio cada cauce recibe su parte del caudal del canal descontado el tiempo de red
+    neto = 1 - sum(tpo_red.values()) / (24 * 60 * 7)
+    if caso == 0:
+        #Cauces secuenciales: cada uno toma el canal entero durante su parte del turno
+        esperado = {cauce: 1400 * neto for cauce in sup_riego}
+    else:
+        #Cauces independientes: todos riegan el turno completo con caudal proporcional a su superficie
+        esperado = {cauce: 1400 * sup / 35 * neto for cauce, sup in sup_riego.items()}
+    caudal = red.get_caudal_riego()
+    assert caudal.iloc[0] == 0
+    assert caudal.iloc[1:].to_dict() == pytest.approx(esperado)
+
+
+def test_caudal_riego_simulado():
+    red = red_mixta(3, simular=1)
+    esperado = {cauce: 800 * sup / (7 * 24 * 60 * 60 / 1000) for cauce, sup in sup_riego.items()}
+    assert red.get_caudal_riego().iloc[1:].to_dict() == pytest.approx(esperado)
+
+
+def test_resolver_sin_objetivo():
+    red = red_mixta()
+    red.vol_riego_p_ha = None
+    with pytest.raises(ValueError, match='falta el objetivo'):
+        red.resolver_parametro()
+
+
+@pytest.mark.parametrize('variable', ['caudal_canal', 'dur_turno'])
+def test_resolver_alcanza_el_objetivo(variable):
+    solucion = red_mixta().resolver_parametro(950, variable)
+    assert solucion['vol_riego_ha'] == pytest.approx(950)
+    #Con el valor resuelto la red vuelve a dar el objetivo
+    red = red_mixta().con_parametros(**{variable: solucion[variable]})
+    assert red.get_vol_riego_ha() == pytest.approx(950)
+
+
+def test_resolver_objetivo_por_cauce():
+    solucion = red_mixta().resolver_parametro(pd.Series({1: 700.0, 3: 950.0}))
+    assert list(solucion['por_cauce'].index) == [1, 3]
+    assert solucion['vol_riego_ha'] == pytest.approx(950)
+
+
+def test_resolver_objetivo_con_cauces_ajenos():
+    with pytest.raises(ValueError, match='no están en la red: 9'):
+        red_mixta().resolver_parametro(pd.Series({1: 700.0, 9: 950.0}))
@@ -0,0 +1,23 @@
+from app import app
+from generador_padron import generar_inspeccion, payload_turno
+
+
+def simular(**parametros):
+    payload = payload_turno(generar_inspeccion(parcelas=60, cauces=5, semilla=2))
+    for clave in ('caudal', 'turno', 'simular', 'vol_riego_p_ha'):
+        payload.pop(clave)
+    return app.test_client().post('/simulacion_lote', json=dict(payload, **parametros))
+
+
+def test_caudales_cambian_con_el_caudal_del_canal():
+    respuesta = simular(caudal=[1000, 2000], turno=[7, 7])
+    assert respuesta.status_code == 200
+    menor, mayor = respuesta.get_json()['caudal'].values()
+    assert all(valor > 0 for valor in menor.values())
+    assert all(mayor[cauce] > menor[cauce] for cauce in menor)
+
+
+def test_simular_sin_volumen_programado_responde_400():
+    respuesta = simular(caudal=[1000, 2000], turno=[7, 7], simular=1)
+    assert respuesta.status_code == 400
+    assert 'vol_riego_p_ha' in respuesta.get_json()['message']
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from Clase_dis_sec_v3_1 import redSecundaria as rs
+from generador_padron import generar_inspeccion
+
+fechas = ['01-03-2022', '10-03-2022', '20-03-2022']
+caudales = [1500, 1200, 1700]
+turnos = [7, 9.5, 5]
+volumenes = [800, 700, 900]
+
+
+@pytest.mark.parametrize('caso', [0, 1, 2, 3])
+@pytest.mark.parametrize('simular', [0, 1])
+def test_sin_arrastre_cada_turno_coincide_con_cuadro_red(caso, simular):
+    inspeccion = generar_inspeccion(parcelas=300, cauces=20, subgrupos=5, casos=(caso,), semilla=caso)
+    solicitud = pd.read_json(inspeccion['solicitud'])
+    solicitud.iloc[7, solicitud.columns.get_loc('sup_ced')] = 50.0 # una parcela con sup_riego negativa
+    tablas = dict(padron=inspeccion['padron'], solicitud=solicitud.to_json(), modos=inspeccion['modos'],
+                  refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'], simular=simular)
+    red = rs(caudal_canal=1500, dur_turno=7, fecha_inicio=fechas[0], vol_riego_p_ha=800, **tablas)
+    assert (red.padron['sup_riego'] < 0).any()
+
+    temporada = red.planificar_temporada(fechas, caudal_canal=caudales, dur_turno=turnos, vol_riego_p_ha=volumenes,
+                                         arrastre=False)
+    for turno, (fecha, caudal, duracion, volumen) in enumerate(zip(fechas, caudales, turnos, volumenes)):
+        esperado = rs(caudal_canal=caudal, dur_turno=duracion, fecha_inicio=fecha, vol_riego_p_ha=volumen,
+                      **tablas).get_cuadro_red()
+        pd.testing.assert_frame_equal(temporada['cuadros'].loc[turno][esperado.columns], esperado, check_names=False)
+
+
+def test_con_arrastre_reparte_toda_la_duracion_del_cauce():
+    inspeccion = generar_inspeccion(parcelas=300, cauces=20, subgrupos=5, semilla=1)
+    red = rs(padron=inspeccion['padron'], solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+             refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+             caudal_canal=1500, dur_turno=7, fecha_inicio=fechas[0], vol_riego_p_ha=800)
+    cuadros = red.planificar_temporada(fechas, dur_turno=turnos)['cuadros']
+    for turno, (fecha, duracion) in enumerate(zip(fechas, turnos)):
+        modo_riego = rs(padron=inspeccion['padron'], solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+                        refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'], caudal_canal=1500,
+                        dur_turno=duracion, fecha_inicio=fecha, vol_riego_p_ha=800).set_modo_riego()
+        por_cauce = cuadros.loc[turno].groupby('Cauce').agg(inicio=('Inicio', 'min'), tiempo=('Tiempo', 'sum'))
+        assert (por_cauce['inicio'] == modo_riego.inicio_c.reindex(por_cauce.index)).all()
+        assert (por_cauce['tiempo'] == modo_riego.duracion_c.reindex(por_cauce.index)).all()
+
+
+def test_muchos_turnos_y_cauce_en_dos_subgrupos_coinciden_con_set_modo_riego():
+    inspeccion = generar_inspeccion(parcelas=400, cauces=30, subgrupos=6, semilla=3)
+    padron = pd.read_json(inspeccion['padron'])
+    parcelas = padron.index[padron.orden_cauce == 5]
+    padron.loc[parcelas[len(parcelas) // 2:], 'Subgrupo'] += 1 # el cauce 5 queda repartido en dos subgrupos
+    red = rs(padron=padron.to_json(), solicitud=inspeccion['solicitud'], modos=inspeccion['modos'],
+             refuerzo=inspeccion['refuerzo'], reservorio=inspeccion['reservorio'],
+             caudal_canal=1500, dur_turno=7, fecha_inicio=fechas[0], vol_riego_p_ha=800)
+    muchas = list(pd.date_range('2022-03-01', periods=24, freq='8D').strftime('%d-%m-%Y'))
+    duraciones = [3 + (turno * 7 % 11) / 2 for turno in range(len(muchas))]
+    cuadros = red.planificar_temporada(muchas, dur_turno=duraciones, arrastre=False)['cuadros']
+    for turno, (fecha, duracion) in enumerate(zip(muchas, duraciones)):
+        modo_riego = red.con_parametros(dur_turno=duracion, fecha_inicio=fecha).set_modo_riego()
+        por_cauce = cuadros.loc[turno].groupby('Cauce').agg(inicio=('Inicio', 'min'), tiempo=('Tiempo', 'sum'))
+        assert (por_cauce['inicio'] == modo_riego.inicio_c.reindex(por_cauce.index)).all()
+        assert (por_cauce['tiempo'] == modo_riego.duracion_c.reindex(por_cauce.index)).all()
@@ -0,0 +1,79 @@
+import json
+import time
+
+import pytest
+
+import app
+from generador_padron import generar_inspeccion, payload_turno
+from trabajos import colaLlena, colaTrabajos
+
+
+@pytest.fixture
+def cola():
+    cola = colaTrabajos(procesos=1, max_pendientes=2)
+    yield cola
+    cola.cerrar()
+
+
+def esperar_vacia(cola, limite=10):
+    fin = time.time() + limite
+    while cola.pendientes() and time.time() < fin:
+        time.sleep(0.05)
+    return cola.pendientes()
+
+
+def test_enviar_respeta_el_limite(cola):
+    cola.enviar(time.sleep, 0.5)
+    cola.enviar(time.sleep, 0.5)
+    with pytest.raises(colaLlena):
+        cola.enviar(time.sleep, 0.5)
+    #Tampoco se admite un lote mientras la cola está llena
+    with pytest.raises(colaLlena):
+        cola.lote(time.sleep, [0.1])
+    assert esperar_vacia(cola) == 0
+
+
+def test_lote_comparte_el_limite(cola):
+    indices = []
+    tareas = cola.lote(time.sleep, [0.3] * 5)
+    #El lote ocupa los lugares libres de la cola
+    with pytest.raises(colaLlena):
+        cola.enviar(time.sleep, 0)
+    for tarea in tareas:
+        assert cola.pendientes() <= 2
+        assert tarea['estado'] == 'terminado'
+        indices.append(tarea['indice'])
+        if len(indices) == 3:
+            tareas.close()
+            break
+    assert sorted(indices) == sorted(set(indices))
+    #Al dejar de leer el lote no se envían las tareas restantes y se cancelan las pendientes
+    assert esperar_vacia(cola) == 0
+    cola.enviar(time.sleep, 0)
+
+
+def test_lote_informa_errores_por_tarea(cola):
+    tareas = sorted(cola.lote(time.sleep, [0.1, -1, 0.1]), key=lambda tarea: tarea['indice'])
+    assert [tarea['estado'] for tarea in tareas] == ['terminado', 'error', 'terminado']
+    assert 'ValueError' in tareas[1]['error']
+
+
+def test_turno_riego_lote(cola, monkeypatch):
+    monkeypatch.setattr(app, 'cola_trabajos', cola)
+    cliente = app.app.test_client()
+    valida = dict(payload_turno(generar_inspeccion(parcelas=40, cauces=4)), inspeccion='valida')
+    sin_modos = dict(valida, inspeccion='sin_modos', modos=None)
+    respuesta = cliente.post('/turno_riego_lote', json={'inspecciones': [valida, sin_modos, valida]})
+    assert respuesta.status_code == 200
+    lineas = {}
+    for linea in respuesta.get_data(as_text=True).splitlines():
+        tarea = json.loads(linea)
+        lineas[tarea['indice']] = tarea
+    assert [lineas[indice]['estado'] for indice in range(3)] == ['terminado', 'error', 'terminado']
+    assert "modos" in lineas[1]['error']
+    assert lineas[0]['resultado'] == cliente.post('/turno_riego', json=valida).get_json()
+
+    #Con la cola llena el lote se rechaza antes de empezar
+    cola.enviar(time.sleep, 0.5)
+    cola.enviar(time.sleep, 0.5)
+    assert cliente.post('/turno_riego_lote', json={'inspecciones': [valida]}).status_code == 503
@@ -0,0 +1,204 @@
+#Ejecución en segundo plano de cálculos largos (inspecciones grandes) en un pool de procesos.
+import itertools
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+
+class colaLlena(Exception):
+    '''
+    Se alcanzó la cantidad máxima de trabajos pendientes en la cola.
+    '''
+
+
+def _precalentar():
+    #Importa pandas y las clases de cálculo al iniciar cada proceso, para que el primer trabajo no pague la importación.
+    import pandas
+    import Clase_dis_sec_v3_1
+    import turno_riego
+
+
+def _ejecutar(funcion, args):
+    #Corre en el proceso de trabajo: devuelve el resultado junto con los instantes de inicio y fin.
+    inicio = time.time()
+    resultado = funcion(args)
+    return resultado, inicio, time.time()
+
+
+def _ejecutar_protegido(funcion, args):
+    #Como _ejecutar, pero devuelve el error en lugar de lanzarlo para que una tarea fallida no aborte el lote.
+    inicio = time.time()
+    try:
+        return funcion(args), None, inicio, time.time()
+    except Exception as error:
+        return None, '%s: %s' % (type(error).__name__, error), inicio, time.time()
+
+
+class colaTrabajos:
+    '''
+    Cola de trabajos sobre un pool de procesos acotado.
+    Cada trabajo recibe un id para consultar su estado y resultado, se puede cancelar mientras está pendiente
+    y registra los tiempos de espera y de ejecución. La cantidad de trabajos pendientes está limitada (max_pendientes),
+    contando también las tareas de los lotes en curso.
+    '''
+
+    def __init__(self, procesos=None, max_pendientes=32, max_terminados=256):
+        self.procesos = procesos
+        self.max_pendientes = max_pendientes
+        self.max_terminados = max_terminados
+        self._pool = None
+        self._trabajos = OrderedDict() # id -> datos del trabajo
+        self._en_lote = set() # Futuros enviados por lote() que todavía no terminaron
+        self._ids = itertools.count(1)
+        self._candado = threading.Lock()
+
+    def _get_pool(self):
+        # El pool se crea con el primer trabajo. Se usa 'spawn' porque el servidor corre con hilos.
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.procesos,
+                                             mp_context=multiprocessing.get_context('spawn'),
+                                             initializer=_precalentar)
+        return self._pool
+
+    def pendientes(self):
+        self._en_lote = {futuro for futuro in self._en_lote if not futuro.done()}
+        return sum(1 for trabajo in self._trabajos.values() if not trabajo['futuro'].done()) + len(self._en_lote)
+
+    def enviar(self, funcion, args, **datos):
+        '''
+        Encola funcion(args) para correr en un proceso del pool.
+        :param datos: datos adicionales que se guardan con el trabajo (ej: formato de la respuesta).
+        :return: id del trabajo.
+        :raises colaLlena: si ya hay max_pendientes trabajos sin terminar.
+        '''
+        with self._candado:
+            if self.pendientes() >= self.max_pendientes:
+                raise colaLlena('Hay %d trabajos pendientes' % self.max_pendientes)
+            id_trabajo = str(next(self._ids))
+            futuro = self._get_pool().submit(_ejecutar, funcion, args)
+            self._trabajos[id_trabajo] = dict(datos, futuro=futuro, enviado=time.time())
+            self._descartar_terminados()
+        return id_trabajo
+
+    def _descartar_terminados(self):
+        terminados = [id_trabajo for id_trabajo, trabajo in self._trabajos.items() if trabajo['futuro'].done()]
+        for id_trabajo in terminados[:max(0, len(terminados) - self.max_terminados)]:
+            del self._trabajos[id_trabajo]
+
+    def obtener(self, id_trabajo):
+        '''
+        Datos guardados del trabajo o None si no existe.
+        '''
+        with self._candado:
+            return self._trabajos.get(id_trabajo)
+
+    def estado(self, id_trabajo):
+        '''
+        Estado (pendiente / ejecutando / terminado / error / cancelado) y tiempos del trabajo, o None si no existe.
+        '''
+        trabajo = self.obtener(id_trabajo)
+        if trabajo is None:
+            return None
+        futuro = trabajo['futuro']
+        estado = {'id': id_trabajo, 'enviado': trabajo['enviado']}
+        if futuro.cancelled():
+            estado['estado'] = 'cancelado'
+        elif not futuro.done():
+            estado['estado'] = 'ejecutando' if futuro.running() else 'pendiente'
+        elif futuro.exception() is not None:
+            estado['estado'] = 'error'
+            estado['error'] = str(futuro.exception())
+        else:
+            _, inicio, fin = futuro.result()
+            estado.update({'estado': 'terminado',
+                           'inicio': inicio,
+                           'fin': fin,
+                           'espera': inicio - trabajo['enviado'],
+                           'duracion': fin - inicio})
+        return estado
+
+    def resultado(self, id_trabajo):
+        '''
+        Resultado de un trabajo terminado. Relanza la excepción del trabajo si falló.
+        :raises KeyError: si el trabajo no existe. CancelledError: si se canceló.
+        '''
+        trabajo = self.obtener(id_trabajo)
+        if trabajo is None:
+            raise KeyError(id_trabajo)
+        return trabajo['futuro'].result()[0]
+
+    def cancelar(self, id_trabajo):
+        '''
+        Cancela un trabajo que todavía no empezó a ejecutarse.
+        :return: True si se canceló, False si ya estaba en ejecución o terminado.
+        '''
+        trabajo = self.obtener(id_trabajo)
+        if trabajo is None:
+            raise KeyError(id_trabajo)
+        return trabajo['futuro'].cancel()
+
+    def lote(self, funcion, lista_args, espera=0.05):
+        '''
+        Ejecuta funcion sobre cada elemento de lista_args en el pool (una tarea por elemento) y devuelve
+        los resultados a medida que terminan, sin esperar al resto.
+        Las tareas comparten el límite de max_pendientes con los trabajos: se envían a medida que hay lugar en la
+        cola y las que no empezaron se cancelan si se deja de leer el lote (ej: se corta la petición).
+        :return: Generador de diccionarios con indice (posición en lista_args), estado (terminado / error),
+                 resultado o error, y tiempos de espera y ejecución.
+        :raises colaLlena: si la cola no tiene lugar para ninguna tarea (se informa al llamar, antes de iterar).
+        '''
+        enviado = time.time()
+        restantes = list(enumerate(lista_args))[::-1]
+        futuros = {}
+        self._admitir(funcion, restantes, futuros)
+        if restantes and not futuros:
+            raise colaLlena('Hay %d trabajos pendientes' % self.max_pendientes)
+        return self._resultados_lote(funcion, restantes, futuros, enviado, espera)
+
+    def _admitir(self, funcion, restantes, futuros):
+        # Envía tareas del lote mientras haya lugar en la cola
+        with self._candado:
+            while restantes and self.pendientes() < self.max_pendientes:
+                indice, args = restantes.pop()
+                futuro = self._get_pool().submit(_ejecutar_protegido, funcion, args)
+                self._en_lote.add(futuro)
+                futuros[futuro] = indice
+
+    def _resultados_lote(self, funcion, restantes, futuros, enviado, espera):
+        try:
+            while futuros or restantes:
+                if not futuros:
+                    # La cola está ocupada por otros trabajos: se espera a que se libere lugar
+                    time.sleep(espera)
+                    self._admitir(funcion, restantes, futuros)
+                    continue
+                terminados, _ = wait(futuros, return_when=FIRST_COMPLETED)
+                for futuro in terminados:
+                    yield self._tarea_lote(futuros.pop(futuro), futuro, enviado)
+                self._admitir(funcion, restantes, futuros)
+        finally:
+            for futuro in futuros:
+                futuro.cancel()
+
+    @staticmethod
+    def _tarea_lote(indice, futuro, enviado):
+        tarea = {'indice': indice}
+        if futuro.exception() is not None:
+            # El proceso de trabajo terminó de forma anormal (ej: sin memoria)
+            tarea.update({'estado': 'error', 'error': str(futuro.exception()), 'resultado': None})
+            return tarea
+        resultado, error, inicio, fin = futuro.result()
+        tarea.update({'estado': 'error' if error else 'terminado',
+                      'espera': inicio - enviado,
+                      'duracion': fin - inicio,
+                      'resultado': resultado})
+        if error:
+            tarea['error'] = error
+        return tarea
+
+    def cerrar(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,112 @@
+#Línea de comandos para calcular turnos sin levantar el servidor: lee las inspecciones de archivos y escribe
+#las filas del cuadro de turno y de la cuenta de agua en NDJSON, un cauce por vez.
+#Sólo importa la librería estándar al iniciar; pandas y las clases de cálculo se cargan al calcular la primera inspección.
+import argparse
+import json
+import os
+import sys
+
+#Argumentos de /turno_riego que se pueden fijar desde la línea de comandos (reemplazan a los del archivo)
+parametros_cli = {'caudal': int, 'turno': int, 'fecha': str, 'simular': int, 'vol_riego_p_ha': int}
+tablas_cli = ('padron', 'inspeccion', 'solicitud', 'modos', 'refuerzos', 'reservorio')
+
+
+def archivos_entrada(entradas):
+    '''
+    Archivos JSON de las inspecciones: los indicados y los *.json de los directorios indicados (en orden alfabético).
+    '''
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for nombre in sorted(os.listdir(entrada)):
+                if nombre.endswith('.json'):
+                    yield os.path.join(entrada, nombre)
+        else:
+            yield entrada
+
+
+def leer_inspeccion(archivo, parametros):
+    '''
+    Argumentos de la inspección: el cuerpo de /turno_riego guardado en el archivo, con los parámetros de la línea de
+    comandos. Si el archivo no indica la inspección se identifica con el nombre del archivo.
+    '''
+    with open(archivo) as entrada:
+        datos = json.load(entrada)
+    if 'refuerzo' in datos and 'refuerzos' not in datos:
+        datos['refuerzos'] = datos.pop('refuerzo')
+    args = dict.fromkeys(tablas_cli + tuple(parametros_cli))
+    args.update(datos)
+    args.update({nombre: valor for nombre, valor in parametros.items() if valor is not None})
+    if args.get('inspeccion') is None and args.get('padron') is not None:
+        args['inspeccion'] = os.path.splitext(os.path.basename(archivo))[0]
+    return args
+
+
+def linea_error(inspeccion, error):
+    return json.dumps({'inspeccion': inspeccion, 'tabla': 'error', 'error': '%s: %s' % (type(error).__name__, error)}) + '\n'
+
+
+def ejecutar(entradas, salida, parametros, procesos=1):
+    '''
+    Calcula las inspecciones y escribe sus filas en salida a medida que se generan.
+    Con procesos > 1 cada inspección se calcula en un proceso del pool y se escribe completa al terminar.
+    :return: Cantidad de inspecciones con error (no detienen el resto).
+    '''
+    errores = 0
+    archivos = list(archivos_entrada(entradas))
+    lista_args = []
+    for archivo in archivos:
+        try:
+            lista_args.append(leer_inspeccion(archivo, parametros))
+        except (OSError, ValueError) as error:
+            salida.write(linea_error(archivo, error))
+            errores += 1
+
+    if procesos > 1 and len(lista_args) > 1:
+        from trabajos import colaTrabajos
+        from turno_riego import calcular_filas
+
+        cola = colaTrabajos(procesos=procesos)
+        try:
+            for tarea in cola.lote(calcular_filas, lista_args):
+                if tarea['estado'] == 'terminado':
+                    salida.write(tarea['resultado'])
+                else:
+                    salida.write(json.dumps({'inspeccion': lista_args[tarea['indice']].get('inspeccion'),
+                                             'tabla': 'error', 'error': tarea['error']}) + '\n')
+                    errores += 1
+                salida.flush()
+        finally:
+            cola.cerrar()
+        return errores
+
+    from turno_riego import filas_turno
+
+    for args in lista_args:
+        try:
+            for filas in filas_turno(args):
+                salida.write(filas)
+        except Exception as error:
+            salida.write(linea_error(args.get('inspeccion'), error))
+            errores += 1
+        salida.flush()
+    return errores
+
+
+if __name__ == "__main__":
+    argumentos = argparse.ArgumentParser(description='Calcula turnos de riego desde archivos y escribe NDJSON '
+                                                     '(una fila por parcela del cuadro de turno y de la cuenta de agua).')
+    argumentos.add_argument('entradas', nargs='+',
+                            help='archivos JSON con el cuerpo de /turno_riego, o directorios con esos archivos')
+    argumentos.add_argument('-o', '--salida', default='-', help='archivo NDJSON de salida (- para la salida estándar)')
+    argumentos.add_argument('-j', '--procesos', type=int, default=1, help='procesos en paralelo (una inspección por proceso)')
+    for nombre, tipo in parametros_cli.items():
+        argumentos.add_argument('--' + nombre.replace('_', '-'), dest=nombre, type=tipo)
+    args = argumentos.parse_args()
+
+    salida = sys.stdout if args.salida == '-' else open(args.salida, 'w')
+    try:
+        errores = ejecutar(args.entradas, salida, {nombre: getattr(args, nombre) for nombre in parametros_cli}, args.procesos)
+    finally:
+        if salida is not sys.stdout:
+            salida.close()
+    sys.exit(1 if errores else 0)
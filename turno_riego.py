@@ -0,0 +1,370 @@
+#Cálculo del turno de riego de una inspección a partir de los argumentos de la petición, independiente de Flask.
+#Lo usan el servidor (app.py) y los procesos de trabajo en segundo plano.
+import json
+
+import numpy as np
+import pandas as pd
+
+from Clase_dis_sec_v3_1 import dias_a_duracion, redSecundaria as rs
+import almacen_padron
+import motor_numpy
+from cache_lru import cacheLRU, clave_contenido
+from instrumentacion import medir
+
+#Cache de redes ya agregadas (por tablas de entrada) entre peticiones del mismo proceso
+cache_redes = cacheLRU(capacidad=512 * 2**20)
+argumentos_red = ['padron', 'inspeccion', 'solicitud', 'modos', 'refuerzos', 'reservorio']
+argumentos_turno = ['caudal', 'turno', 'fecha', 'vol_riego_p_ha', 'simular']
+motores = ('pandas', 'numpy')
+
+formato_la = 'Fecha:%d-%m-%Y Hora:%H:%M'
+columnas_cuadro = ['Cauce', 'CC', 'PP', 'Caudal', 'Volumen', 'Inicio', 'Tiempo', 'Fin', 'id_parcela']
+columnas_cuenta_agua = ['Cauce', 'CC', 'PP', 'Agua Programada', 'Agua Entregada', 'Balance', 'Volumen', 'id_parcela']
+
+
+def formatear_fechas(fechas):
+    #Fechas datetime64 (enteros en ns) en formato_la, sin strftime: único punto en que se pasan a texto (NaT queda nulo)
+    texto = np.datetime_as_string(np.asarray(fechas, dtype='datetime64[ns]'), unit='m')
+    return np.array([None if fecha == 'NaT' else 'Fecha:%s-%s-%s Hora:%s' % (fecha[8:10], fecha[5:7], fecha[:4], fecha[11:])
+                     for fecha in texto], dtype=object)
+
+
+def formatear_cuadro(cuadro_red):
+    #Convierte a string los datetime de inicio y fin para la presentación en las vistas JS
+    cuadro = cuadro_red[columnas_cuadro].copy()
+    cuadro['Inicio'] = formatear_fechas(cuadro['Inicio'])
+    cuadro['Fin'] = formatear_fechas(cuadro['Fin'])
+    return cuadro
+
+
+def formatear_cuenta_agua(cuadro_red):
+    return cuadro_red[columnas_cuenta_agua].rename(columns={'Volumen': 'Volumen Entregado'})
+
+
+def huella_red(args):
+    '''
+    Valores que identifican las tablas de la red de la petición (para las claves de los caches).
+    Si el padrón se lee del almacén, se incluye la versión del archivo para no reutilizar un padrón reemplazado.
+    '''
+    valores = [args.get(argumento) for argumento in argumentos_red]
+    if args.get('padron') is None and args.get('inspeccion') is not None:
+        valores.append(almacen_padron.version(args['inspeccion']))
+    return valores
+
+
+def construir_red(args, **parametros):
+    '''
+    Conforma la red secundaria a partir de los argumentos de la petición.
+    Sin padrón en la petición, se lee el de la inspección indicada desde el almacén local (almacen_padron).
+    Los parametros indicados reemplazan a los de la petición (ej: escenarios del simulador).
+    :raises ValueError: si las tablas de entrada no cumplen su esquema.
+    '''
+    red = rs(padron=args['padron'],
+             refuerzo=args['refuerzos'],
+             solicitud=args['solicitud'],
+             reservorio=args['reservorio'],
+             modos=args['modos'],
+             caudal_canal=parametros.get('caudal_canal', args['caudal']),
+             dur_turno=parametros.get('dur_turno', args['turno']),
+             fecha_inicio=args['fecha'],
+             vol_riego_p_ha=parametros.get('vol_riego_p_ha', args['vol_riego_p_ha']),
+             simular=args['simular'],
+             inspeccion=args.get('inspeccion')
+             )
+    return red
+
+
+def obtener_red(args, **parametros):
+    '''
+    Reutiliza la red ya agregada si las tablas de entrada coinciden con una petición previa;
+    sólo se recalculan los valores que dependen de los parámetros de turno.
+    '''
+    clave = clave_contenido(*huella_red(args))
+    red = cache_redes.obtener(clave)
+    if red is None:
+        red = construir_red(args, **parametros)
+        red.get_sup_riego()
+        red.get_tpo_red()
+        red.get_factor_turnado()
+        cache_redes.guardar(clave, red)
+    return red.con_parametros(caudal_canal=parametros.get('caudal_canal', args['caudal']),
+                              dur_turno=parametros.get('dur_turno', args['turno']),
+                              fecha_inicio=args['fecha'],
+                              vol_riego_p_ha=parametros.get('vol_riego_p_ha', args['vol_riego_p_ha']),
+                              simular=args['simular'])
+
+
+def obtener_turno(args):
+    '''
+    Red con los parámetros de turno de la petición, reutilizada entre peticiones con los valores ya calculados
+    (cuadro de la red, índice de intervalos) para consultas repetidas sobre el mismo turno.
+    '''
+    clave = clave_contenido(*huella_red(args), *(args.get(argumento) for argumento in argumentos_turno))
+    red = cache_redes.obtener(clave)
+    if red is None:
+        red = obtener_red(args)
+        red.get_indice_turno()
+        cache_redes.guardar(clave, red)
+    return red
+
+
+def calcular_turno(args):
+    '''
+    Calcula el turno de riego de la inspección de la petición, con el motor indicado en args['motor']
+    ('pandas' por omisión, o 'numpy': ver calcular_turno_numpy).
+    :return: Diccionario con las tablas cuentaAgua, cuadro, caudales y dashboard serializadas en JSON.
+    '''
+    motor = args.get('motor') or 'pandas'
+    if motor not in motores:
+        raise ValueError("Motor de cálculo desconocido: %s (%s)" % (motor, ', '.join(motores)))
+    if motor == 'numpy':
+        return calcular_turno_numpy(args)
+    red = obtener_red(args)
+
+    #Genera salidas de datos: cuadro de turno y cuenta de agua de toda la red en una sola tabla
+    cuadro_red = red.get_cuadro_red()
+    modo_riego = red.set_modo_riego()
+    tiempo_ha = modo_riego.turnado_c[1:] / red.cauces.sup_riego
+    with medir('serializacion'):
+        cuadro = formatear_cuadro(cuadro_red).to_json(orient = 'index', date_format = 'iso', date_unit="s", double_precision = 1)
+        cuentaAgua = formatear_cuenta_agua(cuadro_red).to_json(orient = 'index', double_precision = 1)
+        cuadroCaudales = pd.DataFrame({'Caudal':red.get_caudal_riego()[1:],
+                                       'Tpo de Turnado':modo_riego.duracion_c[1:],
+                                       'Sup de Riego':red.get_sup_riego().cauce}).to_json(orient = 'index')
+        cuadroGeneral = pd.DataFrame({'Sup empadronada': red.cauces.sup_emp_reducida,
+                              'Sup de distribucion': red.cauces.sup_riego - (red.cauces.sup_anexa + red.cauces.sup_pase),
+                              'Sup de riego': red.cauces.sup_riego,
+                              'Ctd de padrones': red.get_indice_cauces()['parcelas'],
+                              'Tiempo de red': red.get_tpo_red(),
+                              'Tpo x ha': pd.Series(dias_a_duracion(tiempo_ha), index=tiempo_ha.index),
+                              'Inicio': modo_riego.inicio_c[1:],
+                              'Duracion': modo_riego.duracion_c[1:],
+                              'Fin': modo_riego.inicio_c[1:] + modo_riego.duracion_c[1:],
+                              'Vol x ha': red.get_vol_riego().cauce / red.cauces.sup_riego,
+                              'Volumen': red.get_vol_riego().cauce,
+                              #'Compensacion': red.cauces.fc,
+                              'Coef de riego': red.get_caudal_riego()[1:] / red.cauces.sup_riego,
+                              'Caudal': red.get_caudal_riego()[1:]
+                              }).to_json(orient = 'index')
+
+    #Compone los datos para la vista
+    response = { "cuentaAgua": cuentaAgua, "cuadro": cuadro, "caudales": cuadroCaudales, "dashboard": cuadroGeneral}
+    return response
+
+
+def _en_indice(indice, ids, valores, relleno=np.nan):
+    #Valores por cauce (ids) en el índice de la tabla, con relleno en el resto, como al alinear Series en pandas
+    if len(indice) == len(ids):
+        return valores
+    if valores.dtype.kind in 'mM':
+        salida = np.full(len(indice), np.datetime64('NaT'), dtype=valores.dtype)
+    else:
+        salida = np.full(len(indice), relleno, dtype=float)
+    salida[np.searchsorted(indice, ids)] = valores
+    return salida
+
+
+def calcular_turno_numpy(args):
+    '''
+    Turno de riego de la petición calculado con motor_numpy: las mismas tablas que calcular_turno sin armar la red.
+    Las tablas por cauce se indexan como en calcular_turno, por los cauces, subgrupos y grupos del padrón.
+    '''
+    padron = args['padron']
+    if padron is None and args.get('inspeccion') is not None:
+        padron = almacen_padron.leer_padron(args['inspeccion'])
+    with medir('motor_numpy'):
+        turno = motor_numpy.calcular_turno(padron, args['solicitud'], args['modos'], args['refuerzos'], args['reservorio'],
+                                           caudal_canal=args['caudal'],
+                                           dur_turno=args['turno'],
+                                           fecha_inicio=args['fecha'],
+                                           vol_riego_p_ha=args['vol_riego_p_ha'],
+                                           simular=args['simular'])
+
+    with medir('serializacion'):
+        id_parcela = turno['idPadron']
+        fin = turno['Inicio'] + turno['Tiempo']
+        cuadro = pd.DataFrame({'Cauce': turno['Cauce'],
+                               'CC': turno['CC'],
+                               'PP': turno['PP'],
+                               'Caudal': turno['Caudal'],
+                               'Volumen': turno['Volumen'],
+                               'Inicio': formatear_fechas(turno['Inicio']),
+                               'Tiempo': turno['Tiempo'],
+                               'Fin': formatear_fechas(fin),
+                               'id_parcela': id_parcela},
+                              index=id_parcela).to_json(orient = 'index', date_format = 'iso', date_unit="s", double_precision = 1)
+        cuentaAgua = pd.DataFrame({'Cauce': turno['Cauce'],
+                                   'CC': turno['CC'],
+                                   'PP': turno['PP'],
+                                   'Agua Programada': turno['Agua Programada'],
+                                   'Agua Entregada': turno['Agua Entregada'],
+                                   'Balance': turno['Balance'],
+                                   'Volumen Entregado': turno['Volumen'],
+                                   'id_parcela': id_parcela},
+                                  index=id_parcela).to_json(orient = 'index', double_precision = 1)
+
+        cauces = turno['cauces']
+        indice = np.union1d(np.union1d(cauces, turno['subgrupos']), turno['grupos'])
+        en_indice = lambda valores, relleno=np.nan: _en_indice(indice, cauces, valores, relleno)
+        sup_riego = turno['sup_riego']
+        volumen = sup_riego * turno['vol_riego_ha']
+        duracion = turno['duracion']
+        cuadroCaudales = pd.DataFrame({'Caudal': en_indice(turno['caudal']),
+                                       'Tpo de Turnado': en_indice(duracion),
+                                       'Sup de Riego': en_indice(sup_riego, 0)},
+                                      index=indice).to_json(orient = 'index')
+        cuadroGeneral = pd.DataFrame({'Sup empadronada': en_indice(turno['sup_emp_reducida']),
+                                      'Sup de distribucion': en_indice(sup_riego - (turno['sup_anexa'] + turno['sup_pase'])),
+                                      'Sup de riego': en_indice(sup_riego),
+                                      'Ctd de padrones': en_indice(turno['parcelas']),
+                                      'Tiempo de red': en_indice(turno['tpo_red']),
+                                      'Tpo x ha': en_indice(dias_a_duracion(turno['turnado'] / sup_riego)),
+                                      'Inicio': en_indice(turno['inicio']),
+                                      'Duracion': en_indice(duracion),
+                                      'Fin': en_indice(turno['inicio'] + duracion),
+                                      'Vol x ha': en_indice(volumen / sup_riego),
+                                      'Volumen': en_indice(volumen, 0),
+                                      'Coef de riego': en_indice(turno['caudal'] / sup_riego),
+                                      'Caudal': en_indice(turno['caudal'])},
+                                     index=indice).to_json(orient = 'index')
+
+    return {"cuentaAgua": cuentaAgua, "cuadro": cuadro, "caudales": cuadroCaudales, "dashboard": cuadroGeneral}
+
+
+def calcular_hidrograma(args, intervalo=None, como='media'):
+    '''
+    Hidrograma en cabecera del canal para la inspección de la petición (ver redSecundaria.get_hidrograma).
+    :param intervalo: Si se indica (ej: '1h'), el hidrograma se remuestrea a ese intervalo por 'media' o 'maximo'.
+    :return: Diccionario con el hidrograma, el resumen (pico y exceso sobre caudal_canal) y los tramos excedidos en JSON.
+    '''
+    red = obtener_red(args)
+    hidrograma = red.get_hidrograma() if intervalo is None else red.remuestrear_hidrograma(intervalo, como)
+    resumen = red.resumen_hidrograma()
+    excesos = resumen.pop('excesos')
+    with medir('serializacion'):
+        resumen['instante_pico'] = None if resumen['instante_pico'] is None else resumen['instante_pico'].isoformat()
+        resumen['tiempo_excedido'] = pd.Timedelta(resumen['tiempo_excedido']).isoformat()
+        response = {"hidrograma": hidrograma.to_json(orient = 'index', date_format = 'iso', date_unit = 's'),
+                    "resumen": json.dumps({clave: valor.item() if hasattr(valor, 'item') else valor
+                                           for clave, valor in resumen.items()}),
+                    "excesos": excesos.to_json(orient = 'records', date_format = 'iso', date_unit = 's')}
+    return response
+
+
+def calcular_temporada(args, fechas, caudal=None, turno=None, refuerzo=None, reservorio=None, vol_riego_p_ha=None, arrastre=1):
+    '''
+    Planifica una temporada de turnos sobre la red de la petición (ver redSecundaria.planificar_temporada).
+    Los parámetros que no se indican toman los de la petición.
+    :return: Diccionario con los turnos, los saldos acumulados por parcela y los cuadros de todos los turnos en JSON.
+    '''
+    temporada = obtener_red(args).planificar_temporada(fechas, caudal_canal=caudal, dur_turno=turno, refuerzo=refuerzo,
+                                                      reservorio=reservorio, vol_riego_p_ha=vol_riego_p_ha,
+                                                      arrastre=arrastre == 1)
+    with medir('serializacion'):
+        cuadros = temporada['cuadros'].reset_index(level='turno')
+        cuadros['Inicio'] = formatear_fechas(cuadros['Inicio'])
+        cuadros['Fin'] = formatear_fechas(cuadros['Fin'])
+        response = {"turnos": temporada['turnos'].to_json(orient = 'index', date_format = 'iso', date_unit = 's'),
+                    "saldos": temporada['saldos'].to_json(orient = 'index', double_precision = 1),
+                    "cuadros": cuadros.to_json(orient = 'records', date_format = 'iso', date_unit = 's', double_precision = 1)}
+    return response
+
+
+def calcular_parametro(args, variable='caudal', objetivo=None, objetivo_cauces=None):
+    '''
+    Caudal en cabecera (variable='caudal') o duración del turno (variable='turno') con los que se alcanza el volumen de
+    riego por ha objetivo (ver redSecundaria.resolver_parametro).
+    :param objetivo_cauces: Objetivo por cauce ({cauce: vol/ha}); reemplaza a objetivo.
+    :return: Diccionario con el resumen, el valor requerido por cauce y los caudales por cauce resultantes en JSON.
+    '''
+    nombres = {'caudal': 'caudal_canal', 'turno': 'dur_turno'}
+    if variable not in nombres:
+        raise ValueError("Sólo se puede resolver el caudal o el turno")
+    if objetivo_cauces is not None:
+        try:
+            objetivo = pd.Series({int(cauce): float(valor) for cauce, valor in objetivo_cauces.items()})
+        except (AttributeError, TypeError, ValueError):
+            raise ValueError("objetivo_cauces debe ser un objeto {cauce: vol/ha}")
+    solucion = obtener_red(args).resolver_parametro(objetivo, nombres[variable])
+    with medir('serializacion'):
+        por_cauce = solucion['por_cauce']
+        response = {"resumen": json.dumps({variable: solucion[nombres[variable]],
+                                           "vol_riego_ha": float(solucion['vol_riego_ha'])}),
+                    "por_cauce": "null" if por_cauce is None else por_cauce.to_json(orient = 'index'),
+                    "caudales": solucion['caudal_riego'].to_json(orient = 'index')}
+    return response
+
+
+def consultar_regando(args, desde, hasta=None, cauce=None, subgrupo=None, grupo=None):
+    '''
+    Parcelas del turno que riegan en el instante desde o en el rango [desde, hasta), con filtros opcionales.
+    Las fechas se interpretan como la fecha de inicio del turno (día primero).
+    :return: Diccionario con las filas del cuadro de turno encontradas en JSON.
+    '''
+    desde = pd.to_datetime(desde, dayfirst = True)
+    hasta = None if hasta is None else pd.to_datetime(hasta, dayfirst = True)
+    filas = obtener_turno(args).regando(desde, hasta, cauce=cauce, subgrupo=subgrupo, grupo=grupo)
+    with medir('serializacion'):
+        response = {"regando": formatear_cuadro(filas).to_json(orient = 'index', date_format = 'iso', date_unit="s", double_precision = 1)}
+    return response
+
+
+def filas_turno(args, inspeccion=None):
+    '''
+    Filas del cuadro de turno y de la cuenta de agua de la inspección en NDJSON, un cauce por vez en el orden de riego,
+    para escribirlas a medida que se generan sin armar el documento completo.
+    :param inspeccion: Id que se agrega a cada fila (por omisión el de los argumentos).
+    :return: Generador de textos NDJSON con las filas de cada cauce (tabla: cuadro / cuentaAgua).
+    '''
+    red = construir_red(args)
+    cuadro_red = red.get_cuadro_red()
+    desplazamientos = red.get_indice_cauces()['desplazamientos']
+    inspeccion = args.get('inspeccion') if inspeccion is None else inspeccion
+    for inicio, fin in zip(desplazamientos[:-1], desplazamientos[1:]):
+        tramo = cuadro_red.iloc[inicio:fin]
+        for tabla, datos in (('cuadro', formatear_cuadro(tramo)), ('cuentaAgua', formatear_cuenta_agua(tramo))):
+            yield datos.assign(inspeccion=inspeccion, tabla=tabla).to_json(orient='records', lines=True, date_format='iso',
+                                                                            date_unit='s', double_precision=1).rstrip('\n') + '\n'
+
+
+def calcular_filas(args):
+    #Todas las filas NDJSON de una inspección en un solo texto (para los procesos de trabajo)
+    return ''.join(filas_turno(args))
+
+
+def calcular_lote(inspecciones, cola=None):
+    '''
+    Calcula el turno de varias inspecciones en paralelo, una inspección por proceso.
+    :param inspecciones: Lista de diccionarios con los mismos argumentos que /turno_riego
+                         (la clave opcional 'inspeccion' la identifica en los resultados).
+    :param cola: colaTrabajos a usar; por omisión se crea una con un proceso por núcleo y se cierra al terminar.
+    :return: Generador que devuelve cada inspección al terminar, con su indice, inspeccion, estado
+             (terminado / error), tiempos de espera y duración, y el resultado de calcular_turno o el error.
+    :raises colaLlena: si la cola no admite el lote (se informa al llamar, antes de iterar).
+    '''
+    from trabajos import colaTrabajos
+
+    propia = cola is None
+    if propia:
+        cola = colaTrabajos()
+    lista_args = [dict(dict.fromkeys(argumentos_red + argumentos_turno), **inspeccion) for inspeccion in inspecciones]
+    try:
+        tareas = cola.lote(calcular_turno, lista_args)
+    except Exception:
+        if propia:
+            cola.cerrar()
+        raise
+    return _identificar_lote(tareas, lista_args, cola if propia else None)
+
+
+def _identificar_lote(tareas, lista_args, propia=None):
+    #Agrega a cada tarea del lote el id de su inspección; al dejar de leer cancela las pendientes y cierra la cola propia
+    try:
+        for tarea in tareas:
+            inspeccion = lista_args[tarea['indice']]['inspeccion']
+            tarea['inspeccion'] = tarea['indice'] if inspeccion is None else inspeccion
+            yield tarea
+    finally:
+        tareas.close()
+        if propia is not None:
+            propia.cerrar()